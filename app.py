@@ -6,16 +6,39 @@ Flask-based web application for RS-232 control
 
 import json
 import os
+import re
 import time
 import threading
 import logging
+import logging.handlers
 import subprocess
 import requests
 import xml.etree.ElementTree as ET
 import signal
+import socket
+import fcntl
+import select
+import selectors
+import heapq
+import bisect
+import difflib
+import itertools
+import ipaddress
+import asyncio
+import queue
+import base64
+import hashlib
+import urllib.parse
+import concurrent.futures
+import math
+import random
+from collections import deque
 from datetime import datetime
-from flask import Flask, request, jsonify, render_template, send_from_directory, Response
+from functools import lru_cache
+from contextlib import contextmanager
+from flask import Flask, request, jsonify, render_template, send_from_directory, Response, has_request_context, g
 from flask_cors import CORS
+from werkzeug.middleware.proxy_fix import ProxyFix
 import serial
 import serial.tools.list_ports
 
@@ -27,6 +50,8 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
+# nginx (setup.sh) forwards the client address; trust that one proxy hop
+app.wsgi_app = ProxyFix(app.wsgi_app, x_for=1, x_proto=1)
 CORS(app)
 
 # Configuration
@@ -40,7 +65,7 @@ class Config:
         self.SERIAL_PORT = '/dev/serial0'  # Default Raspberry Pi serial port
         self.BAUD_RATE = 115200
         self.TIMEOUT = 2
-        self.COMMAND_DELAY = 0.2  # Increased delay between commands
+        self.IDLE_GAP = 0.1  # Quiet time that ends a reply with no known frame
         self.load_config()
     
     def load_config(self):
@@ -76,11 +101,354 @@ config = Config()
 # Global variables
 serial_port = None
 serial_lock = threading.Lock()
-command_history = []
+
+# Serial broker socket and election lock, shared by all workers
+BROKER_SOCKET_FILE = 'serial-broker.sock'
+BROKER_LOCK_FILE = 'serial-broker.lock'
+BROKER_TIMEOUT = 30
+# How long workers wait for a newly elected owner to start serving (seconds)
+BROKER_STARTUP_WAIT = 10
+BROKER_STARTUP_RETRY_INTERVAL = 0.05
+# How often a worker waiting on the broker checks that its HTTP client is still there (seconds)
+BROKER_CLIENT_CHECK_INTERVAL = 0.25
+
+# Serial link reconnect backoff bounds and device node check interval (seconds)
+SERIAL_RECONNECT_MIN_DELAY = 0.5
+SERIAL_RECONNECT_MAX_DELAY = 30
+SERIAL_NODE_CHECK_INTERVAL = 0.5
+
+# How often the serial port inventory checks /dev for hotplugged adapters (seconds)
+PORT_WATCH_INTERVAL = 1
+
+# Error returned without touching the port while the serial link is down
+SERIAL_LINK_DOWN = 'Serial port not connected'
+
+# Default freshness (seconds) of the power state reported by /api/status
+STATUS_MAX_AGE = 5
+
+# Longest wait for state changes per /api/events round (seconds)
+EVENTS_WAIT = 25
+
+# Each open Server-Sent Events stream pins a worker thread (8 per worker in
+# setup.sh); past this many per worker new streams get a 503 so commands
+# always find a free thread
+SSE_MAX_STREAMS = 4
+SSE_RETRY_AFTER = 30
+
+# Command history kept in memory, and its on-disk journal (rotated by size)
+HISTORY_SIZE = 500
+HISTORY_JOURNAL_FILE = 'command-history.log'
+HISTORY_JOURNAL_MAX_BYTES = 256 * 1024
+HISTORY_JOURNAL_BACKUPS = 2
+
+# Upper bound on commands accepted by /api/command/batch
+MAX_BATCH_COMMANDS = 32
+
+# Per-process metric snapshots, merged by /metrics across workers
+METRICS_DIR = 'metrics'
+METRICS_FLUSH_INTERVAL = 5
 
 # Roku device configuration file
 ROKU_CONFIG_FILE = 'roku_devices.json'
 
+# Rokus seen on the network, keyed by serial number
+ROKU_REGISTRY_FILE = 'roku_registry.json'
+
+# Saved scene (layout snapshot) file
+SCENES_FILE = 'scenes.json'
+
+# Scene captures re-read shadow fields older than this (seconds)
+SCENE_CAPTURE_MAX_AGE = 10
+
+# Metrics
+# Counters and histograms are plain dicts updated under a per-metric lock, so
+# recording costs a dict lookup and a bisect. Each process writes its values
+# to METRICS_DIR every few seconds; /metrics adds up every live process.
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+class Counter:
+    """Monotonic count per label set"""
+    type = 'counter'
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self.lock:
+            self.series[labels] = self.series.get(labels, 0) + amount
+        metrics.touch()
+
+    def snapshot(self):
+        with self.lock:
+            return [[list(labels), value] for labels, value in self.series.items()]
+
+class Gauge(Counter):
+    """Current value per label set"""
+    type = 'gauge'
+
+    def set(self, value, *labels):
+        with self.lock:
+            self.series[labels] = value
+        metrics.touch()
+
+class Histogram:
+    """Bucketed observations (seconds) per label set"""
+    type = 'histogram'
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            series = self.series.get(labels)
+            if series is None:
+                # Per-bucket counts (last slot is +Inf), sum, count
+                series = self.series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+        metrics.touch()
+
+    def snapshot(self):
+        with self.lock:
+            return [[list(labels), [list(counts), total, count]]
+                    for labels, (counts, total, count) in self.series.items()]
+
+class MetricsRegistry:
+    """Process-local metrics, exported in the Prometheus text format"""
+
+    def __init__(self):
+        self.metrics = []
+        self.flusher = None
+        self.flusher_lock = threading.Lock()
+
+    def counter(self, name, help, labels=()):
+        return self._register(Counter(name, help, labels))
+
+    def gauge(self, name, help, labels=()):
+        return self._register(Gauge(name, help, labels))
+
+    def histogram(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        return self._register(Histogram(name, help, labels, buckets))
+
+    def _register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def touch(self):
+        """Start the snapshot writer once this process records anything"""
+        with self.flusher_lock:
+            if self.flusher is None:
+                self.flusher = threading.Thread(target=self._flush_loop, daemon=True)
+                self.flusher.start()
+
+    def snapshot(self):
+        return {metric.name: metric.snapshot() for metric in self.metrics}
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(METRICS_FLUSH_INTERVAL)
+            try:
+                self.flush()
+            except Exception as e:
+                logger.warning(f"Failed to write metrics snapshot: {e}")
+
+    def flush(self):
+        """Write this process's values where other workers can merge them"""
+        os.makedirs(METRICS_DIR, exist_ok=True)
+        path = os.path.join(METRICS_DIR, _snapshot_name(os.getpid()))
+        with open(path + '.tmp', 'w') as f:
+            json.dump(self.snapshot(), f)
+        os.replace(path + '.tmp', path)
+
+    def collect(self):
+        """Snapshots of this process and every other live process"""
+        snapshots = [self.snapshot()]
+        if os.path.isdir(METRICS_DIR):
+            own = _snapshot_name(os.getpid())
+            for filename in os.listdir(METRICS_DIR):
+                name, ext = os.path.splitext(filename)
+                pid, _, started = name.partition('-')
+                if ext != '.json' or not pid.isdigit() or not started.isdigit() or filename == own:
+                    continue
+                path = os.path.join(METRICS_DIR, filename)
+                try:
+                    os.kill(int(pid), 0)
+                except ProcessLookupError:
+                    # Worker is gone; its counters go with it
+                    os.remove(path)
+                    continue
+                except PermissionError:
+                    pass
+                if _snapshot_name(int(pid)) != filename:
+                    # The pid was reused by a newer process; this file is from a dead one
+                    os.remove(path)
+                    continue
+                try:
+                    with open(path, 'r') as f:
+                        snapshots.append(json.load(f))
+                except (IOError, json.JSONDecodeError):
+                    continue
+        return snapshots
+
+    def render(self):
+        """Merged metrics in the Prometheus text exposition format"""
+        snapshots = self.collect()
+        lines = []
+        for metric in self.metrics:
+            merged = {}
+            for snapshot in snapshots:
+                for labels, value in snapshot.get(metric.name, []):
+                    key = tuple(labels)
+                    if metric.type != 'histogram':
+                        # Gauges are only set by the serial owner, so adding is safe
+                        merged[key] = merged.get(key, 0) + value
+                    else:
+                        counts, total, count = merged.get(key, [[0] * (len(metric.buckets) + 1), 0.0, 0])
+                        merged[key] = [[a + b for a, b in zip(counts, value[0])], total + value[1], count + value[2]]
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.type}')
+            for key, value in sorted(merged.items()):
+                labels = ','.join(f'{name}="{_escape_label(label)}"' for name, label in zip(metric.labels, key))
+                if metric.type != 'histogram':
+                    lines.append(f'{metric.name}{{{labels}}} {value}' if labels else f'{metric.name} {value}')
+                    continue
+                counts, total, count = value
+                prefix = f'{labels},' if labels else ''
+                cumulative = 0
+                for bound, bucket_count in zip(list(metric.buckets) + ['+Inf'], counts):
+                    cumulative += bucket_count
+                    lines.append(f'{metric.name}_bucket{{{prefix}le="{bound}"}} {cumulative}')
+                suffix = f'{{{labels}}}' if labels else ''
+                lines.append(f'{metric.name}_sum{suffix} {round(total, 6)}')
+                lines.append(f'{metric.name}_count{suffix} {count}')
+        return '\n'.join(lines) + '\n'
+
+def _process_started(pid):
+    """Start time of a process in clock ticks since boot, or 0 where /proc is unavailable"""
+    try:
+        with open(f'/proc/{pid}/stat', 'r') as f:
+            # The command name may hold spaces, so count fields after its closing paren
+            return int(f.read().rpartition(')')[2].split()[19])
+    except (OSError, ValueError, IndexError):
+        return 0
+
+def _snapshot_name(pid):
+    """Snapshot filename, tied to the process start time so a reused pid is not mistaken for it"""
+    return f'{pid}-{_process_started(pid)}.json'
+
+def _escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+metrics = MetricsRegistry()
+
+SERIAL_COMMAND_SECONDS = metrics.histogram(
+    'orei_serial_command_duration_seconds', 'Serial round-trip time per command family', ('family',))
+SERIAL_LOCK_WAIT_SECONDS = metrics.histogram(
+    'orei_serial_lock_wait_seconds', 'Time spent waiting to acquire the serial lock')
+SERIAL_LOCK_HOLD_SECONDS = metrics.histogram(
+    'orei_serial_lock_hold_seconds', 'Time the serial lock was held per acquisition')
+SERIAL_TIMEOUTS = metrics.counter(
+    'orei_serial_timeouts_total', 'Replies cut off by the read deadline', ('family',))
+SERIAL_NO_RESPONSE = metrics.counter(
+    'orei_serial_no_response_total', 'Commands the device did not answer', ('family',))
+SERIAL_ERRORS = metrics.counter(
+    'orei_serial_errors_total', 'Serial I/O errors (the port is reopened afterwards)')
+SERIAL_CONNECTS = metrics.counter(
+    'orei_serial_connects_total', 'Serial port open attempts', ('result',))
+SERIAL_LINK_TRANSITIONS = metrics.counter(
+    'orei_serial_link_transitions_total', 'Serial link state changes', ('from', 'to'))
+SERIAL_LINK_STATE = metrics.gauge(
+    'orei_serial_link_state', 'Current serial link state (1 for the active state)', ('state',))
+ROKU_REQUEST_SECONDS = metrics.histogram(
+    'orei_roku_request_duration_seconds', 'Roku ECP request latency', ('device', 'endpoint'))
+ROKU_REQUEST_ERRORS = metrics.counter(
+    'orei_roku_request_errors_total', 'Failed Roku ECP requests', ('device', 'endpoint'))
+ROKU_DISCOVERY_SECONDS = metrics.histogram(
+    'orei_roku_discovery_duration_seconds', 'Roku discovery run time',
+    buckets=(0.5, 1, 2.5, 5, 10, 20, 30, 60))
+ROKU_UP = metrics.gauge(
+    'orei_roku_up', 'Whether a mapped Roku answers (1) or its circuit breaker is open (0)', ('device',))
+HTTP_REQUEST_SECONDS = metrics.histogram(
+    'orei_http_request_duration_seconds', 'HTTP request handling time per route', ('method', 'route', 'status'))
+
+@lru_cache(maxsize=512)
+def command_family(command):
+    """Command with its parameters removed, for metric labels (s window 1 in 2! -> s window in)"""
+    return re.sub(r' ?\d+| ?[+-]$', '', normalize_command(command).lower())
+
+# Roku HTTP sessions
+# One keep-alive session per Roku, so a d-pad burst reuses an open socket
+# instead of paying a TCP handshake per key. An unreachable device fails on
+# the short connect timeout; the read timeout stays longer for slow queries.
+ROKU_CONNECT_TIMEOUT = 1
+ROKU_READ_TIMEOUT = 5
+ROKU_POOL_SIZE = 4
+
+class RokuSessions:
+    """Pooled keep-alive HTTP sessions, one per Roku IP"""
+
+    def __init__(self):
+        self.sessions = {}
+        self.lock = threading.Lock()
+
+    def get(self, ip):
+        with self.lock:
+            session = self.sessions.get(ip)
+            if session is None:
+                session = self.sessions[ip] = requests.Session()
+                # No retries: a repeated keypress is worse than a failed one
+                session.mount('http://', requests.adapters.HTTPAdapter(
+                    pool_connections=1, pool_maxsize=ROKU_POOL_SIZE, max_retries=0))
+            return session
+
+    def warm(self, ips):
+        """Open a connection to each Roku in the background so the first key press is fast"""
+        def connect(ip):
+            try:
+                roku_request('GET', ip, 'query/device-info')
+            except requests.exceptions.RequestException as e:
+                logger.info(f"Could not pre-connect to Roku at {ip}: {roku_error_text(e)}")
+
+        for ip in set(ips):
+            threading.Thread(target=connect, args=(ip,), daemon=True).start()
+
+roku_sessions = RokuSessions()
+
+def roku_error_text(error):
+    """Short reason for a failed ECP request (requests' own messages run to several lines)"""
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return 'connection timed out'
+    if isinstance(error, requests.exceptions.ReadTimeout):
+        return 'no reply in time'
+    if isinstance(error, requests.exceptions.ConnectionError):
+        return 'not reachable'
+    return str(error)
+
+def roku_request(method, ip, endpoint, timeout=None):
+    """Make an ECP request to a Roku over its keep-alive session, recording its latency"""
+    # keypress/Home, launch/12 and query/icon/12 are labelled keypress, launch and query/icon
+    label = endpoint.rsplit('/', 1)[0] if endpoint.startswith(('keypress/', 'launch/', 'query/icon/')) else endpoint
+    start_time = time.monotonic()
+    try:
+        return roku_sessions.get(ip).request(method, f"http://{ip}:8060/{endpoint}",
+                                             timeout=timeout or (ROKU_CONNECT_TIMEOUT, ROKU_READ_TIMEOUT))
+    except requests.exceptions.RequestException:
+        ROKU_REQUEST_ERRORS.inc(ip, label)
+        raise
+    finally:
+        ROKU_REQUEST_SECONDS.observe(time.monotonic() - start_time, ip, label)
+
 # Load Roku device mappings
 def load_roku_mappings():
     """Load Roku device mappings from JSON file"""
@@ -102,184 +470,311 @@ def save_roku_mappings(mappings):
     except IOError:
         return False
 
-# Discover Roku devices on network
-def discover_roku_devices():
-    """Discover Roku devices using SSDP and network scanning"""
-    devices = []
-    logger.info("Starting Roku device discovery...")
-    
-    # Method 1: SSDP Discovery
+# Load saved scenes
+def load_scenes():
+    """Load saved scenes from JSON file"""
+    if os.path.exists(SCENES_FILE):
+        try:
+            with open(SCENES_FILE, 'r') as f:
+                return json.load(f)
+        except (json.JSONDecodeError, IOError):
+            pass
+    return {}
+
+# Save scenes
+def save_scenes(scenes):
+    """Save scenes to JSON file"""
     try:
-        ssdp_request = (
-            "M-SEARCH * HTTP/1.1\r\n"
-            "HOST: 239.255.255.250:1900\r\n"
-            "MAN: \"ssdp:discover\"\r\n"
-            "ST: roku:ecp\r\n"
-            "MX: 3\r\n\r\n"
-        )
-        
-        # Use nc (netcat) to send SSDP discovery - try multiple netcat locations
-        logger.info("Attempting SSDP discovery with netcat...")
-        netcat_paths = ['/usr/bin/nc', '/bin/nc', '/usr/bin/netcat', 'nc']
-        netcat_cmd = None
-        
-        for nc_path in netcat_paths:
+        with open(SCENES_FILE, 'w') as f:
+            json.dump(scenes, f, indent=2)
+        return True
+    except IOError:
+        return False
+
+# Roku SSDP discovery
+# An in-process SSDP client: M-SEARCH is multicast a few times (UDP gets
+# dropped), replies are handled as they arrive and each new responder's
+# device-info is fetched concurrently, so devices stream out while the search
+# is still running and the whole search takes about MX seconds.
+SSDP_ADDRESS = ('239.255.255.250', 1900)
+SSDP_MX = 3
+SSDP_SEARCHES = 3
+SSDP_SEARCH_SPACING = 0.3
+
+def ssdp_search_request(st='roku:ecp', mx=SSDP_MX):
+    return (
+        "M-SEARCH * HTTP/1.1\r\n"
+        f"HOST: {SSDP_ADDRESS[0]}:{SSDP_ADDRESS[1]}\r\n"
+        "MAN: \"ssdp:discover\"\r\n"
+        f"ST: {st}\r\n"
+        f"MX: {mx}\r\n\r\n"
+    ).encode('ascii')
+
+def parse_ssdp_headers(data):
+    """Headers of an SSDP datagram keyed by upper-case name, or None if it is not one"""
+    lines = data.decode('utf-8', errors='ignore').split('\r\n')
+    if not lines or not lines[0].startswith(('HTTP/1.1 200', 'NOTIFY ')):
+        return None
+    headers = {}
+    for line in lines[1:]:
+        name, sep, value = line.partition(':')
+        if sep:
+            headers[name.strip().upper()] = value.strip()
+    return headers
+
+class SSDPProtocol(asyncio.DatagramProtocol):
+    """Hands every parsed SSDP datagram to a callback"""
+
+    def __init__(self, on_message):
+        self.on_message = on_message
+
+    def datagram_received(self, data, addr):
+        headers = parse_ssdp_headers(data)
+        if headers:
+            self.on_message(headers, addr)
+
+    def error_received(self, exc):
+        logger.debug(f"SSDP socket error: {exc}")
+
+async def ssdp_discover_roku(mx=SSDP_MX):
+    """Yield Roku device info as soon as each SSDP responder is identified"""
+    loop = asyncio.get_running_loop()
+    identified = asyncio.Queue()
+    locations = set()
+    lookups = set()
+
+    async def identify(location):
+        try:
+            # requests is blocking, so lookups run on the loop's thread pool
+            device_info = await loop.run_in_executor(None, get_roku_device_info, location)
+        finally:
+            lookups.discard(asyncio.current_task())
+        identified.put_nowait(device_info)
+
+    def on_message(headers, addr):
+        location = headers.get('LOCATION')
+        if not location or 'roku:ecp' not in headers.get('ST', '').lower() or location in locations:
+            return
+        locations.add(location)
+        logger.info(f"Found Roku location: {location}")
+        lookups.add(loop.create_task(identify(location)))
+
+    async def search(transport):
+        request = ssdp_search_request(mx=mx)
+        for attempt in range(SSDP_SEARCHES):
+            transport.sendto(request, SSDP_ADDRESS)
+            await asyncio.sleep(SSDP_SEARCH_SPACING)
+
+    # Devices answer within MX seconds; lookups still running then are awaited
+    deadline = loop.time() + mx
+    transport, _ = await loop.create_datagram_endpoint(
+        lambda: SSDPProtocol(on_message), local_addr=('0.0.0.0', 0))
+    transport.get_extra_info('socket').setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, 2)
+    searcher = loop.create_task(search(transport))
+    try:
+        while True:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                if not lookups and identified.empty():
+                    break
+                timeout = None
             try:
-                # Test if command exists
-                result = subprocess.run([nc_path, '-h'], 
-                                      capture_output=True, timeout=1)
-                netcat_cmd = nc_path
-                break
-            except (FileNotFoundError, subprocess.TimeoutExpired):
+                device_info = await asyncio.wait_for(identified.get(), timeout)
+            except asyncio.TimeoutError:
                 continue
-        
-        if netcat_cmd:
-            result = subprocess.run([
-                netcat_cmd, '-u', '-w', '3', 
-                '239.255.255.250', '1900'
-            ], input=ssdp_request, text=True, capture_output=True, timeout=5)
-            
-            if result.stdout:
-                logger.info(f"SSDP response received: {len(result.stdout)} bytes")
-                # Parse responses
-                responses = result.stdout.split('\r\n\r\n')
-                for response in responses:
-                    if 'roku:ecp' in response and 'LOCATION:' in response:
-                        for line in response.split('\r\n'):
-                            if line.startswith('LOCATION:'):
-                                location = line.split(':', 1)[1].strip()
-                                logger.info(f"Found Roku location: {location}")
-                                device_info = get_roku_device_info(location)
-                                if device_info:
-                                    devices.append(device_info)
-                                    logger.info(f"Added Roku device: {device_info['name']} at {device_info['ip']}")
-                                break
-            else:
-                logger.info("No SSDP responses received")
-        else:
-            logger.warning("Netcat command not found in any location")
-            
-    except (subprocess.TimeoutExpired, subprocess.CalledProcessError, FileNotFoundError) as e:
+            if device_info:
+                logger.info(f"Added Roku device: {device_info['name']} at {device_info['ip']}")
+                yield device_info
+    finally:
+        transport.close()
+        tasks = [searcher, *lookups]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+def iterate_async(make_stream):
+    """Iterate an async generator from a request thread, on an event loop of its own
+
+    Closing the returned iterator (e.g. a client leaving an event stream)
+    cancels the async generator.
+    """
+    items = queue.Queue()
+    done = object()
+    loop = asyncio.new_event_loop()
+
+    async def pump():
+        try:
+            async for item in make_stream():
+                items.put(item)
+        except Exception as e:
+            items.put(e)
+        finally:
+            items.put(done)
+
+    task = loop.create_task(pump())
+
+    def run():
+        try:
+            loop.run_until_complete(task)
+        except asyncio.CancelledError:
+            pass
+        finally:
+            loop.close()
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = items.get()
+            if item is done:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        try:
+            loop.call_soon_threadsafe(task.cancel)
+        except RuntimeError:
+            # The stream already finished and its loop is closed
+            pass
+
+def discover_roku_devices_stream(scan=False):
+    """Yield Roku devices as they are found: SSDP first, then a network scan if SSDP found none (or scan is set)"""
+    start_time = time.monotonic()
+    seen = set()
+    logger.info("Starting Roku device discovery...")
+    try:
+        for device_info in iterate_async(ssdp_discover_roku):
+            seen.add(device_info['ip'])
+            roku_client.seen(device_info)
+            yield device_info
+    except OSError as e:
         logger.warning(f"SSDP discovery failed: {e}")
-    
-    # Method 2: Direct network scanning if no devices found
-    if not devices:
-        logger.info("SSDP discovery found no devices, trying network scan...")
-        devices = scan_roku_devices_fallback()
-    
-    logger.info(f"Discovery completed. Found {len(devices)} Roku device(s)")
-    return devices
-
-# Fallback Roku discovery method
-def scan_roku_devices_fallback():
-    """Fallback method to scan for Roku devices"""
-    devices = []
-    logger.info("Starting network scan for Roku devices...")
-    
+
+    if scan or not seen:
+        logger.info("Scanning the network for Roku devices...")
+        for device_info in scan_roku_devices_fallback():
+            if device_info['ip'] not in seen:
+                seen.add(device_info['ip'])
+                roku_client.seen(device_info)
+                yield device_info
+
+    logger.info(f"Discovery completed. Found {len(seen)} Roku device(s)")
+    ROKU_DISCOVERY_SECONDS.observe(time.monotonic() - start_time)
+
+def discover_roku_devices(scan=False):
+    """Discover Roku devices using SSDP and network scanning"""
+    return list(discover_roku_devices_stream(scan))
+
+# Roku network scan
+# Used when SSDP finds nothing (multicast blocked). Every host on each
+# directly connected IPv4 network gets a cheap TCP connect on the ECP port,
+# hundreds at a time; only hosts that accept are asked for their device-info.
+ROKU_ECP_PORT = 8060
+SCAN_CONCURRENCY = 256
+SCAN_CONNECT_TIMEOUT = 0.5
+# Networks with more hosts than this (a /20) are skipped rather than scanned
+SCAN_MAX_HOSTS = 4096
+# Tried when the routing table cannot be read
+SCAN_COMMON_NETWORKS = ['192.168.1.0/24', '192.168.0.0/24', '192.168.33.0/24', '10.0.0.0/24', '172.16.0.0/24']
+
+def local_networks():
+    """Directly connected IPv4 networks of every interface, from /proc/net/route"""
+    networks = []
     try:
-        # Get local network range - try multiple ip command locations
-        ip_paths = ['/usr/sbin/ip', '/sbin/ip', '/bin/ip', 'ip']
-        ip_cmd = None
-        
-        for ip_path in ip_paths:
-            try:
-                # Test if command exists
-                result = subprocess.run([ip_path, 'help'], 
-                                      capture_output=True, timeout=1)
-                ip_cmd = ip_path
-                break
-            except (FileNotFoundError, subprocess.TimeoutExpired):
-                continue
-        
-        if ip_cmd:
-            result = subprocess.run([ip_cmd, 'route', 'show', 'default'], 
-                                  capture_output=True, text=True, timeout=5)
-            if result.returncode == 0:
-                # Extract gateway IP to determine network range
-                gateway = result.stdout.split()[2] if len(result.stdout.split()) > 2 else None
-                if gateway:
-                    network_base = '.'.join(gateway.split('.')[:-1])
-                    logger.info(f"Scanning network range: {network_base}.1-254")
-                    
-                    # Use threading for faster scanning
-                    import threading
-                    from concurrent.futures import ThreadPoolExecutor, as_completed
-                    
-                    def check_ip(ip):
-                        return check_roku_device(ip)
-                    
-                    # Scan common IP range for Roku devices
-                    with ThreadPoolExecutor(max_workers=20) as executor:
-                        futures = []
-                        for i in range(1, 255):
-                            ip = f"{network_base}.{i}"
-                            future = executor.submit(check_ip, ip)
-                            futures.append(future)
-                        
-                        for future in as_completed(futures):
-                            try:
-                                device_info = future.result(timeout=1)
-                                if device_info:
-                                    devices.append(device_info)
-                                    logger.info(f"Found Roku device via scan: {device_info['name']} at {device_info['ip']}")
-                                    if len(devices) >= 10:  # Limit to prevent long scans
-                                        break
-                            except Exception as e:
-                                continue
-                else:
-                    logger.warning("Could not determine network range from default route")
-            else:
-                logger.warning(f"ip route command failed: {result.stderr}")
+        with open('/proc/net/route', 'r') as f:
+            next(f)
+            for line in f:
+                fields = line.split()
+                if len(fields) < 8 or fields[0] == 'lo':
+                    continue
+                # Hex fields are little-endian; on-link routes have no gateway
+                destination, gateway, mask = (ipaddress.IPv4Address(int.from_bytes(bytes.fromhex(value), 'little'))
+                                              for value in (fields[1], fields[2], fields[7]))
+                if int(gateway) or not int(mask):
+                    continue
+                network = ipaddress.IPv4Network(f'{destination}/{mask}', strict=False)
+                if network.is_loopback or network.is_link_local or network in networks:
+                    continue
+                networks.append(network)
+    except (OSError, ValueError, StopIteration) as e:
+        logger.warning(f"Could not read the routing table: {e}")
+    return networks
+
+async def probe_port(ip, port=ROKU_ECP_PORT, timeout=SCAN_CONNECT_TIMEOUT):
+    """Check whether a TCP connect to ip:port succeeds"""
+    try:
+        _, writer = await asyncio.wait_for(asyncio.open_connection(str(ip), port), timeout)
+    except (OSError, asyncio.TimeoutError):
+        return False
+    writer.close()
+    return True
+
+async def scan_roku_network(networks=None, concurrency=SCAN_CONCURRENCY):
+    """Yield Roku device info for every host on the networks that answers on the ECP port"""
+    loop = asyncio.get_running_loop()
+    if networks is None:
+        networks = local_networks() or [ipaddress.IPv4Network(network) for network in SCAN_COMMON_NETWORKS]
+    scanned = []
+    for network in networks:
+        if network.num_addresses > SCAN_MAX_HOSTS:
+            logger.warning(f"Skipping network scan of {network}: more than {SCAN_MAX_HOSTS} hosts")
         else:
-            logger.warning("ip command not found, trying fallback method...")
-            # Fallback: try common network ranges
-            common_ranges = ['192.168.1', '192.168.0', '192.168.33', '10.0.0', '172.16.0']
-            for network_base in common_ranges:
-                logger.info(f"Trying network range: {network_base}.1-254")
-                # Quick scan of first 50 IPs in each range
-                for i in range(1, 51):
-                    ip = f"{network_base}.{i}"
-                    device_info = check_roku_device(ip)
+            scanned.append(network)
+    logger.info(f"Scanning for Roku devices on {', '.join(map(str, scanned)) or 'no networks'}")
+
+    # Workers share one host iterator, so a /22 never turns into 1000 tasks
+    hosts = itertools.chain.from_iterable(network.hosts() for network in scanned)
+    found = asyncio.Queue()
+    finished = object()
+
+    async def worker():
+        try:
+            for ip in hosts:
+                if await probe_port(ip):
+                    # requests is blocking, so lookups run on the loop's thread pool
+                    device_info = await loop.run_in_executor(None, get_roku_device_info, f'http://{ip}:{ROKU_ECP_PORT}/')
                     if device_info:
-                        devices.append(device_info)
-                        logger.info(f"Found Roku device via fallback scan: {device_info['name']} at {device_info['ip']}")
-                        # Continue scanning this range if we found something
-                        for j in range(51, 255):
-                            ip = f"{network_base}.{j}"
-                            device_info = check_roku_device(ip)
-                            if device_info:
-                                devices.append(device_info)
-                                logger.info(f"Found Roku device via fallback scan: {device_info['name']} at {device_info['ip']}")
-                        break  # Found devices in this range, stop trying other ranges
-                if devices:  # If we found devices, stop trying other ranges
-                    break
-                    
-    except Exception as e:
-        logger.error(f"Network scan failed: {e}")
-    
-    logger.info(f"Network scan completed. Found {len(devices)} device(s)")
-    return devices
+                        found.put_nowait(device_info)
+        finally:
+            found.put_nowait(finished)
 
-# Check if IP has Roku device
-def check_roku_device(ip):
-    """Check if given IP has a Roku device"""
+    workers = [loop.create_task(worker()) for _ in range(concurrency)]
+    running = len(workers)
     try:
-        response = requests.get(f"http://{ip}:8060/", timeout=1)
-        if response.status_code == 200 and 'roku' in response.text.lower():
-            return get_roku_device_info(f"http://{ip}:8060/")
-    except requests.exceptions.RequestException:
-        pass
-    return None
+        while running:
+            device_info = await found.get()
+            if device_info is finished:
+                running -= 1
+                continue
+            logger.info(f"Found Roku device via scan: {device_info['name']} at {device_info['ip']}")
+            yield device_info
+    finally:
+        # Wait for the cancellations so the loop can close cleanly
+        for task in workers:
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+
+def scan_roku_devices_fallback(networks=None):
+    """Yield Roku devices found by scanning the local networks, as they are found"""
+    start_time = time.monotonic()
+    found = 0
+    for device_info in iterate_async(lambda: scan_roku_network(networks)):
+        found += 1
+        yield device_info
+    logger.info(f"Network scan completed in {time.monotonic() - start_time:.1f}s. Found {found} device(s)")
 
 # Get Roku device information
 def get_roku_device_info(location):
     """Get device information from Roku device"""
     try:
         # Extract IP from location URL
-        ip = location.split('//')[1].split(':')[0]
+        ip = urllib.parse.urlparse(location).hostname
+        if not ip:
+            return None
         
         # Get device info
-        response = requests.get(f"http://{ip}:8060/query/device-info", timeout=5)
+        response = roku_request('GET', ip, 'query/device-info')
         if response.status_code == 200:
             root = ET.fromstring(response.text)
             
@@ -300,81 +795,128 @@ def get_roku_device_info(location):
                     device_info['serial'] = child.text or 'Unknown'
             
             return device_info
-    except (requests.exceptions.RequestException, ET.ParseError):
+    except (requests.exceptions.RequestException, ET.ParseError, ValueError):
+        # ValueError: a malformed LOCATION URL
         pass
     return None
 
-# Serial port utilities
-def get_available_serial_ports():
-    """Get list of available serial ports"""
-    ports = []
-    
-    # Add common Linux serial ports
-    common_ports = [
-        '/dev/serial0',   # Raspberry Pi GPIO
-        '/dev/ttyAMA0',   # Raspberry Pi GPIO (alternative)
-        '/dev/ttyS0',     # Standard serial port
-    ]
-    
-    # Add USB serial ports
-    for i in range(8):  # Check USB0 through USB7
-        common_ports.append(f'/dev/ttyUSB{i}')
-    
-    # Check which ports actually exist
-    for port in common_ports:
-        if os.path.exists(port):
+# Serial port inventory
+# Ports are enumerated once (a sysfs scan via comports) and rescanned only
+# when /dev or /dev/serial/by-id changes, which a watcher thread checks with
+# two stats per second. Hotplugged USB adapters show up without the settings
+# page paying for a scan.
+SERIAL_PORT_PATTERN = re.compile(r'serial\d|ttyAMA\d+|ttyS0|ttyUSB\d+|ttyACM\d+')
+SERIAL_BY_ID_DIR = '/dev/serial/by-id'
+
+class PortInventory:
+    """Cached list of serial ports, refreshed when device nodes come and go"""
+
+    def __init__(self, watch_interval=PORT_WATCH_INTERVAL):
+        self.watch_interval = watch_interval
+        self.ports = None
+        self.signature = None
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def get(self):
+        """Current ports; the first call scans, later calls are served from cache"""
+        if self.ports is None:
+            self.refresh()
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._watch, daemon=True)
+            self.thread.start()
+        return self.ports
+
+    def refresh(self):
+        """Rescan the ports if the device directories changed since the last scan"""
+        signature = self._signature()
+        with self.lock:
+            if self.ports is not None and signature == self.signature:
+                return False
+            self.ports = self._scan()
+            self.signature = signature
+        logger.info(f"Serial port inventory: {', '.join(port['device'] for port in self.ports) or 'none'}")
+        return True
+
+    def _watch(self):
+        while True:
+            time.sleep(self.watch_interval)
             try:
-                # Try to get port info
-                import serial.tools.list_ports
-                port_info = next((p for p in serial.tools.list_ports.comports() if p.device == port), None)
-                if port_info:
-                    ports.append({
-                        'device': port,
-                        'description': port_info.description,
-                        'manufacturer': getattr(port_info, 'manufacturer', 'Unknown')
-                    })
-                else:
-                    # Port exists but no detailed info available
-                    ports.append({
-                        'device': port,
-                        'description': f'Serial Port ({os.path.basename(port)})',
-                        'manufacturer': 'Unknown'
-                    })
-            except:
-                # Fallback if serial.tools.list_ports fails
+                self.refresh()
+            except Exception as e:
+                logger.warning(f"Serial port inventory refresh failed: {e}")
+
+    def _signature(self):
+        """Directory mtimes change whenever a node is added or removed"""
+        signature = []
+        for path in ('/dev', SERIAL_BY_ID_DIR):
+            try:
+                signature.append(os.stat(path).st_mtime_ns)
+            except OSError:
+                signature.append(None)
+        return tuple(signature)
+
+    def _scan(self):
+        try:
+            details = {info.device: info for info in serial.tools.list_ports.comports()}
+        except Exception as e:
+            logger.warning(f"Failed to read serial port details: {e}")
+            details = {}
+
+        # Stable names for USB adapters: /dev/serial/by-id/usb-FTDI_... -> /dev/ttyUSB0
+        by_id = {}
+        if os.path.isdir(SERIAL_BY_ID_DIR):
+            for name in sorted(os.listdir(SERIAL_BY_ID_DIR)):
+                path = os.path.join(SERIAL_BY_ID_DIR, name)
+                by_id.setdefault(os.path.realpath(path), []).append(path)
+
+        try:
+            nodes = [os.path.join('/dev', name) for name in os.listdir('/dev')
+                     if SERIAL_PORT_PATTERN.fullmatch(name)]
+        except OSError:
+            nodes = []
+        devices = sorted(set(nodes) | set(details), key=_port_sort_key)
+
+        ports = []
+        for device in devices:
+            info = details.get(device) or details.get(os.path.realpath(device))
+            description = info.description if info and info.description != 'n/a' else \
+                f'Serial Port ({os.path.basename(device)})'
+            manufacturer = (info.manufacturer if info else None) or 'Unknown'
+            aliases = by_id.get(os.path.realpath(device), [])
+            ports.append({
+                'device': device,
+                'description': description,
+                'manufacturer': manufacturer,
+                'by_id': aliases
+            })
+            # Offer the stable name too, so a saved port survives re-enumeration
+            for alias in aliases:
                 ports.append({
-                    'device': port,
-                    'description': f'Serial Port ({os.path.basename(port)})',
-                    'manufacturer': 'Unknown'
+                    'device': alias,
+                    'description': f'{description} (stable name for {os.path.basename(device)})',
+                    'manufacturer': manufacturer,
+                    'alias_of': device
                 })
-    
-    return ports
+        return ports
 
-# Send ECP command to Roku device
-def send_roku_command(ip, command):
-    """Send ECP command to Roku device"""
-    try:
-        url = f"http://{ip}:8060/keypress/{command}"
-        response = requests.post(url, timeout=5)
-        return response.status_code == 200
-    except requests.exceptions.RequestException:
-        return False
+def _port_sort_key(device):
+    """Sort ttyUSB2 before ttyUSB10"""
+    name = os.path.basename(device)
+    match = re.match(r'(\D+)(\d*)$', name)
+    return (match.group(1), int(match.group(2) or 0)) if match else (name, 0)
 
-# Launch Roku app
-def launch_roku_app(ip, app_id):
-    """Launch specific app on Roku device"""
-    try:
-        url = f"http://{ip}:8060/launch/{app_id}"
-        response = requests.post(url, timeout=5)
-        return response.status_code == 200
-    except requests.exceptions.RequestException:
-        return False
+port_inventory = PortInventory()
+
+def get_available_serial_ports():
+    """Get list of available serial ports"""
+    return port_inventory.get()
 
 # Get Roku apps
 def get_roku_apps(ip):
-    """Get list of installed apps on Roku device"""
+    """Get list of installed apps on Roku device, or None if it did not answer"""
     try:
-        response = requests.get(f"http://{ip}:8060/query/apps", timeout=5)
+        response = roku_request('GET', ip, 'query/apps')
         if response.status_code == 200:
             root = ET.fromstring(response.text)
             apps = []
@@ -387,7 +929,473 @@ def get_roku_apps(ip):
             return apps
     except (requests.exceptions.RequestException, ET.ParseError):
         pass
-    return []
+    return None
+
+# Get Roku app icon
+def get_roku_icon(ip, app_id):
+    """Get an app's icon image as (data, content type), or None"""
+    try:
+        response = roku_request('GET', ip, f'query/icon/{app_id}')
+        if response.status_code == 200 and response.content:
+            return response.content, response.headers.get('Content-Type', 'image/png')
+    except requests.exceptions.RequestException:
+        pass
+    return None
+
+# RS-232 response framing
+class ResponseFrame:
+    """Expected reply shape for a family of RS-232 commands"""
+
+    def __init__(self, pattern=None, lines=1, timeout=None):
+        # pattern matches the line that ends the reply, lines caps how many
+        # lines the reply can span; lines=None means read until the link is quiet
+        self.pattern = re.compile(pattern, re.IGNORECASE) if pattern else None
+        self.lines = lines
+        self.timeout = timeout
+
+    def is_complete(self, lines):
+        """Check whether the collected reply lines form a full response"""
+        if not lines or self.lines is None:
+            return False
+        if self.pattern and self.pattern.search(lines[-1]):
+            return True
+        return len(lines) >= self.lines
+
+# Reply frames for every command in rs-232_commands.md. Set commands echo the
+# same line as the matching read, so both share a frame.
+RESPONSE_FRAMES = [
+    # System
+    (r'help', ResponseFrame(lines=None)),
+    (r'r type', ResponseFrame(r'multiviewer')),
+    (r'r fw version', ResponseFrame(r'scaler fw version', lines=2)),
+    (r'r power', ResponseFrame(r'power (on|off)')),
+    (r'power 0', ResponseFrame(r'power off')),
+    (r'power 1', ResponseFrame(r'initialization finished', lines=3, timeout=15)),
+    (r'reboot', ResponseFrame(r'initialization finished', lines=3, timeout=20)),
+    (r'reset', ResponseFrame(r'system initializing', lines=2, timeout=20)),
+    # Output settings
+    (r'[rs] output res( \d+)?', ResponseFrame(r'out resolution:')),
+    (r'[rs] output hdcp( \d)?', ResponseFrame(r'output hdcp:')),
+    (r'[rs] output vka( \d)?', ResponseFrame(r'output vka pattern:')),
+    (r'[rs] output itc( \d)?', ResponseFrame(r'output itc:')),
+    # EDID settings
+    (r'[rs] input edid( \d+)?', ResponseFrame(r'input edid:')),
+    # Audio settings
+    (r'[rs] output audio( \d)?', ResponseFrame(r'output audio:')),
+    (r'[rs] output audio vol( ?[+-]| \d+)?', ResponseFrame(r'audio volume:')),
+    (r'[rs] output audio mute( \d)?', ResponseFrame(r'audio mute:')),
+    # Single screen mode
+    (r'[rs] auto switch( \d)?', ResponseFrame(r'auto switch (on|off)')),
+    (r'[rs] in source( \d)?', ResponseFrame(r'hdmi \d')),
+    # Multi-viewer mode
+    (r'[rs] multiview( \d)?', ResponseFrame(r'screen|pip|pbp')),
+    (r'[rs] window \d in( \d)?', ResponseFrame(r'window \d select')),
+    # PIP / PBP / triple / quad settings
+    (r'[rs] pip position( \d)?', ResponseFrame(r'pip on')),
+    (r'[rs] pip size( \d)?', ResponseFrame(r'pip size:')),
+    (r'[rs] pbp mode( \d)?', ResponseFrame(r'pbp mode')),
+    (r'[rs] pbp aspect( \d)?', ResponseFrame(r'pbp aspect:')),
+    (r'[rs] triple mode( \d)?', ResponseFrame(r'triple mode')),
+    (r'[rs] triple aspect( \d)?', ResponseFrame(r'triple aspect:')),
+    (r'[rs] quad mode( \d)?', ResponseFrame(r'quad mode')),
+    (r'[rs] quad aspect( \d)?', ResponseFrame(r'quad aspect:')),
+]
+RESPONSE_FRAMES = [(re.compile(command, re.IGNORECASE), frame) for command, frame in RESPONSE_FRAMES]
+
+# Unknown commands are read until the device stops talking
+DEFAULT_FRAME = ResponseFrame(lines=None)
+
+def normalize_command(command):
+    """Normalize a command for grammar lookups (no '!', single spaces)"""
+    return ' '.join(command.strip().rstrip('!').split())
+
+@lru_cache(maxsize=256)
+def get_response_frame(command):
+    """Get the expected reply frame for a command"""
+    normalized = normalize_command(command)
+    for pattern, frame in RESPONSE_FRAMES:
+        if pattern.fullmatch(normalized):
+            return frame
+    return DEFAULT_FRAME
+
+# RS-232 command grammar
+# Every command in rs-232_commands.md with its parameter ranges. Anything
+# else would get no reply and hold the port for the full timeout, so it is
+# rejected before it reaches the scheduler (unless sent with raw=True).
+COMMAND_GRAMMAR = [
+    # System
+    ('help', {}),
+    ('r type', {}),
+    ('r fw version', {}),
+    ('r power', {}),
+    ('power {z}', {'z': (0, 1)}),
+    ('reboot', {}),
+    ('reset', {}),
+    # Output settings
+    ('r output res', {}),
+    ('s output res {x}', {'x': (1, 14)}),
+    ('r output hdcp', {}),
+    ('s output hdcp {x}', {'x': (1, 3)}),
+    ('r output vka', {}),
+    ('s output vka {x}', {'x': (1, 2)}),
+    ('r output itc', {}),
+    ('s output itc {x}', {'x': (1, 2)}),
+    # EDID settings
+    ('r input EDID', {}),
+    ('s input EDID {x}', {'x': (1, 18)}),
+    # Audio settings
+    ('r output audio', {}),
+    ('s output audio {x}', {'x': (0, 4)}),
+    ('r output audio vol', {}),
+    ('s output audio vol+', {}),
+    ('s output audio vol-', {}),
+    ('s output audio vol {x}', {'x': (0, 100)}),
+    ('r output audio mute', {}),
+    ('s output audio mute {x}', {'x': (0, 1)}),
+    # Single screen mode
+    ('r auto switch', {}),
+    ('s auto switch {x}', {'x': (0, 1)}),
+    ('r in source', {}),
+    ('s in source {x}', {'x': (1, 4)}),
+    # Multi-viewer mode
+    ('r multiview', {}),
+    ('s multiview {x}', {'x': (1, 5)}),
+    ('r window {x} in', {'x': (1, 4)}),
+    ('s window {x} in {y}', {'x': (1, 4), 'y': (1, 4)}),
+    # PIP / PBP / triple / quad settings
+    ('r PIP position', {}),
+    ('s PIP position {x}', {'x': (1, 4)}),
+    ('r PIP size', {}),
+    ('s PIP size {x}', {'x': (1, 3)}),
+    ('r PBP mode', {}),
+    ('s PBP mode {x}', {'x': (1, 2)}),
+    ('r PBP aspect', {}),
+    ('s PBP aspect {x}', {'x': (1, 2)}),
+    ('r triple mode', {}),
+    ('s triple mode {x}', {'x': (1, 2)}),
+    ('r triple aspect', {}),
+    ('s triple aspect {x}', {'x': (1, 2)}),
+    ('r quad mode', {}),
+    ('s quad mode {x}', {'x': (1, 2)}),
+    ('r quad aspect', {}),
+    ('s quad aspect {x}', {'x': (1, 2)}),
+]
+
+def _compile_template(template, flags=0):
+    """'s window {x} in {y}' -> regex with a numeric group per parameter"""
+    parts = re.split(r'\{(\w+)\}', template)
+    pattern = ''.join(f'(?P<{part}>\\d+)' if index % 2 else re.escape(part) for index, part in enumerate(parts))
+    return re.compile(pattern, flags)
+
+# (usage, case-sensitive pattern, case-insensitive pattern, parameter ranges)
+COMMAND_PATTERNS = [(template.replace('{', '').replace('}', '') + '!',
+                     _compile_template(template), _compile_template(template, re.IGNORECASE), ranges)
+                    for template, ranges in COMMAND_GRAMMAR]
+
+@lru_cache(maxsize=512)
+def validate_command(command):
+    """Check a command against the grammar, returning an error message or None"""
+    normalized = normalize_command(command)
+    for usage, pattern, _, ranges in COMMAND_PATTERNS:
+        match = pattern.fullmatch(normalized)
+        if not match:
+            continue
+        for name, (low, high) in ranges.items():
+            value = int(match.group(name))
+            if not low <= value <= high:
+                return f"Parameter {name}={value} out of range for '{usage}' (expected {low}-{high})"
+        return None
+
+    for usage, _, pattern, _ in COMMAND_PATTERNS:
+        if pattern.fullmatch(normalized):
+            return f"Commands are case-sensitive: expected '{usage}'"
+    suggestions = difflib.get_close_matches(normalized + '!', [usage for usage, _, _, _ in COMMAND_PATTERNS], n=1)
+    hint = f" Did you mean '{suggestions[0]}'?" if suggestions else ''
+    return f"Unknown command '{normalized}!'.{hint} Send with raw=true to bypass validation."
+
+# RS-232 response codec
+class ReplyEnum:
+    """Numbered device option whose replies echo the option name"""
+
+    def __init__(self, *names, start=1):
+        # Option ids are the parameters the matching set command takes
+        self.names = dict(enumerate(names, start))
+        self.ids = {name.lower(): option for option, name in self.names.items()}
+
+    def __call__(self, text):
+        """Decode a reply value to its option id (None if not in the table)"""
+        return self.ids.get(text.strip().lower())
+
+    def label(self, value):
+        """Get the display name of an option id"""
+        return self.names.get(value)
+
+# Option tables from rs-232_commands.md
+MULTIVIEW_MODES = ReplyEnum('Single screen', 'PIP', 'PBP', 'Triple screen', 'Quad screen')
+OUTPUT_RESOLUTIONS = ReplyEnum(
+    '4096x2160p60', '4096x2160p50', '3840x2160p60', '3840x2160p50', '3840x2160p30',
+    '3840x2160p25', '1920x1200p60RB', '1920x1080p60', '1920x1080p50', '1360x768p60',
+    '1280x800p60', '1280x720p60', '1280x720p50', '1024x768p60')
+OUTPUT_HDCP_MODES = ReplyEnum('HDCP 1.4', 'HDCP 2.2', 'HDCP OFF')
+OUTPUT_VKA_PATTERNS = ReplyEnum('Black screen', 'Blue screen')
+OUTPUT_ITC_MODES = ReplyEnum('Video mode', 'PC mode')
+EDID_MODES = ReplyEnum(
+    '4K2K60_444,Stereo Audio 2.0', '4K2K60_444,Dolby/DTS 5.1', '4K2K60_444,HD Audio 7.1',
+    '4K2K30_444,Stereo Audio 2.0', '4K2K30_444,Dolby/DTS 5.1', '4K2K30_444,HD Audio 7.1',
+    '1080P,Stereo Audio 2.0', '1080P,Dolby/DTS 5.1', '1080P,HD Audio 7.1',
+    '1920x1200,Stereo Audio 2.0', '1680x1050,Stereo Audio 2.0', '1600x1200,Stereo Audio 2.0',
+    '1440x900,Stereo Audio 2.0', '1360x768,Stereo Audio 2.0', '1280x1024,Stereo Audio 2.0',
+    '1024x768,Stereo Audio 2.0', '720p,Stereo Audio 2.0', 'Copy from HDMI out')
+AUDIO_SOURCES = ReplyEnum('Follow window 1', 'HDMI 1', 'HDMI 2', 'HDMI 3', 'HDMI 4', start=0)
+PIP_POSITIONS = ReplyEnum('Left top', 'Left bottom', 'Right top', 'Right bottom')
+PIP_SIZES = ReplyEnum('Small', 'Middle', 'Large')
+LAYOUT_ASPECTS = ReplyEnum('Full screen', '16:9')
+
+def _on_off(value):
+    return value.lower() == 'on'
+
+# field: (read command, reply pattern, converter). Set commands echo the same
+# reply as the read, so one pattern keeps the field current either way.
+# Enum fields decode to the option id the matching set command takes.
+STATE_FIELDS = {
+    'device_type': ('r type!', r'(?P<value>.*multiviewer)', str),
+    'mcu_firmware': ('r fw version!', r'mcu fw version:? ?(?P<value>[\w.]+)(?: .*)?', str),
+    'scaler_firmware': ('r fw version!', r'(?:.* )?scaler fw version:? ?(?P<value>[\w.]+)', str),
+    'power': ('r power!', r'power (?P<value>on|off)', _on_off),
+    'multiview': ('r multiview!', r'(?P<value>single screen|pip|pbp|triple screen|quad screen)', MULTIVIEW_MODES),
+    'input_source': ('r in source!', r'hdmi (?P<value>\d)', int),
+    'auto_switch': ('r auto switch!', r'auto switch (?P<value>on|off)', _on_off),
+    'pip_position': ('r PIP position!', r'pip on (?P<value>.+)', PIP_POSITIONS),
+    'pip_size': ('r PIP size!', r'pip size: (?P<value>.+)', PIP_SIZES),
+    'pbp_mode': ('r PBP mode!', r'pbp mode (?P<value>\d)', int),
+    'pbp_aspect': ('r PBP aspect!', r'pbp aspect: (?P<value>.+)', LAYOUT_ASPECTS),
+    'triple_mode': ('r triple mode!', r'triple mode (?P<value>\d)', int),
+    'triple_aspect': ('r triple aspect!', r'triple aspect: (?P<value>.+)', LAYOUT_ASPECTS),
+    'quad_mode': ('r quad mode!', r'quad mode (?P<value>\d)', int),
+    'quad_aspect': ('r quad aspect!', r'quad aspect: (?P<value>.+)', LAYOUT_ASPECTS),
+    # "follow window 1 video source" or "HDMI n ..." reduce to the table names
+    'audio_source': ('r output audio!', r'output audio: (?P<value>follow window 1|hdmi \d)\b.*', AUDIO_SOURCES),
+    'audio_volume': ('r output audio vol!', r'output audio volume: (?P<value>\d+)', int),
+    'audio_mute': ('r output audio mute!', r'output audio mute: (?P<value>on|off)', _on_off),
+    'output_resolution': ('r output res!', r'out resolution: (?P<value>.+)', OUTPUT_RESOLUTIONS),
+    'output_hdcp': ('r output hdcp!', r'output hdcp: (?P<value>.+)', OUTPUT_HDCP_MODES),
+    'output_vka': ('r output vka!', r'output vka pattern: (?P<value>.+)', OUTPUT_VKA_PATTERNS),
+    'output_itc': ('r output itc!', r'output itc: (?P<value>.+)', OUTPUT_ITC_MODES),
+    'input_edid': ('r input EDID!', r'input edid: ?(?P<value>.+)', EDID_MODES),
+}
+for _window in range(1, 5):
+    STATE_FIELDS[f'window_{_window}_input'] = (
+        f'r window {_window} in!', rf'window {_window} select hdmi (?P<value>\d)', int)
+
+STATE_PATTERNS = [(field, re.compile(pattern, re.IGNORECASE), convert)
+                  for field, (_, pattern, convert) in STATE_FIELDS.items()]
+
+# Read command (normalized) -> shadow field it refreshes; None for reads
+# whose reply carries several fields (r fw version)
+STATE_READ_FIELDS = {}
+for _field, (_read, _, _) in STATE_FIELDS.items():
+    _read = normalize_command(_read)
+    STATE_READ_FIELDS[_read] = None if _read in STATE_READ_FIELDS else _field
+
+def decode_reply(lines):
+    """Decode reply lines into {field: (typed value, label, raw line)}"""
+    values = {}
+    for line in lines:
+        for field, pattern, convert in STATE_PATTERNS:
+            match = pattern.fullmatch(line)
+            if match:
+                text = match.group('value')
+                value = convert(text)
+                # Enum values outside the documented table keep their text as the label
+                label = (convert.label(value) or text) if isinstance(convert, ReplyEnum) else None
+                values[field] = (value, label, line)
+    return values
+
+# Device state shadow
+class DeviceState:
+    """In-memory shadow of the multiviewer state, fed by command replies"""
+
+    def __init__(self):
+        self.fields = {}
+        # Bumped on every value change so watchers can ask for what is new
+        self.version = 0
+        self.last_watched = 0
+        self.lock = threading.Lock()
+        self.changed = threading.Condition(self.lock)
+
+    def update(self, command, lines):
+        """Apply the state carried by a command's reply lines"""
+        if normalize_command(command) in ('reboot', 'reset'):
+            self.clear()
+        now = time.time()
+        values = decode_reply(lines)
+        with self.lock:
+            start_version = self.version
+            for field, (value, label, line) in values.items():
+                entry = self.fields.get(field)
+                if entry and entry['value'] == value:
+                    version = entry['version']
+                else:
+                    self.version += 1
+                    version = self.version
+                self.fields[field] = {
+                    'value': value,
+                    'label': label,
+                    'raw': line,
+                    'updated': now,
+                    'version': version
+                }
+            if self.version != start_version:
+                self.changed.notify_all()
+
+    def clear(self):
+        """Forget everything, e.g. after a reboot or factory reset"""
+        with self.lock:
+            self.fields = {}
+            self.version += 1
+            self.changed.notify_all()
+
+    def changes_since(self, version, timeout):
+        """Wait up to timeout seconds for fields changed after version"""
+        with self.changed:
+            if version > self.version:
+                # Watcher saw an older owner process; send everything again
+                version = 0
+            self.last_watched = time.monotonic()
+            self.changed.wait_for(lambda: self.version > version, timeout)
+            self.last_watched = time.monotonic()
+            return {
+                'version': self.version,
+                'fields': {
+                    field: {'value': entry['value'], 'label': entry['label'], 'updated': entry['updated']}
+                    for field, entry in self.fields.items()
+                    if entry['version'] > version
+                }
+            }
+
+    def get(self, field, max_age=None):
+        """Get a field entry, or None if unknown or older than max_age seconds"""
+        with self.lock:
+            entry = self.fields.get(field)
+        if entry and max_age is not None and time.time() - entry['updated'] > max_age:
+            return None
+        return entry
+
+    def stale_commands(self, fields, max_age):
+        """Read commands needed to refresh fields older than max_age"""
+        commands = [STATE_FIELDS[field][0] for field in fields if self.get(field, max_age) is None]
+        # Fields that share a read (firmware versions) need it only once
+        return list(dict.fromkeys(commands))
+
+    def snapshot(self, fields=None):
+        """Get field values with their freshness"""
+        now = time.time()
+        with self.lock:
+            return {
+                field: {
+                    'value': entry['value'],
+                    'label': entry['label'],
+                    'updated': entry['updated'],
+                    'age': round(now - entry['updated'], 3)
+                }
+                for field, entry in self.fields.items()
+                if fields is None or field in fields
+            }
+
+device_state = DeviceState()
+
+# Command history
+class CommandHistory:
+    """Bounded log of serial commands, journaled to disk by the serial owner"""
+
+    def __init__(self, size=HISTORY_SIZE, journal_file=HISTORY_JOURNAL_FILE):
+        self.entries = deque(maxlen=size)
+        self.seq = 0
+        self.lock = threading.Lock()
+        self.journal_file = journal_file
+        self.journal = None
+
+    def load(self):
+        """Recover entries from the journal and start appending to it (serial owner only)"""
+        files = [f'{self.journal_file}.{index}' for index in range(HISTORY_JOURNAL_BACKUPS, 0, -1)]
+        files.append(self.journal_file)
+        with self.lock:
+            for path in files:
+                if not os.path.exists(path):
+                    continue
+                try:
+                    with open(path, 'r') as f:
+                        for line in f:
+                            try:
+                                entry = json.loads(line)
+                            except json.JSONDecodeError:
+                                continue
+                            self.seq = max(self.seq, entry.get('seq', 0))
+                            if entry.get('cleared'):
+                                self.entries.clear()
+                            else:
+                                self.entries.append(entry)
+                except IOError as e:
+                    logger.warning(f"Failed to read history journal {path}: {e}")
+            handler = logging.handlers.RotatingFileHandler(
+                self.journal_file, maxBytes=HISTORY_JOURNAL_MAX_BYTES,
+                backupCount=HISTORY_JOURNAL_BACKUPS, delay=True)
+            handler.setFormatter(logging.Formatter('%(message)s'))
+            self.journal = logging.getLogger('app.history')
+            self.journal.propagate = False
+            self.journal.handlers = [handler]
+            self.journal.setLevel(logging.INFO)
+        logger.info(f"Loaded {len(self.entries)} history entries (last seq {self.seq})")
+
+    def add(self, command, response, error=None, duration_ms=0, source=None):
+        """Record one command and its outcome"""
+        now = time.time()
+        with self.lock:
+            self.seq += 1
+            entry = {
+                'seq': self.seq,
+                'timestamp': datetime.fromtimestamp(now).strftime('%H:%M:%S'),
+                'time': round(now, 3),
+                'command': command,
+                'response': response,
+                'error': error,
+                'duration_ms': duration_ms,
+                'source': source
+            }
+            self.entries.append(entry)
+            self._journal(entry)
+        return entry
+
+    def since(self, seq=0, limit=None):
+        """Entries newer than seq, oldest first: the next `limit` after a cursor, or the latest without one"""
+        with self.lock:
+            entries = [entry for entry in self.entries if entry['seq'] > seq]
+            last_seq = self.seq
+        more = False
+        if limit and len(entries) > limit:
+            if seq:
+                # A poller must see every entry, so page forward from the cursor
+                more = True
+                entries = entries[:limit]
+                last_seq = entries[-1]['seq']
+            else:
+                entries = entries[-limit:]
+        return {'last_seq': last_seq, 'more': more, 'history': entries}
+
+    def clear(self):
+        """Forget all entries; sequence numbers keep counting"""
+        with self.lock:
+            self.entries.clear()
+            self._journal({'seq': self.seq, 'cleared': True})
+
+    def _journal(self, entry):
+        if self.journal:
+            try:
+                self.journal.info(json.dumps(entry))
+            except Exception as e:
+                logger.warning(f"Failed to write history journal: {e}")
+
+command_history = CommandHistory()
 
 class SerialManager:
     """Manages serial port communication with the Orei device"""
@@ -397,6 +1405,14 @@ class SerialManager:
         self.baudrate = baudrate
         self.serial_port = None
         self.connected = False
+        # Last time a user-issued command used the port (monotonic)
+        self.last_interactive = 0
+        # Replies are assembled here from whatever chunks the fd delivers
+        self.rx_buffer = bytearray()
+        self.selector = None
+        self.last_error = None
+        # Called with the error when an open link fails mid-command
+        self.on_link_lost = []
         
     def connect(self):
         """Establish serial connection"""
@@ -409,109 +1425,1640 @@ class SerialManager:
                 stopbits=serial.STOPBITS_ONE,
                 timeout=config.TIMEOUT
             )
+            # Wake up exactly when the device sends something
+            self.selector = selectors.DefaultSelector()
+            self.selector.register(self.serial_port.fileno(), selectors.EVENT_READ)
+            self.rx_buffer.clear()
             self.connected = True
+            self.last_error = None
+            SERIAL_CONNECTS.inc('ok')
             logger.info(f"Connected to serial port {self.port} at {self.baudrate} baud")
             return True
         except Exception as e:
             logger.error(f"Failed to connect to serial port: {e}")
+            SERIAL_CONNECTS.inc('error')
             self.connected = False
+            self.last_error = str(e)
             return False
             
     def disconnect(self):
         """Close serial connection"""
+        if self.selector:
+            self.selector.close()
+            self.selector = None
         if self.serial_port and self.serial_port.is_open:
             self.serial_port.close()
             self.connected = False
             logger.info("Disconnected from serial port")
             
-    def send_command(self, command):
+    def send_command(self, command, source=None):
         """Send command to device and return response"""
+        # The supervisor reopens the port; don't make every request try
         if not self.connected:
-            if not self.connect():
-                return None, "Serial port not connected"
-                
+            return None, SERIAL_LINK_DOWN
+
+        with self._locked():
+            if not self.connected:
+                return None, SERIAL_LINK_DOWN
+            return self._transact(command, source)
+
+    def send_batch(self, commands, source=None):
+        """Send several commands back-to-back under one lock acquisition"""
+        if not self.connected:
+            return [{'command': command, 'response': None, 'error': SERIAL_LINK_DOWN, 'duration_ms': 0}
+                    for command in commands]
+
+        results = []
+        with self._locked():
+            for command in commands:
+                if not self.connected:
+                    # The link dropped mid-batch; fail the rest unsent
+                    results.append({'command': command, 'response': None, 'error': SERIAL_LINK_DOWN,
+                                    'duration_ms': 0})
+                    continue
+                start_time = time.monotonic()
+                response, error = self._transact(command, source)
+                results.append({
+                    'command': command,
+                    'response': response,
+                    'error': error,
+                    'duration_ms': round((time.monotonic() - start_time) * 1000, 1)
+                })
+        return results
+
+    @contextmanager
+    def _locked(self):
+        """Hold serial_lock, recording how long it took to get and how long it was held"""
+        wait_start = time.monotonic()
+        with serial_lock:
+            acquired = time.monotonic()
+            SERIAL_LOCK_WAIT_SECONDS.observe(acquired - wait_start)
+            try:
+                yield
+            finally:
+                SERIAL_LOCK_HOLD_SECONDS.observe(time.monotonic() - acquired)
+
+    def _transact(self, command, source=None):
+        """Write one command and read its reply; caller must hold serial_lock"""
         # Ensure command ends with !
         if not command.endswith('!'):
             command += '!'
             
+        start_time = time.monotonic()
         try:
-            with serial_lock:
-                # Clear input buffer
-                self.serial_port.reset_input_buffer()
-                
-                # Send command
-                self.serial_port.write(command.encode('ascii'))
-                logger.debug(f"Sent command: {command}")
-                
-                # Wait for response
-                time.sleep(config.COMMAND_DELAY)
-                
-                # Read response with improved timeout handling
-                response_lines = []
-                start_time = time.time()
-                
-                while (time.time() - start_time) < config.TIMEOUT:
-                    if self.serial_port.in_waiting:
-                        try:
-                            line = self.serial_port.readline().decode('ascii', errors='ignore').strip()
-                            if line:
-                                response_lines.append(line)
-                                # Check for command completion indicators
-                                if any(keyword in line.lower() for keyword in 
-                                       ['on', 'off', 'hdmi', 'mode', 'screen', 'finished', 'ok']):
-                                    break
-                        except:
-                            break
-                    else:
-                        time.sleep(0.01)
-                
-                response = ' '.join(response_lines) if response_lines else "No response"
-                
-                # Log command and response
-                self._log_command(command, response)
-                
-                return response, None
+            # Clear input buffer
+            self.serial_port.reset_input_buffer()
+            self.rx_buffer.clear()
+            
+            # Send command
+            self.serial_port.write(command.encode('ascii'))
+            logger.debug(f"Sent command: {command}")
+            
+            # Read until the reply frame for this command is complete
+            frame = get_response_frame(command)
+            response_lines = self._read_reply(frame, time.monotonic() + (frame.timeout or config.TIMEOUT))
+
+            response = ' '.join(response_lines) if response_lines else "No response"
+            
+            family = command_family(command)
+            SERIAL_COMMAND_SECONDS.observe(time.monotonic() - start_time, family)
+            if not response_lines:
+                SERIAL_NO_RESPONSE.inc(family)
+            if frame.lines is not None and not frame.is_complete(response_lines):
+                SERIAL_TIMEOUTS.inc(family)
+            
+            # Keep the state shadow in step with what the device reported
+            device_state.update(command, response_lines)
+            
+            # Log command and response
+            self._log_command(command, response, None, start_time, source)
+            
+            return response, None
                 
         except Exception as e:
             error_msg = f"Serial communication error: {str(e)}"
             logger.error(error_msg)
+            SERIAL_ERRORS.inc()
             self.connected = False
+            self.last_error = str(e)
+            self._log_command(command, None, error_msg, start_time, source)
+            for callback in self.on_link_lost:
+                callback()
             return None, error_msg
             
-    def update_port(self, new_port):
-        """Update the serial port and reconnect"""
+    def _read_reply(self, frame, deadline):
+        """Collect reply lines until the frame is complete, the link goes quiet or the deadline passes"""
+        fd = self.serial_port.fileno()
+        lines = []
+        while True:
+            # Split off every complete line already in the buffer
+            end = self.rx_buffer.find(b'\n')
+            while end != -1:
+                line = self.rx_buffer[:end].decode('ascii', errors='ignore').strip()
+                del self.rx_buffer[:end + 1]
+                if line:
+                    lines.append(line)
+                    if frame.is_complete(lines):
+                        return lines
+                end = self.rx_buffer.find(b'\n')
+
+            now = time.monotonic()
+            if now >= deadline:
+                break
+            wait = deadline - now
+            if lines and frame.lines is None:
+                wait = min(wait, config.IDLE_GAP)
+            if not self.selector.select(wait):
+                if lines and frame.lines is None:
+                    return lines
+                continue
+            data = os.read(fd, 4096)
+            if not data:
+                raise serial.SerialException('Device disconnected')
+            self.rx_buffer += data
+
+        # Deadline reached; keep any unterminated tail as the last line
+        tail = self.rx_buffer.decode('ascii', errors='ignore').strip()
+        self.rx_buffer.clear()
+        if tail:
+            lines.append(tail)
+        return lines
+
+    def _log_command(self, command, response, error, start_time, source):
+        """Log command to history"""
+        duration_ms = round((time.monotonic() - start_time) * 1000, 1)
+        command_history.add(command, response, error, duration_ms, source)
+
+# Initialize serial manager
+serial_manager = SerialManager()
+
+# Serial broker
+# Gunicorn runs several worker processes, but only one of them may open the
+# serial port. The first worker to take the broker lock becomes the serial
+# owner and runs commands for the others, which reach it over a Unix socket.
+broker_ops = {}
+
+def broker_op(name):
+    """Register a function the serial owner runs on behalf of other workers"""
+    def decorator(func):
+        broker_ops[name] = func
+        return func
+    return decorator
+
+def peer_hung_up(sock):
+    """Check without blocking whether the other end closed a socket"""
+    try:
+        readable, _, _ = select.select([sock], [], [], 0)
+        # A readable socket with nothing to read means the peer hung up
+        return bool(readable) and sock.recv(1, socket.MSG_PEEK) == b''
+    except ValueError:
+        # TLS sockets can't peek; assume the client is still there
+        return False
+    except OSError:
+        return True
+
+def http_client_socket():
+    """Socket of the HTTP client behind the current request, if the server exposes it"""
+    if not has_request_context():
+        return None
+    return request.environ.get('gunicorn.socket')
+
+class SerialBroker:
+    """Elects a single serial owner process and forwards work to it"""
+
+    def __init__(self, socket_path=BROKER_SOCKET_FILE, lock_path=BROKER_LOCK_FILE):
+        self.socket_path = os.path.abspath(socket_path)
+        self.lock_path = os.path.abspath(lock_path)
+        self.owner_pid = None
+        self.lock_file = None
+        self.server = None
+        self.election_lock = threading.Lock()
+        # Background services that only the serial owner runs
+        self.on_elected = []
+        # Connection of the worker request being served by this thread
+        self.local = threading.local()
+
+    def is_owner(self):
+        """Check whether this process owns the serial port"""
+        return self.owner_pid == os.getpid()
+
+    def elect(self):
+        """Try to become the serial owner, return True on success"""
+        with self.election_lock:
+            if self.is_owner():
+                return True
+            lock_file = open(self.lock_path, 'a')
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                lock_file.close()
+                return False
+
+            self.lock_file = lock_file
+            self.owner_pid = os.getpid()
+            logger.info(f"Process {self.owner_pid} is now the serial owner")
+            # Services are up before other workers can reach them
+            for start_service in self.on_elected:
+                start_service()
+            self._serve()
+            return True
+
+    def _serve(self):
+        """Start accepting broker requests from other workers"""
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        self.server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.server.bind(self.socket_path)
+        self.server.listen(16)
+        threading.Thread(target=self._accept_loop, daemon=True).start()
+
+    def _accept_loop(self):
+        while True:
+            try:
+                conn, _ = self.server.accept()
+            except OSError as e:
+                logger.error(f"Serial broker stopped accepting: {e}")
+                return
+            threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+
+    def _handle(self, conn):
+        """Serve one JSON request line from a worker"""
+        with conn:
+            self.local.conn = conn
+            try:
+                message = json.loads(conn.makefile('rb').readline())
+                reply = self.dispatch(message.get('op'), message.get('args', {}))
+                conn.sendall(json.dumps(reply).encode('utf-8') + b'\n')
+            except (BrokenPipeError, ConnectionResetError):
+                # The worker hung up because its HTTP client went away
+                pass
+            except (OSError, ValueError) as e:
+                logger.warning(f"Serial broker request failed: {e}")
+
+    def dispatch(self, op, args):
+        """Run a registered operation and wrap its result for the wire"""
+        func = broker_ops.get(op)
+        if not func:
+            return {'error': f'Unknown broker operation: {op}'}
         try:
-            # Disconnect from current port
-            self.disconnect()
-            
-            # Update port
-            self.port = new_port
-            
-            # Try to reconnect
-            success = self.connect()
-            logger.info(f"Updated serial port to {new_port}, connection {'successful' if success else 'failed'}")
-            return success
+            return {'result': func(**args)}
         except Exception as e:
-            logger.error(f"Failed to update serial port: {e}")
+            logger.error(f"Broker operation {op} failed: {e}")
+            return {'error': str(e)}
+
+    def client_watch(self):
+        """Get a check that the client behind the current request still waits for it"""
+        # Workers drop their broker connection when their HTTP client goes away
+        # (see _remote_call); requests served here are watched directly
+        conn = getattr(self.local, 'conn', None) or http_client_socket()
+        if conn is None:
+            return None
+        return lambda: not peer_hung_up(conn)
+
+    def call(self, op, **args):
+        """Run a broker operation in the serial owner process"""
+        if self.is_owner() or self.elect():
+            return broker_ops[op](**args)
+        deadline = time.monotonic() + BROKER_STARTUP_WAIT
+        while True:
+            try:
+                reply = self._remote_call(op, args)
+                break
+            except (FileNotFoundError, ConnectionRefusedError):
+                # The owner exited and released its lock; take over the port
+                if self.elect():
+                    return broker_ops[op](**args)
+                # Or a new owner is still starting its services
+                if time.monotonic() > deadline:
+                    raise
+                time.sleep(BROKER_STARTUP_RETRY_INTERVAL)
+        if 'error' in reply:
+            raise RuntimeError(reply['error'])
+        return reply.get('result')
+
+    def _remote_call(self, op, args):
+        client = http_client_socket()
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as conn:
+            conn.settimeout(BROKER_TIMEOUT)
+            conn.connect(self.socket_path)
+            conn.sendall(json.dumps({'op': op, 'args': args}).encode('utf-8') + b'\n')
+            if client is not None:
+                self._await_reply(conn, client)
+            line = conn.makefile('rb').readline()
+        if not line:
+            raise ConnectionError('Serial broker closed the connection')
+        return json.loads(line)
+
+    def _await_reply(self, conn, client):
+        """Wait for the owner's reply, hanging up on it if the HTTP client disconnects first"""
+        deadline = time.monotonic() + BROKER_TIMEOUT
+        while time.monotonic() < deadline:
+            readable, _, _ = select.select([conn], [], [], BROKER_CLIENT_CHECK_INTERVAL)
+            if readable:
+                return
+            if peer_hung_up(client):
+                # Closing the broker connection lets the owner drop the queued work
+                raise ConnectionAbortedError('HTTP client disconnected')
+        raise socket.timeout('Serial broker did not reply in time')
+
+broker = SerialBroker()
+broker.on_elected.append(command_history.load)
+
+# Serial link supervisor
+# One thread on the serial owner opens the port. After the link drops it
+# retries with jittered exponential backoff, or right away once the device
+# node reappears. Requests fail fast meanwhile instead of each trying to
+# reopen the port.
+LINK_CONNECTED = 'connected'
+LINK_RECONNECTING = 'reconnecting'   # Device node present, waiting for the next attempt
+LINK_MISSING = 'missing'             # Device node gone (adapter unplugged)
+LINK_STATES = (LINK_CONNECTED, LINK_RECONNECTING, LINK_MISSING)
+
+class SerialSupervisor:
+    """Owns the serial link state and reopens the port in the background"""
+
+    def __init__(self, manager):
+        self.manager = manager
+        self.state = None
+        self.since = None
+        self.failures = 0
+        self.next_attempt = 0
+        self.pending_port = None
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.thread = None
+        manager.on_link_lost.append(self.link_lost)
+
+    def start(self):
+        """Start supervising (called once this process owns the serial port)"""
+        if self.thread is None:
+            if self.manager.connected:
+                self._set_state(LINK_CONNECTED)
+            else:
+                # Open the port before the first request can arrive; retries go to the thread
+                self._reconnect()
+            self.thread = threading.Thread(target=self._run, daemon=True)
+            self.thread.start()
+
+    def link_lost(self):
+        """Called by the manager when an open link fails; retry right away"""
+        self.next_attempt = 0
+        self._set_state(LINK_RECONNECTING)
+        self.wake.set()
+
+    def change_port(self, port):
+        """Switch to another port; the supervisor thread reopens it"""
+        with self.lock:
+            self.pending_port = port
+        self.wake.set()
+
+    def retry_after(self):
+        """Whole seconds a client should wait before trying again"""
+        if self.state == LINK_RECONNECTING:
+            return max(1, math.ceil(self.next_attempt - time.monotonic()))
+        return max(1, math.ceil(self._backoff()))
+
+    def status(self):
+        return {
+            'state': self.state,
+            'since': self.since,
+            'failures': self.failures,
+            'last_error': self.manager.last_error,
+            'retry_after': None if self.manager.connected else self.retry_after()
+        }
+
+    def _backoff(self):
+        return min(SERIAL_RECONNECT_MIN_DELAY * 2 ** self.failures, SERIAL_RECONNECT_MAX_DELAY)
+
+    def _set_state(self, state):
+        with self.lock:
+            previous, self.state = self.state, state
+            if previous == state:
+                return
+            self.since = time.time()
+        if previous is not None:
+            SERIAL_LINK_TRANSITIONS.inc(previous, state)
+            logger.info(f"Serial link {previous} -> {state}")
+        for name in LINK_STATES:
+            SERIAL_LINK_STATE.set(int(name == state), name)
+
+    def _sleep(self, seconds=None):
+        self.wake.wait(seconds)
+        self.wake.clear()
+
+    def _run(self):
+        while True:
+            try:
+                self._switch_port()
+                if self.manager.connected:
+                    self._sleep()
+                elif not os.path.exists(self.manager.port):
+                    self._set_state(LINK_MISSING)
+                    self._sleep(SERIAL_NODE_CHECK_INTERVAL)
+                elif self.state == LINK_MISSING:
+                    # The node is back (adapter replugged); don't wait out the backoff
+                    self._reconnect()
+                elif time.monotonic() < self.next_attempt:
+                    self._sleep(min(self.next_attempt - time.monotonic(), SERIAL_NODE_CHECK_INTERVAL))
+                else:
+                    self._reconnect()
+            except Exception as e:
+                logger.error(f"Serial supervisor error: {e}")
+                self._sleep(SERIAL_NODE_CHECK_INTERVAL)
+
+    def _switch_port(self):
+        with self.lock:
+            port, self.pending_port = self.pending_port, None
+        if port is None:
+            return
+        with serial_lock:
+            self.manager.disconnect()
+            self.manager.connected = False
+            self.manager.port = port
+        logger.info(f"Serial port changed to {port}")
+        self.failures = 0
+        self.next_attempt = 0
+        self._set_state(LINK_RECONNECTING)
+
+    def _reconnect(self):
+        with serial_lock:
+            self.manager.disconnect()
+            connected = self.manager.connect()
+        if connected:
+            self.failures = 0
+            self._set_state(LINK_CONNECTED)
+            return
+        # Jitter keeps a flapping adapter from being hit in lockstep
+        delay = self._backoff()
+        self.failures += 1
+        self.next_attempt = time.monotonic() + random.uniform(delay / 2, delay)
+        self._set_state(LINK_RECONNECTING)
+
+supervisor = SerialSupervisor(serial_manager)
+broker.on_elected.append(supervisor.start)
+
+# Serial command scheduler
+# A single dispatcher thread owns the port. User commands jump ahead of
+# background polls, each request carries a deadline, and requests whose
+# client hung up are dropped before they reach the wire.
+PRIORITY_SET = 0          # Interactive set commands (button presses)
+PRIORITY_READ = 1         # Interactive reads (UI refresh)
+PRIORITY_BACKGROUND = 2   # Background state polling
+PRIORITY_NAMES = {
+    PRIORITY_SET: 'interactive_set',
+    PRIORITY_READ: 'interactive_read',
+    PRIORITY_BACKGROUND: 'background'
+}
+# Default per-request deadline by priority (seconds)
+SCHEDULER_DEADLINES = {PRIORITY_SET: 10, PRIORITY_READ: 5, PRIORITY_BACKGROUND: 15}
+
+# Idempotent setters: a newer queued write to the same family makes an older
+# one pointless, so only the last writer reaches the wire (group 1 is the key)
+COALESCE_FAMILIES = [re.compile(pattern, re.IGNORECASE) for pattern in (
+    r'(s output audio vol) \d+',
+    r'(s output audio mute) \d',
+    r'(s output audio) \d',
+    r'(s output (?:res|hdcp|vka|itc)) \d+',
+    r'(s input edid) \d+',
+    r'(s multiview) \d',
+    r'(s window \d in) \d',
+    r'(s in source) \d',
+    r'(s auto switch) \d',
+    r'(s pip (?:position|size)) \d',
+    r'(s (?:pbp|triple|quad) (?:mode|aspect)) \d',
+)]
+
+def coalesce_key(command):
+    """Setter family a command can be coalesced with, or None"""
+    normalized = normalize_command(command)
+    for pattern in COALESCE_FAMILIES:
+        match = pattern.fullmatch(normalized)
+        if match:
+            return match.group(1).lower()
+    return None
+
+def command_priority(command):
+    """Priority class of a user-issued command"""
+    normalized = normalize_command(command).lower()
+    return PRIORITY_READ if normalized.startswith('r ') or normalized == 'help' else PRIORITY_SET
+
+class SerialJob:
+    """Commands waiting for their turn on the serial port"""
+
+    def __init__(self, commands, priority, deadline, client_alive, source=None):
+        self.commands = commands
+        self.priority = priority
+        self.source = source
+        self.deadline = deadline
+        self.client_alive = client_alive
+        self.enqueued = time.monotonic()
+        self.results = []
+        self.cancelled = False
+        self.started = False
+        self.coalesced = False
+        # Older writes of the same setter family that this job replaced
+        self.superseded = []
+        self.done = threading.Event()
+
+    def abandoned(self):
+        """Check whether the submitter stopped waiting for this job"""
+        return self.cancelled or bool(self.client_alive and not self.client_alive())
+
+    def finish(self, error=None):
+        """Resolve the job, failing any commands that did not run"""
+        for command in self.commands[len(self.results):]:
+            self.results.append({'command': command, 'response': None, 'error': error, 'duration_ms': 0})
+        self.complete()
+
+    def complete(self):
+        """Wake the submitter and hand the final result to superseded writes"""
+        for job in self.superseded:
+            job.results = [dict(result, command=job.commands[0], coalesced_into=result['command'])
+                           for result in self.results]
+            job.done.set()
+        self.done.set()
+
+class SerialScheduler:
+    """Priority queue in front of SerialManager, served by one dispatcher thread"""
+
+    def __init__(self):
+        self.queue = []
+        self.sequence = itertools.count()
+        self.condition = threading.Condition()
+        self.thread = None
+        self.start_lock = threading.Lock()
+        # Setter family -> queued job that has not reached the wire yet
+        self.pending_setters = {}
+        self.stats = {priority: {'dispatched': 0, 'expired': 0, 'abandoned': 0, 'coalesced': 0,
+                                 'wait_ms_avg': 0.0, 'wait_ms_max': 0.0}
+                      for priority in PRIORITY_NAMES}
+
+    def start(self):
+        """Start dispatching (called once this process owns the serial port)"""
+        with self.start_lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, daemon=True)
+                self.thread.start()
+
+    def submit(self, commands, priority, timeout=None, client_alive=None, source=None):
+        """Queue commands and wait for their send_batch-style results"""
+        timeout = timeout or SCHEDULER_DEADLINES[priority]
+        if not serial_manager.connected:
+            # Nothing to wait for until the supervisor reopens the port
+            return [{'command': command, 'response': None, 'error': SERIAL_LINK_DOWN, 'duration_ms': 0}
+                    for command in commands]
+        job = SerialJob(commands, priority, time.monotonic() + timeout, client_alive, source)
+        if priority != PRIORITY_BACKGROUND:
+            serial_manager.last_interactive = time.monotonic()
+        key = coalesce_key(commands[0]) if len(commands) == 1 else None
+        with self.condition:
+            if key:
+                pending = self.pending_setters.get(key)
+                if pending and not pending.started:
+                    # Last writer wins: the queued write never reaches the wire
+                    pending.coalesced = True
+                    job.superseded = pending.superseded + [pending]
+                    pending.superseded = []
+                    self.stats[pending.priority]['coalesced'] += 1
+                    job.priority = min(job.priority, pending.priority)
+                    # The merged write must outlive every waiter it answers for
+                    job.deadline = max([job.deadline] + [waiter.deadline for waiter in job.superseded])
+                self.pending_setters[key] = job
+            heapq.heappush(self.queue, (job.priority, next(self.sequence), job))
+            self.condition.notify()
+
+        # The dispatcher may be stuck behind a slow command; don't outwait the deadline
+        if not job.done.wait(timeout):
+            job.cancelled = True
+            return [{'command': command, 'response': None, 'duration_ms': 0,
+                     'error': 'Serial port busy, request deadline exceeded'} for command in commands]
+        return job.results
+
+    def depth(self, priority=None):
+        """Number of queued jobs, optionally of one priority class"""
+        with self.condition:
+            return sum(1 for queued, _, _ in self.queue if priority is None or queued == priority)
+
+    def snapshot(self):
+        """Queue depth and wait-time statistics per priority class"""
+        with self.condition:
+            depth = {name: 0 for name in PRIORITY_NAMES.values()}
+            for priority, _, _ in self.queue:
+                depth[PRIORITY_NAMES[priority]] += 1
+        return {
+            'depth': depth,
+            'classes': {PRIORITY_NAMES[priority]: {key: round(value, 1) if isinstance(value, float) else value
+                                                    for key, value in stats.items()}
+                        for priority, stats in self.stats.items()}
+        }
+
+    def _run(self):
+        while True:
+            with self.condition:
+                while not self.queue:
+                    self.condition.wait()
+                _, sequence, job = heapq.heappop(self.queue)
+                if job.coalesced:
+                    # The newer write of this family resolves it
+                    continue
+                job.started = True
+                key = coalesce_key(job.commands[0])
+                if key and self.pending_setters.get(key) is job:
+                    del self.pending_setters[key]
+            try:
+                self._dispatch(job, sequence)
+            except Exception as e:
+                logger.error(f"Serial scheduler error: {e}")
+                job.finish(f"Serial scheduler error: {e}")
+
+    def _dispatch(self, job, sequence):
+        stats = self.stats[job.priority]
+        now = time.monotonic()
+        # A merged write still goes out while any replaced write's client waits
+        if all(waiter.abandoned() for waiter in [job] + job.superseded):
+            stats['abandoned'] += 1
+            job.finish('Request abandoned by client')
+            return
+        if now > job.deadline:
+            stats['expired'] += 1
+            job.finish('Request deadline exceeded before reaching the serial port')
+            return
+
+        if not job.results:
+            wait_ms = (now - job.enqueued) * 1000
+            stats['dispatched'] += 1
+            # Exponential moving average, seeded with the first sample
+            weight = 1 if stats['dispatched'] == 1 else 0.1
+            stats['wait_ms_avg'] += (wait_ms - stats['wait_ms_avg']) * weight
+            stats['wait_ms_max'] = max(stats['wait_ms_max'], wait_ms)
+
+        if job.priority == PRIORITY_BACKGROUND:
+            # Background work runs one command per turn so users can cut in
+            job.results.extend(serial_manager.send_batch(job.commands[len(job.results):][:1], job.source))
+            if len(job.results) < len(job.commands):
+                with self.condition:
+                    heapq.heappush(self.queue, (job.priority, sequence, job))
+                return
+        else:
+            job.results.extend(serial_manager.send_batch(job.commands, job.source))
+        job.complete()
+
+scheduler = SerialScheduler()
+broker.on_elected.append(scheduler.start)
+
+@broker_op('command')
+def _broker_command(command, timeout=None, source=None):
+    result = scheduler.submit([command], command_priority(command), timeout, broker.client_watch(), source)[0]
+    return result['response'], result['error']
+
+@broker_op('batch')
+def _broker_batch(commands, timeout=None, source=None):
+    priority = min(command_priority(command) for command in commands)
+    return scheduler.submit(commands, priority, timeout, broker.client_watch(), source)
+
+@broker_op('cached_read')
+def _broker_cached_read(command, max_age):
+    field = STATE_READ_FIELDS.get(normalize_command(command))
+    entry = device_state.get(field, max_age) if field else None
+    return entry['raw'] if entry else None
+
+@broker_op('state')
+def _broker_state(fields, max_age=None, source=None):
+    if max_age is not None:
+        stale = device_state.stale_commands(fields, max_age)
+        if stale:
+            scheduler.submit(stale, PRIORITY_READ, client_alive=broker.client_watch(), source=source)
+    return device_state.snapshot(fields)
+
+@broker_op('changes')
+def _broker_changes(version, timeout):
+    return device_state.changes_since(version, timeout)
+
+@broker_op('queue')
+def _broker_queue():
+    return scheduler.snapshot()
+
+@broker_op('status')
+def _broker_status():
+    return {'connected': serial_manager.connected, 'port': serial_manager.port,
+            'link': supervisor.status()}
+
+@broker_op('update_port')
+def _broker_update_port(port):
+    supervisor.change_port(port)
+    return supervisor.status()
+
+@broker_op('history')
+def _broker_history(since=0, limit=None):
+    return command_history.since(since, limit)
+
+@broker_op('clear_history')
+def _broker_clear_history():
+    command_history.clear()
+    return True
+
+class SerialClient:
+    """SerialManager-style interface for request handlers, served by the serial owner"""
+
+    def _source(self):
+        """Client address recorded in the command history"""
+        return request.remote_addr if has_request_context() else None
+
+    def send_command(self, command, timeout=None):
+        """Send command through the serial owner and return (response, error)"""
+        try:
+            response, error = broker.call('command', command=command, timeout=timeout, source=self._source())
+        except ConnectionAbortedError as e:
+            # Nobody is left to answer
+            return None, str(e)
+        except (OSError, RuntimeError) as e:
+            logger.error(f"Serial broker unavailable: {e}")
+            return None, f"Serial broker unavailable: {e}"
+        return response, error
+
+    def send_batch(self, commands, timeout=None):
+        """Send an ordered list of commands through the serial owner in one burst"""
+        return broker.call('batch', commands=commands, timeout=timeout, source=self._source())
+
+    def read_cached(self, command, max_age):
+        """Get a read command's reply from the state shadow if it is fresh enough"""
+        return broker.call('cached_read', command=command, max_age=max_age)
+
+    def get_state(self, fields, max_age=None):
+        """Get shadow state fields, re-reading any older than max_age seconds"""
+        return broker.call('state', fields=fields, max_age=max_age, source=self._source())
+
+    def wait_changes(self, version, timeout):
+        """Wait for state fields that changed after version"""
+        return broker.call('changes', version=version, timeout=timeout)
+
+    def queue_status(self):
+        """Get serial scheduler queue depth and wait times"""
+        return broker.call('queue')
+
+    def status(self):
+        """Get connection state of the serial owner"""
+        return broker.call('status')
+
+    def update_port(self, new_port):
+        """Hand a new port to the serial owner's supervisor and return the link status"""
+        return broker.call('update_port', port=new_port)
+
+    def apply_scene(self, settings, max_age=None, dry_run=False, timeout=None):
+        """Bring the device to a scene's settings with the fewest set commands"""
+        return broker.call('apply_scene', settings=settings, max_age=max_age,
+                           dry_run=dry_run, timeout=timeout, source=self._source())
+
+    def history(self, since=0, limit=None):
+        """Get command history entries newer than since"""
+        return broker.call('history', since=since, limit=limit)
+
+    def clear_history(self):
+        """Clear the command history"""
+        return broker.call('clear_history')
+
+serial_client = SerialClient()
+
+# Background state poller
+# Keeps the state shadow fresh for push clients so the browsers never poll
+# the serial port themselves. Each group is re-read once it is older than its
+# interval; polling pauses while users are sending commands.
+POLL_SCHEDULE = [
+    (['power'], 5),
+    (['multiview', 'window_1_input', 'window_2_input', 'window_3_input', 'window_4_input'], 15),
+    (['audio_source', 'audio_volume', 'audio_mute'], 15),
+    (['pip_position', 'pip_size', 'pbp_mode', 'pbp_aspect',
+      'triple_mode', 'triple_aspect', 'quad_mode', 'quad_aspect'], 60),
+    (['output_resolution', 'output_hdcp', 'output_vka', 'output_itc', 'auto_switch', 'input_source'], 120),
+    (['input_edid'], 600),
+]
+POLL_INTERVALS = {field: interval for fields, interval in POLL_SCHEDULE for field in fields}
+POLL_TICK = 0.5               # Scheduler resolution (seconds)
+POLL_INTERACTIVE_QUIET = 2    # Pause after the last user command (seconds)
+POLL_SUBSCRIBER_IDLE = 60     # Stop polling this long after the last push client left
+POLL_MAX_BACKOFF = 8          # Interval multiplier cap for fields that stop answering
+
+# Windows shown and settings that matter in each multiview mode
+# (keyed by MULTIVIEW_MODES id)
+MODE_WINDOWS = {1: 1, 2: 2, 3: 2, 4: 3, 5: 4}
+MODE_SETTINGS = {2: 'pip_', 3: 'pbp_', 4: 'triple_', 5: 'quad_'}
+
+class StatePoller:
+    """Re-reads stale state fields in the background on the serial owner"""
+
+    def __init__(self):
+        self.backoff = {}
+        self.attempted = {}
+        self.thread = None
+
+    def start(self):
+        """Start polling (called once this process owns the serial port)"""
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._run, daemon=True)
+            self.thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(POLL_TICK)
+            try:
+                if self._should_poll():
+                    field = self._next_due_field()
+                    if field:
+                        self._poll(field)
+            except Exception as e:
+                logger.error(f"State poller error: {e}")
+
+    def _should_poll(self):
+        """Poll only for live push clients and while users leave the port alone"""
+        now = time.monotonic()
+        if now - device_state.last_watched > POLL_SUBSCRIBER_IDLE:
             return False
-            
-    def _log_command(self, command, response):
-        """Log command to history"""
-        global command_history
+        if not serial_manager.connected:
+            return False
+        if now - serial_manager.last_interactive < POLL_INTERACTIVE_QUIET:
+            return False
+        return scheduler.depth() == 0
+
+    def _relevant_fields(self):
+        """Fields worth reading given the current power state and mode"""
+        power = device_state.get('power')
+        if not power or not power['value']:
+            return ['power']
+        mode = device_state.get('multiview')
+        mode = mode['value'] if mode else None
+        windows = MODE_WINDOWS.get(mode, 4)
+        prefix = MODE_SETTINGS.get(mode)
+        fields = []
+        for field in POLL_INTERVALS:
+            if field.startswith('window_') and int(field.split('_')[1]) > windows:
+                continue
+            # With a known mode, only that mode's layout settings are read
+            if mode is not None and field.startswith(tuple(MODE_SETTINGS.values())) and \
+                    not (prefix and field.startswith(prefix)):
+                continue
+            fields.append(field)
+        return fields
+
+    def _next_due_field(self):
+        """Pick the most overdue field, or None if everything is fresh"""
+        now = time.time()
+        due, most_overdue = None, 1
+        # Fields come in schedule order, so never-read fast fields win ties
+        for field in self._relevant_fields():
+            entry = device_state.get(field)
+            last_read = entry['updated'] if entry else self.attempted.get(field)
+            if last_read is None:
+                return field
+            interval = POLL_INTERVALS[field] * self.backoff.get(field, 1)
+            overdue = (now - last_read) / interval
+            if overdue >= most_overdue:
+                due, most_overdue = field, overdue
+        return due
+
+    def _poll(self, field):
+        self.attempted[field] = time.time()
+        read_command = STATE_FIELDS[field][0]
+        error = scheduler.submit([read_command], PRIORITY_BACKGROUND, source='poller')[0]['error']
+        entry = device_state.get(field)
+        if error or not entry or entry['updated'] < self.attempted[field]:
+            # No usable answer; read this field less often until it recovers
+            self.backoff[field] = min(self.backoff.get(field, 1) * 2, POLL_MAX_BACKOFF)
+        else:
+            self.backoff.pop(field, None)
+
+state_poller = StatePoller()
+broker.on_elected.append(state_poller.start)
+
+# Scenes
+# A scene is a saved set of state field values. Applying one only sends the
+# setters whose field differs from the shadow, in SCENE_SETTERS order (the
+# layout first, since switching modes changes which windows exist), as a
+# single scheduled burst.
+SCENE_SETTERS = {
+    'multiview': 's multiview {}!',
+    'pip_position': 's PIP position {}!',
+    'pip_size': 's PIP size {}!',
+    'pbp_mode': 's PBP mode {}!',
+    'pbp_aspect': 's PBP aspect {}!',
+    'triple_mode': 's triple mode {}!',
+    'triple_aspect': 's triple aspect {}!',
+    'quad_mode': 's quad mode {}!',
+    'quad_aspect': 's quad aspect {}!',
+    'window_1_input': 's window 1 in {}!',
+    'window_2_input': 's window 2 in {}!',
+    'window_3_input': 's window 3 in {}!',
+    'window_4_input': 's window 4 in {}!',
+    'input_source': 's in source {}!',
+    'auto_switch': 's auto switch {}!',
+    'audio_source': 's output audio {}!',
+    'audio_volume': 's output audio vol {}!',
+    'audio_mute': 's output audio mute {}!',
+    'output_resolution': 's output res {}!',
+    'output_hdcp': 's output hdcp {}!',
+    'output_vka': 's output vka {}!',
+    'output_itc': 's output itc {}!',
+    'input_edid': 's input EDID {}!',
+}
+
+def scene_fields(mode):
+    """Scene fields that matter in a multiview mode"""
+    windows = MODE_WINDOWS.get(mode, 4)
+    prefix = MODE_SETTINGS.get(mode)
+    fields = []
+    for field in SCENE_SETTERS:
+        if field.startswith('window_') and int(field.split('_')[1]) > windows:
+            continue
+        if field.startswith(tuple(MODE_SETTINGS.values())) and not (prefix and field.startswith(prefix)):
+            continue
+        if field == 'input_source' and mode != 1:
+            continue
+        fields.append(field)
+    return fields
+
+def validate_scene(settings):
+    """Check scene settings, returning an error message or None"""
+    if not isinstance(settings, dict) or 'multiview' not in settings:
+        return 'Scene settings must include multiview'
+    for field, value in settings.items():
+        if field not in SCENE_SETTERS:
+            return f'Unknown scene field: {field}'
+        if not isinstance(value, (int, bool)):
+            return f'Scene field {field} must be a number or boolean'
+        if value < 0:
+            return f'Scene field {field} must not be negative'
+        convert = STATE_FIELDS[field][2]
+        if isinstance(convert, ReplyEnum) and convert.label(value) is None:
+            return f'Invalid option {value} for {field}'
+        # Applying a scene bypasses the command route, so check the grammar here
+        error = validate_command(SCENE_SETTERS[field].format(int(value)))
+        if error:
+            return f'Invalid value {value} for {field}: {error}'
+    return None
+
+def plan_scene(settings, current):
+    """Ordered set commands that move current state to settings, plus the fields already matching"""
+    commands, skipped = [], []
+    # Settings for windows or layouts the scene's mode doesn't show are left alone
+    for field in scene_fields(settings['multiview']):
+        if field not in settings:
+            continue
+        setter = SCENE_SETTERS[field]
+        entry = current.get(field)
+        if entry and entry['value'] == settings[field]:
+            skipped.append(field)
+            continue
+        commands.append(setter.format(int(settings[field])))
+    return commands, skipped
+
+def capture_scene(max_age=SCENE_CAPTURE_MAX_AGE):
+    """Snapshot the current device settings that matter in the current mode"""
+    mode = serial_client.get_state(['multiview'], max_age).get('multiview')
+    if not mode or mode['value'] is None:
+        raise RuntimeError('Could not read the current display mode')
+    state = serial_client.get_state(scene_fields(mode['value']), max_age)
+    return {field: entry['value'] for field, entry in state.items() if entry['value'] is not None}
+
+@broker_op('apply_scene')
+def _broker_apply_scene(settings, max_age=None, dry_run=False, timeout=None, source=None):
+    fields = [field for field in SCENE_SETTERS if field in settings]
+    # Shadow fields older than max_age count as unknown and are simply set again;
+    # a set costs no more than the read it would take to check them
+    current = {field: entry for field, entry in device_state.snapshot(fields).items()
+               if max_age is None or entry['age'] <= max_age}
+    commands, skipped = plan_scene(settings, current)
+    results = []
+    if commands and not dry_run:
+        results = scheduler.submit(commands, PRIORITY_SET, timeout, broker.client_watch(), source)
+    return {'commands': commands, 'skipped': skipped, 'results': results}
+
+# Roku registry
+# Rokus are tracked by serial number from SSDP NOTIFY announcements, an
+# M-SEARCH sent from the listening socket every few minutes, and every
+# discovery run. When a known serial shows up at a new IP (DHCP moved it),
+# the HDMI mappings that point at it follow, so no rescan is needed.
+ROKU_REGISTRY_SEARCH_INTERVAL = 300
+ROKU_USN_SERIAL = re.compile(r'uuid:roku:ecp:(\w+)', re.IGNORECASE)
+
+class RokuRegistry:
+    """Rokus by serial number with their current IP and last-seen time, run by the serial owner"""
+
+    def __init__(self, path=ROKU_REGISTRY_FILE):
+        self.path = path
+        self.devices = {}
+        self.lock = threading.Lock()
+        self.thread = None
+        # Announced locations being identified; a Roku sends NOTIFYs in bursts
+        self.identifying = set()
+
+    def start(self):
+        """Load the registry and start listening for announcements"""
+        if self.thread is None:
+            self.devices = self._load()
+            self.thread = threading.Thread(target=self._run, daemon=True)
+            self.thread.start()
+
+    def snapshot(self):
+        with self.lock:
+            return sorted(self.devices.values(), key=lambda device: device['name'])
+
+    def record(self, device_info):
+        """Store an identified device, re-pointing mappings if its IP changed"""
+        serial = device_info.get('serial')
+        if not serial or serial == 'Unknown':
+            return
+        now = time.time()
+        with self.lock:
+            entry = self.devices.get(serial)
+            if entry and entry['ip'] != device_info['ip']:
+                logger.info(f"Roku {serial} moved from {entry['ip']} to {device_info['ip']}")
+            self.devices[serial] = {
+                'serial': serial,
+                'ip': device_info['ip'],
+                'name': device_info.get('name', 'Unknown Roku'),
+                'model': device_info.get('model', 'Unknown'),
+                'first_seen': entry['first_seen'] if entry else now,
+                'last_seen': now
+            }
+        self._remap(serial, device_info['ip'])
+        self._save()
+
+    def _load(self):
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, 'r') as f:
+                    return json.load(f)
+            except (json.JSONDecodeError, IOError):
+                pass
+        return {}
+
+    def _save(self):
+        with self.lock:
+            devices = dict(self.devices)
+        try:
+            with open(self.path + '.tmp', 'w') as f:
+                json.dump(devices, f, indent=2)
+            os.replace(self.path + '.tmp', self.path)
+        except IOError as e:
+            logger.warning(f"Failed to save Roku registry: {e}")
+
+    def _remap(self, serial, ip):
+        """Point every HDMI mapping of this serial at its current IP"""
+        mappings = load_roku_mappings()
+        moved = [hdmi for hdmi, mapping in mappings.items()
+                 if mapping.get('serial') == serial and mapping.get('ip') != ip]
+        for hdmi in moved:
+            mappings[hdmi]['ip'] = ip
+        if moved and save_roku_mappings(mappings):
+            logger.info(f"Re-pointed HDMI {', '.join(moved)} to Roku {serial} at {ip}")
+
+    def _run(self):
+        try:
+            asyncio.run(self._listen())
+        except Exception as e:
+            logger.warning(f"Roku announcement listener stopped: {e}")
+
+    async def _listen(self):
+        loop = asyncio.get_running_loop()
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind(('', SSDP_ADDRESS[1]))
+        try:
+            membership = socket.inet_aton(SSDP_ADDRESS[0]) + socket.inet_aton('0.0.0.0')
+            sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, membership)
+        except OSError as e:
+            # Search replies still arrive; only NOTIFY announcements are missed
+            logger.warning(f"Could not join the SSDP multicast group: {e}")
+        transport, _ = await loop.create_datagram_endpoint(
+            lambda: SSDPProtocol(lambda headers, addr: self._on_message(loop, headers)), sock=sock)
+        logger.info("Listening for Roku announcements")
+        request = ssdp_search_request()
+        try:
+            while True:
+                transport.sendto(request, SSDP_ADDRESS)
+                await asyncio.sleep(ROKU_REGISTRY_SEARCH_INTERVAL)
+                # Persist last-seen times refreshed by announcements since the last search
+                self._save()
+        finally:
+            transport.close()
+
+    def _on_message(self, loop, headers):
+        kind = (headers.get('NT') or headers.get('ST') or '').lower()
+        location = headers.get('LOCATION')
+        match = ROKU_USN_SERIAL.search(headers.get('USN', ''))
+        if kind != 'roku:ecp' or headers.get('NTS') == 'ssdp:byebye' or not location or not match:
+            return
+        serial = match.group(1)
+        try:
+            ip = urllib.parse.urlparse(location).hostname
+        except ValueError:
+            ip = None
+        if not ip:
+            return
+        with self.lock:
+            entry = self.devices.get(serial)
+            if entry and entry['ip'] == ip:
+                entry['last_seen'] = time.time()
+                return
+            if location in self.identifying:
+                return
+            self.identifying.add(location)
+        # New device or new address: confirm its identity before trusting it
+        loop.run_in_executor(None, self._identify, location)
+
+    def _identify(self, location):
+        try:
+            device_info = get_roku_device_info(location)
+            if device_info:
+                self.record(device_info)
+        except Exception as e:
+            logger.warning(f"Could not identify the Roku at {location}: {e}")
+        finally:
+            with self.lock:
+                self.identifying.discard(location)
+
+roku_registry = RokuRegistry()
+broker.on_elected.append(roku_registry.start)
+
+@broker_op('roku_seen')
+def _broker_roku_seen(device):
+    roku_registry.record(device)
+    return True
+
+@broker_op('roku_registry')
+def _broker_roku_registry():
+    return roku_registry.snapshot()
+
+@broker_op('roku_mapped')
+def _broker_roku_mapped(ips):
+    # Connections and app lists live on the serial owner, so warm them here
+    roku_sessions.warm(ips)
+    roku_app_cache.warm(ip for ip in ips if not roku_app_cache.has_apps(ip))
+
+# Roku liveness
+# Mapped Rokus are probed in the background, every few seconds while in use
+# and every minute when idle. After repeated failures (probes or real
+# commands) a device's breaker opens: calls to it fail at once instead of
+# waiting out the timeout, and the next user attempt triggers a probe.
+ROKU_UP_STATE = 'up'
+ROKU_DOWN_STATE = 'down'
+ROKU_PROBE_ACTIVE_INTERVAL = 5
+ROKU_PROBE_IDLE_INTERVAL = 60
+# A device counts as in use for this long after a command (seconds)
+ROKU_ACTIVE_WINDOW = 120
+# Consecutive failures that open the breaker
+ROKU_FAILURE_THRESHOLD = 2
+ROKU_PROBE_TIMEOUT = (1, 2)
+
+class RokuLiveness:
+    """Reachability and circuit breaker state per mapped Roku, run by the serial owner"""
+
+    def __init__(self):
+        self.devices = {}
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.probes = concurrent.futures.ThreadPoolExecutor(max_workers=4, thread_name_prefix='roku-probe')
+        self.thread = None
+
+    def start(self):
+        """Start probing (called once this process owns the serial port)"""
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._run, daemon=True)
+            self.thread.start()
+
+    def check(self, ip):
+        """Error for a Roku whose breaker is open (probing it right away), else None"""
+        with self.lock:
+            entry = self._entry(ip)
+            entry['last_used'] = time.monotonic()
+            if entry['state'] != ROKU_DOWN_STATE:
+                return None
+            entry['next_probe'] = 0
+            error = f"Roku at {ip} is offline ({entry['last_error']})"
+        self.wake.set()
+        return error
+
+    def is_down(self, ip):
+        with self.lock:
+            entry = self.devices.get(ip)
+            return bool(entry) and entry['state'] == ROKU_DOWN_STATE
+
+    def report(self, ip, error=None):
+        """Record the outcome of a probe or a real ECP call"""
+        with self.lock:
+            entry = self._entry(ip)
+            previous = entry['state']
+            if error is None:
+                entry['state'] = ROKU_UP_STATE
+                entry['failures'] = 0
+                entry['last_ok'] = time.time()
+            else:
+                entry['failures'] += 1
+                entry['last_error'] = error
+                if entry['failures'] >= ROKU_FAILURE_THRESHOLD:
+                    entry['state'] = ROKU_DOWN_STATE
+            state = entry['state']
+        if state != previous:
+            logger.info(f"Roku at {ip} is {state}" + (f": {error}" if error else ''))
+            ROKU_UP.set(int(state == ROKU_UP_STATE), ip)
+
+    def snapshot(self):
+        with self.lock:
+            return {ip: {key: entry[key] for key in ('state', 'failures', 'last_ok', 'last_error')}
+                    for ip, entry in self.devices.items()}
+
+    def _entry(self, ip):
+        entry = self.devices.get(ip)
+        if entry is None:
+            entry = self.devices[ip] = {'state': None, 'failures': 0, 'last_ok': None, 'last_error': None,
+                                        'last_used': 0, 'next_probe': 0, 'probing': False}
+        return entry
+
+    def _run(self):
+        while True:
+            try:
+                self._probe_due()
+            except Exception as e:
+                logger.error(f"Roku liveness error: {e}")
+            self.wake.wait(1)
+            self.wake.clear()
+
+    def _probe_due(self):
+        mapped = {mapping['ip'] for mapping in load_roku_mappings().values() if mapping.get('ip')}
+        now = time.monotonic()
+        with self.lock:
+            # Unmapped devices are forgotten
+            for ip in set(self.devices) - mapped:
+                del self.devices[ip]
+            due = []
+            for ip in mapped:
+                entry = self._entry(ip)
+                if entry['probing'] or now < entry['next_probe']:
+                    continue
+                active = now - entry['last_used'] < ROKU_ACTIVE_WINDOW
+                entry['next_probe'] = now + (ROKU_PROBE_ACTIVE_INTERVAL if active else ROKU_PROBE_IDLE_INTERVAL)
+                entry['probing'] = True
+                due.append(ip)
+        for ip in due:
+            self.probes.submit(self._probe, ip)
+
+    def _probe(self, ip):
+        try:
+            response = roku_request('GET', ip, 'query/device-info', timeout=ROKU_PROBE_TIMEOUT)
+            self.report(ip, None if response.status_code == 200 else f'HTTP {response.status_code}')
+        except requests.exceptions.RequestException as e:
+            self.report(ip, roku_error_text(e))
+        finally:
+            with self.lock:
+                self._entry(ip)['probing'] = False
+
+roku_liveness = RokuLiveness()
+broker.on_elected.append(roku_liveness.start)
+
+@broker_op('roku_liveness')
+def _broker_roku_liveness():
+    return roku_liveness.snapshot()
+
+# Roku app catalogs
+# App lists and icons are cached per Roku on the serial owner and served from
+# memory. Entries past their TTL, and app lists after a launch (which can
+# install a channel), are refetched in the background while the cached copy
+# is still served. Icons carry a strong ETag so browsers keep them.
+ROKU_APPS_TTL = 600
+ROKU_ICON_TTL = 24 * 3600
+# How long browsers may use an icon without revalidating (seconds)
+ROKU_ICON_MAX_AGE = 3600
+
+class RokuAppCache:
+    """App lists and icons per Roku, revalidated in the background"""
+
+    def __init__(self):
+        self.apps = {}
+        self.icons = {}
+        self.refreshing = set()
+        self.lock = threading.Lock()
+        self.pool = concurrent.futures.ThreadPoolExecutor(max_workers=2, thread_name_prefix='roku-apps')
+
+    def get_apps(self, ip):
+        """App list, fetched on first use and served from cache after that; None if unavailable"""
+        with self.lock:
+            entry = self.apps.get(ip)
+        if entry is None:
+            return self._fetch_apps(ip)
+        if time.monotonic() - entry['fetched'] > ROKU_APPS_TTL:
+            self.refresh_apps(ip)
+        return entry['apps']
+
+    def get_icon(self, ip, app_id, fetch=True):
+        """Icon entry (data, content_type, etag), or None if not cached and fetch is False"""
+        with self.lock:
+            entry = self.icons.get((ip, app_id))
+        if entry is None:
+            return self._fetch_icon(ip, app_id) if fetch else None
+        if time.monotonic() - entry['fetched'] > ROKU_ICON_TTL:
+            self._refresh(('icon', ip, app_id), self._fetch_icon, ip, app_id)
+        return entry
+
+    def has_apps(self, ip):
+        """Check whether an app list for the Roku at ip is cached"""
+        with self.lock:
+            return ip in self.apps
+
+    def refresh_apps(self, ip):
+        """Refetch an app list in the background"""
+        self._refresh(('apps', ip), self._fetch_apps, ip)
+
+    def warm(self, ips):
+        """Fetch app lists in the background so the first launcher open is instant"""
+        for ip in set(ips):
+            self.refresh_apps(ip)
+
+    def _refresh(self, key, fetch, *args):
+        with self.lock:
+            if key in self.refreshing:
+                return
+            self.refreshing.add(key)
+
+        def run():
+            try:
+                fetch(*args)
+            except Exception as e:
+                logger.warning(f"Roku app cache refresh failed: {e}")
+            finally:
+                with self.lock:
+                    self.refreshing.discard(key)
+        self.pool.submit(run)
+
+    def _fetch_apps(self, ip):
+        apps = get_roku_apps(ip)
+        if apps is None:
+            return None
+        with self.lock:
+            self.apps[ip] = {'apps': apps, 'fetched': time.monotonic()}
+            missing = [app['id'] for app in apps if (ip, app['id']) not in self.icons]
+        # Fetch new icons ahead of the launcher asking for them
+        for app_id in missing:
+            self._refresh(('icon', ip, app_id), self._fetch_icon, ip, app_id)
+        return apps
+
+    def _fetch_icon(self, ip, app_id):
+        icon = get_roku_icon(ip, app_id)
+        if icon is None:
+            return None
+        data, content_type = icon
         entry = {
-            'timestamp': datetime.now().strftime('%H:%M:%S'),
-            'command': command,
-            'response': response if response != "No response" else "No response"
+            'data': data,
+            'content_type': content_type,
+            'etag': hashlib.sha256(data).hexdigest()[:32],
+            'fetched': time.monotonic()
         }
-        command_history.append(entry)
-        # Keep only last 50 commands
-        if len(command_history) > 50:
-            command_history.pop(0)
+        with self.lock:
+            self.icons[(ip, app_id)] = entry
+        return entry
 
-# Initialize serial manager
-serial_manager = SerialManager()
+roku_app_cache = RokuAppCache()
+broker.on_elected.append(lambda: roku_app_cache.warm(
+    mapping['ip'] for mapping in load_roku_mappings().values() if mapping.get('ip')))
+
+@broker_op('roku_apps')
+def _broker_roku_apps(ip):
+    error = roku_liveness.check(ip)
+    if error:
+        return {'success': False, 'offline': True, 'error': error}
+    apps = roku_app_cache.get_apps(ip)
+    if apps is None:
+        return {'success': False, 'error': f'Roku at {ip} did not return its app list'}
+    return {'success': True, 'apps': apps}
+
+@broker_op('roku_icon')
+def _broker_roku_icon(ip, app_id, etag=None):
+    # Cached icons are served even while the Roku is offline
+    entry = roku_app_cache.get_icon(ip, app_id, fetch=not roku_liveness.is_down(ip))
+    if entry is None:
+        return {'success': False, 'error': f'No icon for app {app_id}'}
+    if entry['etag'] == etag:
+        return {'success': True, 'etag': etag, 'not_modified': True}
+    return {
+        'success': True,
+        'etag': entry['etag'],
+        'content_type': entry['content_type'],
+        'data': base64.b64encode(entry['data']).decode('ascii')
+    }
+
+# Roku command queues
+# Each Roku has an ordered queue on the serial owner, drained by its own
+# asyncio task: presses reach a device in order while different HDMI inputs
+# run in parallel. Request handlers enqueue and return, optionally waiting
+# briefly for the ECP ack, so a sleeping Roku never pins a web worker.
+ROKU_QUEUE_SIZE = 32
+# Longest a request may wait for the ECP ack (seconds)
+ROKU_ACK_MAX_WAIT = 2
+# Presses queued longer than this are dropped rather than replayed late (seconds)
+ROKU_COMMAND_MAX_AGE = 10
+# Default and longest wait for every Roku in a fan-out to answer (seconds)
+ROKU_FANOUT_DEADLINE = 3
+ROKU_FANOUT_MAX_DEADLINE = 10
+
+class RokuDispatcher:
+    """Per-Roku ordered ECP command queues served by one event loop thread"""
+
+    def __init__(self):
+        self.loop = None
+        self.queues = {}
+        self.thread = None
+        self.start_lock = threading.Lock()
+
+    def start(self):
+        """Start the event loop (called once this process owns the serial port)"""
+        with self.start_lock:
+            if self.thread is None:
+                self.loop = asyncio.new_event_loop()
+                self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+                self.thread.start()
+
+    def submit(self, ip, endpoint):
+        """Queue an ECP POST; the returned Future resolves to its result"""
+        self.start()
+        future = concurrent.futures.Future()
+        self.loop.call_soon_threadsafe(self._enqueue, ip, endpoint, future)
+        return future
+
+    def _enqueue(self, ip, endpoint, future):
+        commands = self.queues.get(ip)
+        if commands is None:
+            commands = self.queues[ip] = asyncio.Queue(ROKU_QUEUE_SIZE)
+            self.loop.create_task(self._drain(ip, commands))
+        try:
+            commands.put_nowait((endpoint, time.monotonic(), future))
+        except asyncio.QueueFull:
+            future.set_result({'success': False, 'error': f'Too many commands queued for the Roku at {ip}'})
+
+    async def _drain(self, ip, commands):
+        while True:
+            endpoint, enqueued, future = await commands.get()
+            try:
+                result = await self._post(ip, endpoint, enqueued)
+            except Exception as e:
+                # One bad command must not stop this Roku's queue
+                logger.error(f"Roku command {endpoint} for {ip} failed: {e}")
+                result = {'success': False, 'error': f'Roku command failed: {e}'}
+            future.set_result(result)
+
+    async def _post(self, ip, endpoint, enqueued):
+        if time.monotonic() - enqueued > ROKU_COMMAND_MAX_AGE:
+            return {'success': False, 'error': 'Dropped: the Roku did not take it in time'}
+        if roku_liveness.is_down(ip):
+            # The breaker opened while this waited; don't queue up timeouts
+            return {'success': False, 'offline': True, 'error': f'Roku at {ip} is offline'}
+        start_time = time.monotonic()
+        try:
+            # requests is blocking, so the call runs on the loop's thread pool
+            response = await self.loop.run_in_executor(None, roku_request, 'POST', ip, endpoint)
+            error = None if response.status_code == 200 else f'Roku answered HTTP {response.status_code}'
+        except requests.exceptions.RequestException as e:
+            error = roku_error_text(e)
+        roku_liveness.report(ip, error)
+        if error is None and endpoint.startswith('launch/'):
+            # Launching an uninstalled channel installs it
+            roku_app_cache.refresh_apps(ip)
+        return {
+            'success': error is None,
+            'error': error,
+            'latency_ms': round((time.monotonic() - start_time) * 1000, 1)
+        }
+
+roku_dispatcher = RokuDispatcher()
+broker.on_elected.append(roku_dispatcher.start)
+# Mapped devices get their keep-alive connections before the first press
+broker.on_elected.append(lambda: roku_sessions.warm(
+    mapping['ip'] for mapping in load_roku_mappings().values() if mapping.get('ip')))
+
+@broker_op('roku_post')
+def _broker_roku_post(ip, endpoint, wait=0):
+    error = roku_liveness.check(ip)
+    if error:
+        return {'success': False, 'acked': True, 'offline': True, 'error': error}
+    future = roku_dispatcher.submit(ip, endpoint)
+    try:
+        result = future.result(timeout=min(wait, ROKU_ACK_MAX_WAIT))
+    except concurrent.futures.TimeoutError:
+        return {'success': True, 'acked': False}
+    return dict(result, acked=True)
+
+@broker_op('roku_fanout')
+def _broker_roku_fanout(ips, endpoint, deadline):
+    # Every device gets the command at once on its own queue; the reply goes
+    # out when the slowest answers or the deadline passes
+    results = {}
+    futures = {}
+    for ip in dict.fromkeys(ips):
+        error = roku_liveness.check(ip)
+        if error:
+            results[ip] = {'success': False, 'acked': True, 'offline': True, 'error': error}
+        else:
+            futures[roku_dispatcher.submit(ip, endpoint)] = ip
+    concurrent.futures.wait(futures, timeout=min(deadline, ROKU_FANOUT_MAX_DEADLINE))
+    for future, ip in futures.items():
+        if future.done():
+            results[ip] = dict(future.result(), acked=True)
+        else:
+            results[ip] = {'success': True, 'acked': False}
+    return results
+
+class RokuClient:
+    """Roku registry and command queue interface for request handlers, served by the serial owner"""
+
+    def post(self, ip, endpoint, wait=0):
+        """Queue an ECP POST, waiting up to wait seconds for the Roku to acknowledge it"""
+        return broker.call('roku_post', ip=ip, endpoint=endpoint, wait=wait)
+
+    def fanout(self, ips, endpoint, deadline):
+        """Queue the same ECP POST on several Rokus at once; results keyed by IP"""
+        return broker.call('roku_fanout', ips=list(ips), endpoint=endpoint, deadline=deadline)
+
+    def apps(self, ip):
+        """Installed apps, or an error straight away if the Roku is known to be offline"""
+        return broker.call('roku_apps', ip=ip)
+
+    def icon(self, ip, app_id, etag=None):
+        """Cached app icon; not_modified instead of the data if etag still matches"""
+        return broker.call('roku_icon', ip=ip, app_id=app_id, etag=etag)
+
+    def liveness(self):
+        """Reachability and breaker state per mapped Roku IP"""
+        return broker.call('roku_liveness')
+
+    def seen(self, device_info):
+        """Record a device found by discovery"""
+        try:
+            broker.call('roku_seen', device=device_info)
+        except (OSError, RuntimeError) as e:
+            logger.warning(f"Could not record Roku {device_info.get('serial')}: {e}")
+
+    def devices(self):
+        """Known Rokus with their last-seen times"""
+        return broker.call('roku_registry')
+
+    def mapped(self, ips):
+        """Pre-connect to newly mapped Rokus and fetch their app lists"""
+        try:
+            broker.call('roku_mapped', ips=list(ips))
+        except (OSError, RuntimeError) as e:
+            logger.warning(f"Could not warm up mapped Rokus: {e}")
+
+roku_client = RokuClient()
+
+# Routes
+@app.before_request
+def start_request_timer():
+    g.request_start = time.monotonic()
+
+@app.after_request
+def record_request_time(response):
+    if 'request_start' in g:
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        HTTP_REQUEST_SECONDS.observe(time.monotonic() - g.request_start,
+                                     request.method, route, str(response.status_code))
+    return response
+
+stream_slots = threading.BoundedSemaphore(SSE_MAX_STREAMS)
+
+def event_stream(events):
+    """Server-Sent Events response holding a stream slot until it closes, or a 503 if none is free"""
+    if not stream_slots.acquire(blocking=False):
+        response = jsonify({
+            'success': False,
+            'error': 'Too many open event streams, try again later'
+        })
+        response.headers['Retry-After'] = str(SSE_RETRY_AFTER)
+        return response, 503
+    response = Response(
+        events,
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'
+        }
+    )
+    response.call_on_close(stream_slots.release)
+    return response
+
+def serial_unavailable(**fields):
+    """503 reply for a request that hit a down serial link, with Retry-After"""
+    link = serial_client.status()['link']
+    response = jsonify({
+        'success': False,
+        'error': SERIAL_LINK_DOWN,
+        'link': link,
+        **fields
+    })
+    response.headers['Retry-After'] = str(link['retry_after'] or 1)
+    return response, 503
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Prometheus metrics merged across all workers"""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
 
-# Routes
 @app.route('/')
 def index():
     with open('static/index.html', 'r') as f:
@@ -558,8 +3105,33 @@ def send_command():
                 'error': 'No command provided'
             }), 400
             
-        response, error = serial_manager.send_command(command)
+        # Reject commands the device would ignore before they tie up the port
+        error = None if data.get('raw') else validate_command(command)
+        if error:
+            return jsonify({
+                'success': False,
+                'error': error
+            }), 400
+            
+        # Read commands may be answered from the state shadow
+        max_age = data.get('max_age')
+        if max_age is not None:
+            response = serial_client.read_cached(command, float(max_age))
+            if response is not None:
+                return jsonify({
+                    'success': True,
+                    'command': command,
+                    'response': response,
+                    'cached': True
+                })
+            
+        # Optional deadline (seconds) after which the request is dropped unsent
+        timeout = data.get('timeout')
+        response, error = serial_client.send_command(command, float(timeout) if timeout else None)
         
+        if error == SERIAL_LINK_DOWN:
+            return serial_unavailable()
+            
         if error:
             return jsonify({
                 'success': False,
@@ -579,20 +3151,77 @@ def send_command():
             'error': str(e)
         }), 500
 
+@app.route('/api/command/batch', methods=['POST'])
+def send_command_batch():
+    """Send several RS-232 commands back-to-back and return every reply"""
+    try:
+        data = request.get_json()
+        commands = data.get('commands')
+        
+        if not isinstance(commands, list) or not commands:
+            return jsonify({
+                'success': False,
+                'error': 'A non-empty list of commands is required'
+            }), 400
+            
+        if len(commands) > MAX_BATCH_COMMANDS:
+            return jsonify({
+                'success': False,
+                'error': f'At most {MAX_BATCH_COMMANDS} commands per batch'
+            }), 400
+            
+        commands = [str(command).strip() for command in commands]
+        if not all(commands):
+            return jsonify({
+                'success': False,
+                'error': 'Empty command in batch'
+            }), 400
+            
+        if not data.get('raw'):
+            for command in commands:
+                error = validate_command(command)
+                if error:
+                    return jsonify({
+                        'success': False,
+                        'error': error
+                    }), 400
+            
+        start_time = time.monotonic()
+        timeout = data.get('timeout')
+        results = serial_client.send_batch(commands, float(timeout) if timeout else None)
+        duration_ms = round((time.monotonic() - start_time) * 1000, 1)
+        
+        if any(result['error'] == SERIAL_LINK_DOWN for result in results):
+            return serial_unavailable(results=results, duration_ms=duration_ms)
+        
+        return jsonify({
+            'success': not any(result['error'] for result in results),
+            'results': results,
+            'duration_ms': duration_ms
+        })
+        
+    except Exception as e:
+        logger.error(f"Error processing command batch: {e}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
 @app.route('/api/status', methods=['GET'])
 def get_status():
     """Get current system status"""
     try:
-        # Try to get power status
-        response, error = serial_manager.send_command('r power!')
-        power_on = False
-        if response and 'power on' in response.lower():
-            power_on = True
+        # Power state comes from the shadow unless it is older than max_age
+        max_age = request.args.get('max_age', STATUS_MAX_AGE, type=float)
+        power = serial_client.get_state(['power'], max_age).get('power')
+        power_on = bool(power and power['value'])
+        status = serial_client.status()
             
         return jsonify({
             'success': True,
-            'connected': serial_manager.connected,
-            'port': serial_manager.port,
+            'connected': status['connected'],
+            'port': status['port'],
+            'link': status['link'],
             'power_on': power_on
         })
         
@@ -602,17 +3231,85 @@ def get_status():
             'error': str(e)
         }), 500
 
+@app.route('/api/serial/queue', methods=['GET'])
+def get_serial_queue():
+    """Get serial scheduler queue depth and wait times per priority class"""
+    try:
+        return jsonify({
+            'success': True,
+            'queue': serial_client.queue_status()
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@app.route('/api/state', methods=['GET'])
+def get_state():
+    """Get the decoded device state (typed values, enum labels, per-field freshness)"""
+    try:
+        fields = request.args.get('fields')
+        fields = fields.split(',') if fields else list(STATE_FIELDS)
+        unknown = [field for field in fields if field not in STATE_FIELDS]
+        if unknown:
+            return jsonify({
+                'success': False,
+                'error': f'Unknown state fields: {", ".join(unknown)}'
+            }), 400
+        
+        max_age = request.args.get('max_age', type=float)
+        state = serial_client.get_state(fields, max_age)
+        
+        return jsonify({
+            'success': True,
+            'state': state
+        })
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@app.route('/api/events', methods=['GET'])
+def state_events():
+    """Stream changed state fields to the browser as Server-Sent Events"""
+    last_event_id = request.headers.get('Last-Event-ID', 0, type=int)
+    
+    def generate():
+        version = last_event_id
+        while True:
+            try:
+                changes = serial_client.wait_changes(version, EVENTS_WAIT)
+            except (OSError, RuntimeError) as e:
+                logger.warning(f"State event stream error: {e}")
+                yield "event: error\ndata: {}\n\n"
+                time.sleep(EVENTS_WAIT / 5)
+                continue
+            if changes['fields']:
+                yield f"id: {changes['version']}\ndata: {json.dumps(changes['fields'])}\n\n"
+            else:
+                # Keep proxies from closing an idle stream
+                yield ": keep-alive\n\n"
+            version = changes['version']
+
+    return event_stream(generate())
+
 @app.route('/api/history', methods=['GET'])
 def get_history():
-    """Get command history"""
+    """Get command history, optionally only entries after a sequence number"""
     try:
-        limit = min(request.args.get('limit', 25, type=int), 50)
-        history = command_history[-limit:] if limit else command_history
+        limit = min(request.args.get('limit', 25, type=int), HISTORY_SIZE)
+        since = request.args.get('since', 0, type=int)
+        history = serial_client.history(since, limit)
         
         return jsonify({
             'success': True,
-            'count': len(history),
-            'history': history
+            'count': len(history['history']),
+            'last_seq': history['last_seq'],
+            'more': history['more'],
+            'history': history['history']
         })
         
     except Exception as e:
@@ -624,12 +3321,17 @@ def get_history():
 @app.route('/api/history', methods=['DELETE'])
 def clear_history():
     """Clear command history"""
-    global command_history
-    command_history = []
-    return jsonify({
-        'success': True,
-        'message': 'Command history cleared'
-    })
+    try:
+        serial_client.clear_history()
+        return jsonify({
+            'success': True,
+            'message': 'Command history cleared'
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
 
 # Configuration API endpoints
 @app.route('/api/config/serial', methods=['GET'])
@@ -637,10 +3339,12 @@ def get_serial_config():
     """Get current serial port configuration"""
     try:
         available_ports = get_available_serial_ports()
+        status = serial_client.status()
         return jsonify({
             'success': True,
             'current_port': config.SERIAL_PORT,
-            'connected': serial_manager.connected,
+            'connected': status['connected'],
+            'link_state': status['link']['state'],
             'available_ports': available_ports
         })
     except Exception as e:
@@ -679,13 +3383,14 @@ def set_serial_config():
                 'error': 'Failed to save configuration'
             }), 500
         
-        # Update serial manager
-        connection_success = serial_manager.update_port(new_port)
+        # The serial owner reopens the port in the background
+        link = serial_client.update_port(new_port)
         
         return jsonify({
             'success': True,
             'message': f'Serial port updated to {new_port}',
-            'connected': connection_success,
+            'connected': False,
+            'link_state': link['state'],
             'port': new_port
         })
         
@@ -695,12 +3400,188 @@ def set_serial_config():
             'error': str(e)
         }), 500
 
+# Scene API endpoints
+@app.route('/api/scenes', methods=['GET'])
+def get_scenes():
+    """Get saved scenes"""
+    try:
+        return jsonify({
+            'success': True,
+            'scenes': load_scenes()
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@app.route('/api/scenes', methods=['POST'])
+def save_scene():
+    """Save a scene from explicit settings or by capturing the current device state"""
+    try:
+        data = request.get_json()
+        name = str(data.get('name', '')).strip()
+        if not name:
+            return jsonify({
+                'success': False,
+                'error': 'Scene name is required'
+            }), 400
+            
+        settings = data.get('settings')
+        if settings is None:
+            settings = capture_scene(float(data.get('max_age', SCENE_CAPTURE_MAX_AGE)))
+            
+        error = validate_scene(settings)
+        if error:
+            return jsonify({
+                'success': False,
+                'error': error
+            }), 400
+            
+        scenes = load_scenes()
+        scenes[name] = settings
+        if not save_scenes(scenes):
+            return jsonify({
+                'success': False,
+                'error': 'Failed to save scene'
+            }), 500
+            
+        return jsonify({
+            'success': True,
+            'name': name,
+            'settings': settings
+        })
+        
+    except Exception as e:
+        logger.error(f"Error saving scene: {e}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@app.route('/api/scenes/<name>', methods=['DELETE'])
+def delete_scene(name):
+    """Delete a saved scene"""
+    try:
+        scenes = load_scenes()
+        if scenes.pop(name, None) is None:
+            return jsonify({
+                'success': False,
+                'error': f'Unknown scene: {name}'
+            }), 404
+            
+        if not save_scenes(scenes):
+            return jsonify({
+                'success': False,
+                'error': 'Failed to save scenes'
+            }), 500
+            
+        return jsonify({
+            'success': True,
+            'message': f'Scene {name} deleted'
+        })
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@app.route('/api/scenes/<name>/apply', methods=['POST'])
+def apply_scene(name):
+    """Apply a saved scene, sending only the settings that differ from the device"""
+    try:
+        settings = load_scenes().get(name)
+        if settings is None:
+            return jsonify({
+                'success': False,
+                'error': f'Unknown scene: {name}'
+            }), 404
+            
+        # Scenes saved before values were range-checked may hold bad ones
+        error = validate_scene(settings)
+        if error:
+            return jsonify({
+                'success': False,
+                'error': error
+            }), 400
+            
+        data = request.get_json(silent=True) or {}
+        max_age = data.get('max_age')
+        timeout = data.get('timeout')
+        
+        start_time = time.monotonic()
+        plan = serial_client.apply_scene(
+            settings,
+            max_age=float(max_age) if max_age is not None else None,
+            dry_run=bool(data.get('dry_run')),
+            timeout=float(timeout) if timeout else None
+        )
+        duration_ms = round((time.monotonic() - start_time) * 1000, 1)
+        
+        if any(result['error'] == SERIAL_LINK_DOWN for result in plan['results']):
+            return serial_unavailable(scene=name, commands=plan['commands'], results=plan['results'],
+                                      duration_ms=duration_ms)
+        
+        return jsonify({
+            'success': not any(result['error'] for result in plan['results']),
+            'scene': name,
+            'commands': plan['commands'],
+            'skipped': plan['skipped'],
+            'results': plan['results'],
+            'duration_ms': duration_ms
+        })
+        
+    except Exception as e:
+        logger.error(f"Error applying scene {name}: {e}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
 # Roku API endpoints
 @app.route('/api/roku/discover', methods=['GET'])
 def roku_discover():
     """Discover Roku devices on network"""
+    scan = bool(request.args.get('scan'))
+    if request.args.get('stream'):
+        return roku_discover_stream(scan)
+    try:
+        devices = discover_roku_devices(scan)
+        return jsonify({
+            'success': True,
+            'devices': devices
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+def roku_discover_stream(scan=False):
+    """Stream each discovered Roku as a Server-Sent Event as soon as it is identified"""
+    def generate():
+        count = 0
+        try:
+            for device_info in discover_roku_devices_stream(scan):
+                count += 1
+                yield f"event: device\ndata: {json.dumps(device_info)}\n\n"
+        except Exception as e:
+            logger.error(f"Roku discovery stream failed: {e}")
+            yield f"event: error\ndata: {json.dumps({'error': str(e)})}\n\n"
+        yield f"event: done\ndata: {json.dumps({'count': count})}\n\n"
+
+    return event_stream(generate())
+
+@app.route('/api/roku/registry', methods=['GET'])
+def get_roku_registry():
+    """Get every Roku seen on the network with its current IP and last-seen time"""
     try:
-        devices = discover_roku_devices()
+        mappings = load_roku_mappings()
+        devices = roku_client.devices()
+        for device in devices:
+            device['hdmi'] = sorted(hdmi for hdmi, mapping in mappings.items()
+                                    if mapping.get('serial') == device['serial'])
         return jsonify({
             'success': True,
             'devices': devices
@@ -711,6 +3592,31 @@ def roku_discover():
             'error': str(e)
         }), 500
 
+@app.route('/api/roku/status', methods=['GET'])
+def get_roku_status():
+    """Get reachability of the Roku mapped to each HDMI input"""
+    try:
+        liveness = roku_client.liveness()
+        status = {}
+        for hdmi, mapping in load_roku_mappings().items():
+            entry = liveness.get(mapping.get('ip'), {})
+            status[hdmi] = {
+                'ip': mapping.get('ip'),
+                'state': entry.get('state'),
+                'failures': entry.get('failures', 0),
+                'last_ok': entry.get('last_ok'),
+                'last_error': entry.get('last_error')
+            }
+        return jsonify({
+            'success': True,
+            'devices': status
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
 @app.route('/api/roku/mappings', methods=['GET'])
 def get_roku_mappings():
     """Get current Roku device mappings"""
@@ -734,6 +3640,7 @@ def set_roku_mappings():
         mappings = data.get('mappings', {})
         
         if save_roku_mappings(mappings):
+            roku_client.mapped(mapping['ip'] for mapping in mappings.values() if mapping.get('ip'))
             return jsonify({
                 'success': True,
                 'message': 'Roku mappings saved successfully'
@@ -749,6 +3656,38 @@ def set_roku_mappings():
             'error': str(e)
         }), 500
 
+def roku_offline(error):
+    """503 reply for a Roku whose circuit breaker is open"""
+    response = jsonify({
+        'success': False,
+        'offline': True,
+        'error': error
+    })
+    response.headers['Retry-After'] = str(ROKU_PROBE_ACTIVE_INTERVAL)
+    return response, 503
+
+def roku_post_response(result, sent_message, queued_message):
+    """Reply for a queued ECP command: 200 once acknowledged, 202 while queued, 502 on failure"""
+    if result.get('offline'):
+        return roku_offline(result['error'])
+    if not result['success']:
+        return jsonify({
+            'success': False,
+            'error': result['error']
+        }), 502
+    if not result['acked']:
+        return jsonify({
+            'success': True,
+            'queued': True,
+            'message': queued_message
+        }), 202
+    return jsonify({
+        'success': True,
+        'queued': False,
+        'latency_ms': result['latency_ms'],
+        'message': sent_message
+    })
+
 @app.route('/api/roku/command', methods=['POST'])
 def roku_command():
     """Send command to Roku device"""
@@ -780,13 +3719,10 @@ def roku_command():
                 'error': 'Invalid device mapping'
             }), 400
         
-        # Send command
-        success = send_roku_command(ip, command)
-        
-        return jsonify({
-            'success': success,
-            'message': f'Command {command} sent to HDMI {hdmi_input}' if success else 'Failed to send command'
-        })
+        # Queue the keypress; optionally wait briefly for the Roku to take it
+        result = roku_client.post(ip, f'keypress/{command}', float(data.get('wait', 0)))
+        return roku_post_response(result, f'Command {command} sent to HDMI {hdmi_input}',
+                                  f'Command {command} queued for HDMI {hdmi_input}')
         
     except Exception as e:
         return jsonify({
@@ -814,11 +3750,18 @@ def get_roku_device_apps(hdmi):
                 'error': 'Invalid device mapping'
             }), 400
         
-        apps = get_roku_apps(ip)
+        result = roku_client.apps(ip)
+        if result.get('offline'):
+            return roku_offline(result['error'])
+        if not result['success']:
+            return jsonify({
+                'success': False,
+                'error': result['error']
+            }), 502
         
         return jsonify({
             'success': True,
-            'apps': apps
+            'apps': [dict(app, icon=f"/api/roku/icon/{hdmi}/{app['id']}") for app in result['apps']]
         })
         
     except Exception as e:
@@ -827,6 +3770,35 @@ def get_roku_device_apps(hdmi):
             'error': str(e)
         }), 500
 
+@app.route('/api/roku/icon/<int:hdmi>/<app_id>', methods=['GET'])
+def get_roku_app_icon(hdmi, app_id):
+    """Get an app icon for the Roku on an HDMI input, cacheable by ETag"""
+    try:
+        device_info = load_roku_mappings().get(str(hdmi))
+        if not device_info or not device_info.get('ip'):
+            return jsonify({
+                'success': False,
+                'error': f'No Roku device mapped to HDMI {hdmi}'
+            }), 404
+        
+        etag = request.headers.get('If-None-Match', '').strip().removeprefix('W/').strip('"') or None
+        result = roku_client.icon(device_info['ip'], app_id, etag)
+        if not result['success']:
+            return jsonify(result), 404
+        
+        headers = {
+            'ETag': f'"{result["etag"]}"',
+            'Cache-Control': f'private, max-age={ROKU_ICON_MAX_AGE}'
+        }
+        if result.get('not_modified'):
+            return Response(status=304, headers=headers)
+        return Response(base64.b64decode(result['data']), mimetype=result['content_type'], headers=headers)
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
 @app.route('/api/roku/launch', methods=['POST'])
 def roku_launch_app():
     """Launch app on Roku device"""
@@ -851,12 +3823,89 @@ def roku_launch_app():
             }), 404
         
         ip = device_info.get('ip')
-        success = launch_roku_app(ip, app_id)
+        if not ip:
+            return jsonify({
+                'success': False,
+                'error': 'Invalid device mapping'
+            }), 400
+        
+        # Launches share the keypress queue, so they stay in order with presses
+        result = roku_client.post(ip, f'launch/{app_id}', float(data.get('wait', 0)))
+        return roku_post_response(result, f'App launched on HDMI {hdmi_input}',
+                                  f'App launch queued for HDMI {hdmi_input}')
         
+    except Exception as e:
         return jsonify({
-            'success': success,
-            'message': f'App launched on HDMI {hdmi_input}' if success else 'Failed to launch app'
-        })
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@app.route('/api/roku/fanout', methods=['POST'])
+def roku_fanout():
+    """Send the same command or app launch to several Roku devices concurrently"""
+    try:
+        data = request.get_json()
+        targets = data.get('hdmi', 'all')
+        command = data.get('command')
+        app_id = data.get('app_id')
+        
+        if bool(command) == bool(app_id):
+            return jsonify({
+                'success': False,
+                'error': 'Either command or app_id is required'
+            }), 400
+        
+        mappings = load_roku_mappings()
+        if targets == 'all':
+            targets = [hdmi for hdmi, device_info in sorted(mappings.items()) if device_info.get('ip')]
+        elif isinstance(targets, list) and targets:
+            targets = [str(hdmi) for hdmi in targets]
+        else:
+            return jsonify({
+                'success': False,
+                'error': 'hdmi must be a list of HDMI inputs or "all"'
+            }), 400
+        
+        unmapped = [hdmi for hdmi in targets if not mappings.get(hdmi, {}).get('ip')]
+        if unmapped or not targets:
+            return jsonify({
+                'success': False,
+                'error': f"No Roku device mapped to HDMI {', '.join(unmapped)}" if unmapped
+                         else 'No Roku devices configured'
+            }), 404
+        
+        endpoint = f'keypress/{command}' if command else f'launch/{app_id}'
+        deadline = float(data.get('deadline', ROKU_FANOUT_DEADLINE))
+        start_time = time.monotonic()
+        by_ip = roku_client.fanout((mappings[hdmi]['ip'] for hdmi in targets), endpoint, deadline)
+        duration_ms = round((time.monotonic() - start_time) * 1000, 1)
+        
+        results = {}
+        for hdmi in targets:
+            ip = mappings[hdmi]['ip']
+            result = by_ip[ip]
+            results[hdmi] = {
+                'ip': ip,
+                'success': result['success'],
+                'queued': not result['acked']
+            }
+            if result.get('latency_ms') is not None:
+                results[hdmi]['latency_ms'] = result['latency_ms']
+            if result.get('error'):
+                results[hdmi]['error'] = result['error']
+            if result.get('offline'):
+                results[hdmi]['offline'] = True
+        
+        failed = [hdmi for hdmi, result in results.items() if not result['success']]
+        queued = [hdmi for hdmi, result in results.items() if result['queued']]
+        return jsonify({
+            'success': not failed,
+            'sent': len(results) - len(failed) - len(queued),
+            'queued': len(queued),
+            'failed': len(failed),
+            'duration_ms': duration_ms,
+            'results': results
+        }), 502 if len(failed) == len(results) else 200
         
     except Exception as e:
         return jsonify({
@@ -1117,11 +4166,8 @@ def internal_error(error):
 
 def main():
     """Main entry point"""
-    # Try to connect to serial port on startup
-    if serial_manager.connect():
-        logger.info("Successfully connected to Orei device")
-    else:
-        logger.warning("Could not connect to serial port on startup")
+    # Take ownership of the serial port; the supervisor connects in the background
+    broker.elect()
         
     # Run Flask app
     app.run(
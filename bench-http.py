@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+"""Load-test the control API against the simulated Orei device and stub Rokus"""
+
+import argparse
+import json
+import os
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from orei_simulator import OreiSimulator
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Stub Rokus listen on their own loopback address (ECP is always port 8060)
+ROKU_ECP_PORT = 8060
+ROKU_KEYS = ['Up', 'Down', 'Left', 'Right', 'Select', 'Back', 'Home', 'Play']
+
+# Scenes the scene_change action flips between
+BENCH_SCENES = {
+    'bench-quad': {'multiview': 5, 'quad_mode': 1, 'window_1_input': 1, 'window_2_input': 2,
+                   'window_3_input': 3, 'window_4_input': 4, 'audio_source': 0, 'audio_volume': 30},
+    'bench-pip': {'multiview': 2, 'pip_position': 3, 'pip_size': 1, 'window_1_input': 2,
+                  'window_2_input': 1, 'audio_source': 2, 'audio_volume': 30},
+}
+
+DEFAULT_MIX = 'ui_refresh=5,slider_drag=3,scene_change=1,roku=2'
+
+class StubRokuHandler(BaseHTTPRequestHandler):
+    """Answers the ECP requests the app makes after a fixed delay"""
+    # Rokus keep connections alive
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        super().setup()
+        self.server.connections += 1
+
+    def do_POST(self):
+        time.sleep(self.server.latency)
+        self.server.keypresses += self.path.startswith('/keypress/')
+        self.send_response(200)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def do_GET(self):
+        time.sleep(self.server.latency)
+        if self.path == '/query/apps':
+            body = b'<apps><app id="12" type="appl" version="1.0">Netflix</app></apps>'
+        else:
+            body = b'<device-info><model-name>Stub Roku</model-name></device-info>'
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/xml')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def start_stub_rokus(count, latency):
+    """Start stub ECP servers on 127.0.0.11, .12, ... and return them"""
+    servers = []
+    for index in range(count):
+        server = ThreadingHTTPServer((f'127.0.0.{11 + index}', ROKU_ECP_PORT), StubRokuHandler)
+        server.latency = latency
+        server.keypresses = 0
+        server.connections = 0
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+    return servers
+
+def start_app(workdir, port, device_port, rokus, workers, threads):
+    """Run the app under gunicorn (as deployed) in a scratch directory"""
+    with open(os.path.join(workdir, 'app_config.json'), 'w') as f:
+        json.dump({'serial_port': device_port, 'baud_rate': 115200}, f)
+    with open(os.path.join(workdir, 'roku_devices.json'), 'w') as f:
+        json.dump({str(index + 1): {'ip': server.server_address[0], 'name': f'Stub Roku {index + 1}'}
+                   for index, server in enumerate(rokus)}, f)
+    with open(os.path.join(workdir, 'scenes.json'), 'w') as f:
+        json.dump(BENCH_SCENES, f)
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '--chdir', workdir, '--pythonpath', APP_DIR,
+         '--bind', f'127.0.0.1:{port}', '--workers', str(workers), '--worker-class', 'gthread',
+         '--threads', str(threads), '--timeout', '120', '--log-level', 'warning', 'app:app'],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    base_url = f'http://127.0.0.1:{port}'
+    deadline = time.monotonic() + 15
+    while time.monotonic() < deadline:
+        try:
+            requests.get(f'{base_url}/api/version', timeout=1)
+            return process, base_url
+        except requests.exceptions.RequestException:
+            time.sleep(0.1)
+    process.terminate()
+    raise RuntimeError('App did not start')
+
+class BenchClient:
+    """One simulated browser issuing a weighted mix of actions"""
+
+    def __init__(self, base_url, roku_count, timeout, seed):
+        self.base_url = base_url
+        self.roku_count = roku_count
+        self.timeout = timeout
+        self.random = random.Random(seed)
+        self.session = requests.Session()
+        self.volume = 30
+        self.scene = 0
+
+    def _post(self, path, payload):
+        return self.session.post(f'{self.base_url}{path}', json=payload, timeout=self.timeout)
+
+    def _get(self, path):
+        return self.session.get(f'{self.base_url}{path}', timeout=self.timeout)
+
+    # Actions return the responses they made; each response is one sample
+    def ui_refresh(self):
+        """A tab refreshing its status bar and current layout"""
+        return [
+            self._get('/api/status'),
+            self._get('/api/state?fields=multiview,window_1_input,window_2_input,audio_volume&max_age=5'),
+            self._post('/api/command', {'command': 'r multiview!'}),
+        ]
+
+    def slider_drag(self):
+        """A volume slider drag: a burst of set commands 100 ms apart"""
+        responses = []
+        for _ in range(5):
+            self.volume = max(0, min(100, self.volume + self.random.choice((-2, 2))))
+            responses.append(self._post('/api/command', {'command': f's output audio vol {self.volume}!'}))
+            time.sleep(0.1)
+        return responses
+
+    def scene_change(self):
+        """Switch between the bench scenes"""
+        self.scene = 1 - self.scene
+        return [self._post(f'/api/scenes/{list(BENCH_SCENES)[self.scene]}/apply', {})]
+
+    def roku(self):
+        """A remote-control keypress"""
+        hdmi = self.random.randint(1, self.roku_count)
+        return [self._post('/api/roku/command', {'hdmi': hdmi, 'command': self.random.choice(ROKU_KEYS)})]
+
+def classify(response):
+    """Sort a response into ok, timeout (deadline exceeded) or error"""
+    if response.status_code in (503, 504):
+        return 'timeout'
+    try:
+        data = response.json()
+    except ValueError:
+        return 'error'
+    if data.get('success'):
+        return 'ok'
+    errors = [data.get('error') or ''] + [result.get('error') or '' for result in data.get('results', [])]
+    return 'timeout' if any('deadline' in error or 'timed out' in error for error in errors) else 'error'
+
+def run_client(client, mix, stop_at, samples, lock):
+    actions, weights = zip(*mix.items())
+    while time.monotonic() < stop_at:
+        action = client.random.choices(actions, weights)[0]
+        start = time.perf_counter()
+        try:
+            responses = getattr(client, action)()
+            outcomes = [classify(response) for response in responses]
+            elapsed = [response.elapsed.total_seconds() * 1000 for response in responses]
+        except requests.exceptions.Timeout:
+            outcomes, elapsed = ['timeout'], [(time.perf_counter() - start) * 1000]
+        except requests.exceptions.RequestException:
+            # Connection refused or reset: the server dropped the request
+            outcomes, elapsed = ['dropped'], [(time.perf_counter() - start) * 1000]
+        with lock:
+            samples.setdefault(action, []).extend(zip(elapsed, outcomes))
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a sorted list"""
+    return values[min(len(values) - 1, int(round(fraction * (len(values) - 1))))]
+
+def summarize(samples, duration):
+    """Throughput, latency percentiles and outcome counts per action and overall"""
+    summary = {}
+    everything = []
+    for action, entries in sorted(samples.items()):
+        everything.extend(entries)
+        summary[action] = _stats(entries, duration)
+    summary['all'] = _stats(everything, duration)
+    return summary
+
+def _stats(entries, duration):
+    latencies = sorted(latency for latency, _ in entries)
+    outcomes = [outcome for _, outcome in entries]
+    if not latencies:
+        return {'requests': 0}
+    return {
+        'requests': len(entries),
+        'throughput_rps': round(len(entries) / duration, 1),
+        'p50_ms': round(percentile(latencies, 0.50), 1),
+        'p95_ms': round(percentile(latencies, 0.95), 1),
+        'p99_ms': round(percentile(latencies, 0.99), 1),
+        'mean_ms': round(statistics.mean(latencies), 1),
+        'ok': outcomes.count('ok'),
+        'errors': outcomes.count('error'),
+        'timeouts': outcomes.count('timeout'),
+        'dropped': outcomes.count('dropped'),
+    }
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(','):
+        action, _, weight = part.partition('=')
+        if action not in ('ui_refresh', 'slider_drag', 'scene_change', 'roku'):
+            raise argparse.ArgumentTypeError(f'Unknown action: {action}')
+        mix[action] = float(weight or 1)
+    return mix
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('-c', '--clients', type=int, default=6, help='Concurrent clients (tablets, panels)')
+    parser.add_argument('-d', '--duration', type=float, default=20, help='Test length (s)')
+    parser.add_argument('--mix', type=parse_mix, default=parse_mix(DEFAULT_MIX),
+                        help=f'Weighted action mix (default {DEFAULT_MIX})')
+    parser.add_argument('--latency', type=float, default=15, help='Simulated device reply latency (ms)')
+    parser.add_argument('--roku-latency', type=float, default=30, help='Stub Roku reply latency (ms)')
+    parser.add_argument('--rokus', type=int, default=4, help='Number of stub Rokus (one per HDMI input)')
+    parser.add_argument('--workers', type=int, default=2, help='Gunicorn workers')
+    parser.add_argument('--threads', type=int, default=8, help='Threads per gunicorn worker')
+    parser.add_argument('--port', type=int, default=5099, help='Port to run the app on')
+    parser.add_argument('--timeout', type=float, default=15, help='Client request timeout (s)')
+    parser.add_argument('--seed', type=int, default=1, help='Random seed for the action mix')
+    parser.add_argument('--json', action='store_true', help='Print machine-readable results')
+    args = parser.parse_args()
+
+    device = OreiSimulator(latency=args.latency / 1000).start()
+    rokus = start_stub_rokus(args.rokus, args.roku_latency / 1000)
+    workdir = tempfile.mkdtemp(prefix='orei-bench-')
+    process, base_url = start_app(workdir, args.port, device.port, rokus, args.workers, args.threads)
+
+    try:
+        samples = {}
+        lock = threading.Lock()
+        stop_at = time.monotonic() + args.duration
+        clients = [threading.Thread(target=run_client, args=(
+            BenchClient(base_url, args.rokus, args.timeout, args.seed + index), args.mix, stop_at, samples, lock))
+            for index in range(args.clients)]
+        start = time.monotonic()
+        for client in clients:
+            client.start()
+        for client in clients:
+            client.join()
+        duration = time.monotonic() - start
+
+        # Scheduler statistics: how long commands waited for the serial port
+        queue = requests.get(f'{base_url}/api/serial/queue', timeout=5).json().get('queue', {})
+    finally:
+        process.terminate()
+        process.wait()
+        device.stop()
+        for server in rokus:
+            server.shutdown()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    results = {
+        'config': {
+            'clients': args.clients,
+            'duration_s': round(duration, 1),
+            'mix': args.mix,
+            'device_latency_ms': args.latency,
+            'roku_latency_ms': args.roku_latency,
+            'workers': args.workers,
+            'threads': args.threads,
+        },
+        'actions': summarize(samples, duration),
+        'serial': {
+            'commands_on_wire': len(device.received),
+            'lock_wait': queue.get('classes', {}),
+        },
+        'roku_keypresses': sum(server.keypresses for server in rokus),
+        'roku_connections': sum(server.connections for server in rokus),
+    }
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return 0
+
+    print(f"{'action':<14}{'reqs':>7}{'rps':>8}{'p50':>9}{'p95':>9}{'p99':>9}{'err':>6}{'tmo':>6}{'drop':>6}")
+    for action, stats in results['actions'].items():
+        if not stats['requests']:
+            continue
+        print(f"{action:<14}{stats['requests']:>7}{stats['throughput_rps']:>8.1f}"
+              f"{stats['p50_ms']:>7.1f}ms{stats['p95_ms']:>7.1f}ms{stats['p99_ms']:>7.1f}ms"
+              f"{stats['errors']:>6}{stats['timeouts']:>6}{stats['dropped']:>6}")
+    print()
+    print(f"serial commands on the wire: {results['serial']['commands_on_wire']}")
+    for name, stats in results['serial']['lock_wait'].items():
+        print(f"  {name:<18} dispatched {stats.get('dispatched', 0):>5}  "
+              f"wait avg {stats.get('wait_ms_avg', 0):>7.1f}ms  max {stats.get('wait_ms_max', 0):>7.1f}ms  "
+              f"expired {stats.get('expired', 0)}  coalesced {stats.get('coalesced', 0)}")
+    print(f"roku keypresses: {results['roku_keypresses']} over {results['roku_connections']} connection(s)")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""Benchmark RS-232 round-trip latency against the simulated Orei device"""
+
+import argparse
+import json
+import statistics
+import sys
+import time
+
+import app
+from orei_simulator import OreiSimulator
+
+# Commands timed on every path (power 1 is run once at the end)
+COMMANDS = [
+    'r power',
+    'r multiview',
+    'r window 1 in',
+    'r output audio vol',
+    's output audio vol 30',
+    'r output res',
+    'r PIP position',
+]
+
+class LegacySerialManager(app.SerialManager):
+    """SerialManager with the original fixed-sleep, keyword-terminated read"""
+
+    def send_command(self, command):
+        if not self.connected:
+            if not self.connect():
+                return None, "Serial port not connected"
+        if not command.endswith('!'):
+            command += '!'
+        with app.serial_lock:
+            self.serial_port.reset_input_buffer()
+            self.serial_port.write(command.encode('ascii'))
+            time.sleep(0.2)
+            response_lines = []
+            start_time = time.time()
+            while (time.time() - start_time) < app.config.TIMEOUT:
+                if self.serial_port.in_waiting:
+                    line = self.serial_port.readline().decode('ascii', errors='ignore').strip()
+                    if line:
+                        response_lines.append(line)
+                        if any(keyword in line.lower() for keyword in
+                               ['on', 'off', 'hdmi', 'mode', 'screen', 'finished', 'ok']):
+                            break
+                else:
+                    time.sleep(0.01)
+            return (' '.join(response_lines) if response_lines else "No response"), None
+
+class PollingSerialManager(app.SerialManager):
+    """SerialManager with framing but the old in_waiting/sleep read loop"""
+
+    def _read_reply(self, frame, deadline):
+        lines = []
+        last_line_at = None
+        while time.monotonic() < deadline:
+            if self.serial_port.in_waiting:
+                line = self.serial_port.readline().decode('ascii', errors='ignore').strip()
+                if line:
+                    lines.append(line)
+                    last_line_at = time.monotonic()
+                    if frame.is_complete(lines):
+                        break
+            elif (frame.lines is None and last_line_at
+                  and time.monotonic() - last_line_at >= app.config.IDLE_GAP):
+                break
+            else:
+                time.sleep(0.01)
+        return lines
+
+def run_path(manager, commands, iterations):
+    """Time every command and return per-command latency and CPU stats in ms"""
+    results = {}
+    manager.connect()
+    for command in commands:
+        samples = []
+        cpu_samples = []
+        response = None
+        for _ in range(iterations):
+            start = time.perf_counter()
+            cpu_start = time.thread_time()
+            response, error = manager.send_command(command + '!')
+            cpu_samples.append((time.thread_time() - cpu_start) * 1000)
+            samples.append((time.perf_counter() - start) * 1000)
+        results[command] = {
+            'mean_ms': round(statistics.mean(samples), 2),
+            'p50_ms': round(statistics.median(samples), 2),
+            'max_ms': round(max(samples), 2),
+            'cpu_ms': round(statistics.mean(cpu_samples), 3),
+            'response': response
+        }
+    manager.disconnect()
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('-n', '--iterations', type=int, default=10, help='Round trips per command')
+    parser.add_argument('--latency', type=float, default=15, help='Simulated device reply latency (ms)')
+    parser.add_argument('--json', action='store_true', help='Print machine-readable results')
+    args = parser.parse_args()
+
+    device = OreiSimulator(latency=args.latency / 1000).start()
+    commands = COMMANDS
+
+    paths = {
+        'legacy': LegacySerialManager,
+        'polling': PollingSerialManager,
+        'framed': app.SerialManager
+    }
+    results = {path: run_path(manager_class(port=device.port), commands, args.iterations)
+               for path, manager_class in paths.items()}
+    # Power on is multi-line; one pass shows whether the full reply was framed.
+    # Let the device finish initializing before the next path sends anything.
+    for path, manager_class in paths.items():
+        results[path].update(run_path(manager_class(port=device.port), ['power 1'], 1))
+        time.sleep(device.init_delay + device.latency)
+    device.stop()
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return 0
+
+    print(f"{'command':<24}{'legacy p50':>12}{'framed p50':>12}{'speedup':>10}")
+    for command in results['legacy']:
+        legacy = results['legacy'][command]['p50_ms']
+        framed = results['framed'][command]['p50_ms']
+        print(f"{command:<24}{legacy:>10.1f}ms{framed:>10.1f}ms{legacy / framed:>9.1f}x")
+    print()
+    # CPU time spent by the calling thread per command: sleep-polling vs selectors
+    print(f"{'command':<24}{'legacy cpu':>12}{'polling cpu':>13}{'framed cpu':>12}")
+    for command in results['legacy']:
+        legacy, polling, framed = (results[path][command]['cpu_ms'] for path in paths)
+        print(f"{command:<24}{legacy:>10.3f}ms{polling:>11.3f}ms{framed:>10.3f}ms")
+    print()
+    print(f"power 1 legacy reply: {results['legacy']['power 1']['response']}")
+    print(f"power 1 framed reply: {results['framed']['power 1']['response']}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,20 @@
+"""Shared fixtures: a simulated Orei device and a serial manager connected to it"""
+
+import pytest
+
+import app
+from orei_simulator import OreiSimulator
+
+@pytest.fixture
+def device():
+    with OreiSimulator(latency=0.01, init_delay=0.05) as device:
+        yield device
+
+@pytest.fixture
+def manager(device, monkeypatch):
+    manager = app.SerialManager(port=device.port)
+    assert manager.connect()
+    # The scheduler sends through the module-level manager
+    monkeypatch.setattr(app, 'serial_manager', manager)
+    yield manager
+    manager.disconnect()
@@ -0,0 +1,378 @@
+#!/usr/bin/env python3
+"""Simulated Orei UHD-401MV on a pseudo-terminal, for testing without hardware"""
+
+import argparse
+import os
+import random
+import re
+import signal
+import sys
+import threading
+import time
+import tty
+
+# Option names as the device echoes them (ids per rs-232_commands.md)
+RESOLUTIONS = [
+    '4096x2160p60', '4096x2160p50', '3840x2160p60', '3840x2160p50', '3840x2160p30',
+    '3840x2160p25', '1920x1200p60RB', '1920x1080p60', '1920x1080p50', '1360x768p60',
+    '1280x800p60', '1280x720p60', '1280x720p50', '1024x768p60'
+]
+HDCP_MODES = ['HDCP 1.4', 'HDCP 2.2', 'HDCP OFF']
+VKA_PATTERNS = ['black screen', 'blue screen']
+ITC_MODES = ['video mode', 'PC mode']
+EDID_MODES = [
+    '4K2K60_444,Stereo Audio 2.0', '4K2K60_444,Dolby/DTS 5.1', '4K2K60_444,HD Audio 7.1',
+    '4K2K30_444,Stereo Audio 2.0', '4K2K30_444,Dolby/DTS 5.1', '4K2K30_444,HD Audio 7.1',
+    '1080P,Stereo Audio 2.0', '1080P,Dolby/DTS 5.1', '1080P,HD Audio 7.1',
+    '1920x1200,Stereo Audio 2.0', '1680x1050,Stereo Audio 2.0', '1600x1200,Stereo Audio 2.0',
+    '1440x900,Stereo Audio 2.0', '1360x768,Stereo Audio 2.0', '1280x1024,Stereo Audio 2.0',
+    '1024x768,Stereo Audio 2.0', '720p,Stereo Audio 2.0', 'Copy from HDMI out'
+]
+MULTIVIEW_MODES = ['single screen', 'PIP', 'PBP', 'triple screen', 'quad screen']
+PIP_POSITIONS = ['left top', 'left bottom', 'right top', 'right bottom']
+PIP_SIZES = ['small', 'middle', 'large']
+ASPECTS = ['full screen', '16:9']
+
+# Factory defaults (also restored by reset!)
+DEFAULT_STATE = {
+    'power': True,
+    'output_res': 3,
+    'output_hdcp': 1,
+    'output_vka': 1,
+    'output_itc': 1,
+    'input_edid': 1,
+    'audio_source': 0,
+    'audio_volume': 30,
+    'audio_mute': False,
+    'auto_switch': False,
+    'in_source': 1,
+    'multiview': 1,
+    'windows': {1: 1, 2: 2, 3: 3, 4: 4},
+    'pip_position': 3,
+    'pip_size': 3,
+    'pbp_mode': 1,
+    'pbp_aspect': 1,
+    'triple_mode': 1,
+    'triple_aspect': 1,
+    'quad_mode': 1,
+    'quad_aspect': 1,
+}
+
+DEVICE_TYPE = '4x1 HDMI Multiviewer'
+MCU_VERSION = '1.00.05'
+SCALER_VERSION = '1.00.12'
+HELP_LINES = [
+    'help!', 'r type!', 'r fw version!', 'r power!', 'power z!', 'reboot!', 'reset!',
+    'r/s output res x!', 'r/s output hdcp x!', 'r/s output vka x!', 'r/s output itc x!',
+    'r/s input EDID x!', 'r/s output audio x!', 's output audio vol+!', 's output audio vol-!',
+    'r/s output audio vol x!', 'r/s output audio mute x!', 'r/s auto switch x!', 'r/s in source x!',
+    'r/s multiview x!', 'r/s window x in y!', 'r/s PIP position x!', 'r/s PIP size x!',
+    'r/s PBP mode x!', 'r/s PBP aspect x!', 'r/s triple mode x!', 'r/s triple aspect x!',
+    'r/s quad mode x!', 'r/s quad aspect x!'
+]
+
+def _on_off(value):
+    return 'on' if value else 'off'
+
+class OreiSimulator:
+    """Stateful UHD-401MV command set behind a PTY
+
+    Point the app's serial port at `port`. Replies are sent after `latency`
+    seconds (or the longest matching prefix in `latencies`), optionally cut
+    into `chunk_size`-byte writes, with bytes dropped at `drop_rate` and a
+    garbage line injected before a reply at `garbage_rate`. While powered off
+    the device only answers power commands.
+    """
+
+    def __init__(self, latency=0.015, latencies=None, init_delay=0.5, chunk_size=None,
+                 chunk_delay=0.002, drop_rate=0.0, garbage_rate=0.0, seed=None):
+        self.latency = latency
+        self.latencies = latencies or {}
+        self.init_delay = init_delay
+        self.chunk_size = chunk_size
+        self.chunk_delay = chunk_delay
+        self.drop_rate = drop_rate
+        self.garbage_rate = garbage_rate
+        self.random = random.Random(seed)
+        self.state = self._defaults()
+        # Commands seen on the wire, for benchmarks and assertions
+        self.received = []
+        self.master, self.slave = os.openpty()
+        # Raw mode so the line discipline neither echoes nor rewrites bytes
+        tty.setraw(self.master)
+        tty.setraw(self.slave)
+        self.port = os.ttyname(self.slave)
+        self.running = False
+        self.thread = None
+        self.handlers = [(re.compile(pattern, re.IGNORECASE), handler) for pattern, handler in (
+            (r'help', lambda: list(HELP_LINES)),
+            (r'r type', lambda: [DEVICE_TYPE]),
+            (r'r fw version', lambda: [f'MCU FW version {MCU_VERSION}', f'SCALER FW version {SCALER_VERSION}']),
+            (r'r power', self._power_reply),
+            (r'power (?P<value>[01])', self._set_power),
+            (r'reboot', self._reboot),
+            (r'reset', self._reset),
+            (r'r output res', self._output_res),
+            (r's output res (?P<value>\d+)', self._setter('output_res', len(RESOLUTIONS), self._output_res)),
+            (r'r output hdcp', self._output_hdcp),
+            (r's output hdcp (?P<value>\d)', self._setter('output_hdcp', len(HDCP_MODES), self._output_hdcp)),
+            (r'r output vka', self._output_vka),
+            (r's output vka (?P<value>\d)', self._setter('output_vka', len(VKA_PATTERNS), self._output_vka)),
+            (r'r output itc', self._output_itc),
+            (r's output itc (?P<value>\d)', self._setter('output_itc', len(ITC_MODES), self._output_itc)),
+            (r'r input edid', self._input_edid),
+            (r's input edid (?P<value>\d+)', self._setter('input_edid', len(EDID_MODES), self._input_edid)),
+            (r'r output audio', self._audio_source),
+            (r's output audio (?P<value>\d)', self._setter('audio_source', 4, self._audio_source, low=0)),
+            (r'r output audio vol', self._audio_volume),
+            (r's output audio vol ?(?P<step>[+-])', self._step_volume),
+            (r's output audio vol (?P<value>\d+)', self._setter('audio_volume', 100, self._audio_volume, low=0)),
+            (r'r output audio mute', self._audio_mute),
+            (r's output audio mute (?P<value>[01])', self._setter('audio_mute', 1, self._audio_mute, low=0)),
+            (r'r auto switch', self._auto_switch),
+            (r's auto switch (?P<value>[01])', self._setter('auto_switch', 1, self._auto_switch, low=0)),
+            (r'r in source', self._in_source),
+            (r's in source (?P<value>\d)', self._setter('in_source', 4, self._in_source)),
+            (r'r multiview', self._multiview),
+            (r's multiview (?P<value>\d)', self._setter('multiview', len(MULTIVIEW_MODES), self._multiview)),
+            (r'r window (?P<window>\d) in', self._window),
+            (r's window (?P<window>\d) in (?P<value>\d)', self._set_window),
+            (r'r pip position', self._pip_position),
+            (r's pip position (?P<value>\d)', self._setter('pip_position', len(PIP_POSITIONS), self._pip_position)),
+            (r'r pip size', self._pip_size),
+            (r's pip size (?P<value>\d)', self._setter('pip_size', len(PIP_SIZES), self._pip_size)),
+        )]
+        for layout in ('pbp', 'triple', 'quad'):
+            self.handlers += [
+                (re.compile(rf'r {layout} mode', re.IGNORECASE), self._layout_mode(layout)),
+                (re.compile(rf's {layout} mode (?P<value>\d)', re.IGNORECASE),
+                 self._setter(f'{layout}_mode', 2, self._layout_mode(layout))),
+                (re.compile(rf'r {layout} aspect', re.IGNORECASE), self._layout_aspect(layout)),
+                (re.compile(rf's {layout} aspect (?P<value>\d)', re.IGNORECASE),
+                 self._setter(f'{layout}_aspect', len(ASPECTS), self._layout_aspect(layout))),
+            ]
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def start(self):
+        """Start answering commands in a background thread"""
+        if not self.running:
+            self.running = True
+            self.thread = threading.Thread(target=self._run, daemon=True)
+            self.thread.start()
+        return self
+
+    def stop(self):
+        """Stop answering and close the PTY"""
+        self.running = False
+        for fd in (self.master, self.slave):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+
+    def _defaults(self):
+        state = dict(DEFAULT_STATE)
+        state['windows'] = dict(DEFAULT_STATE['windows'])
+        return state
+
+    def _run(self):
+        buffer = b''
+        while self.running:
+            try:
+                data = os.read(self.master, 1024)
+            except OSError:
+                return
+            buffer += data
+            while b'!' in buffer:
+                raw, buffer = buffer.split(b'!', 1)
+                command = ' '.join(raw.decode('ascii', errors='ignore').split())
+                if command:
+                    self.received.append(command)
+                    self._answer(command)
+
+    def _answer(self, command):
+        """Run a command and write its reply lines"""
+        if not self.state['power'] and not re.fullmatch(r'r power|power [01]', command, re.IGNORECASE):
+            return
+        for pattern, handler in self.handlers:
+            match = pattern.fullmatch(command)
+            if match:
+                lines = handler(**match.groupdict())
+                break
+        else:
+            # Unknown commands and out-of-range parameters get no reply
+            return
+        if not lines:
+            return
+        time.sleep(self._latency(command))
+        if self.random.random() < self.garbage_rate:
+            self._write(bytes(self.random.randrange(32, 127) for _ in range(8)) + b'\r\n')
+        for line in lines:
+            if isinstance(line, float):
+                # Pause inside a multi-line reply (initialization)
+                time.sleep(line)
+                continue
+            self._write((line + '\r\n').encode('ascii'))
+
+    def _latency(self, command):
+        """Reply latency for a command: the longest matching prefix in latencies wins"""
+        best, latency = -1, self.latency
+        for prefix, value in self.latencies.items():
+            if command.lower().startswith(prefix.lower()) and len(prefix) > best:
+                best, latency = len(prefix), value
+        return latency
+
+    def _write(self, data):
+        if self.drop_rate:
+            data = bytes(byte for byte in data if self.random.random() >= self.drop_rate)
+        size = self.chunk_size or len(data)
+        for start in range(0, len(data), size):
+            if start:
+                time.sleep(self.chunk_delay)
+            try:
+                os.write(self.master, data[start:start + size])
+            except OSError:
+                return
+
+    def _setter(self, key, high, reply, low=1):
+        """Handler that stores an in-range numeric parameter and echoes the read reply"""
+        def handler(value):
+            value = int(value)
+            if not low <= value <= high:
+                return None
+            self.state[key] = bool(value) if isinstance(DEFAULT_STATE[key], bool) else value
+            return reply()
+        return handler
+
+    # System
+    def _power_reply(self):
+        return [f"power {_on_off(self.state['power'])}"]
+
+    def _set_power(self, value):
+        if value == '0':
+            self.state['power'] = False
+            return ['power off']
+        self.state['power'] = True
+        return ['power on', 'System Initializing...', self.init_delay, 'Initialization Finished!']
+
+    def _reboot(self):
+        return ['Reboot...', 'System Initializing...', self.init_delay, 'Initialization Finished!']
+
+    def _reset(self):
+        self.state = self._defaults()
+        return ['Reset to factory defaults', 'System Initializing...']
+
+    # Output and EDID
+    def _output_res(self):
+        return [f"out resolution: {RESOLUTIONS[self.state['output_res'] - 1]}"]
+
+    def _output_hdcp(self):
+        return [f"output HDCP: {HDCP_MODES[self.state['output_hdcp'] - 1]}"]
+
+    def _output_vka(self):
+        return [f"output VKA pattern: {VKA_PATTERNS[self.state['output_vka'] - 1]}"]
+
+    def _output_itc(self):
+        return [f"output ITC: {ITC_MODES[self.state['output_itc'] - 1]}"]
+
+    def _input_edid(self):
+        return [f"input EDID:{EDID_MODES[self.state['input_edid'] - 1]}"]
+
+    # Audio
+    def _audio_source(self):
+        source = self.state['audio_source']
+        if source == 0:
+            return ['output audio: follow window 1 selected source']
+        return [f'output audio: HDMI {source} input audio']
+
+    def _audio_volume(self):
+        return [f"output audio volume: {self.state['audio_volume']}"]
+
+    def _step_volume(self, step):
+        volume = self.state['audio_volume'] + (1 if step == '+' else -1)
+        self.state['audio_volume'] = max(0, min(100, volume))
+        return self._audio_volume()
+
+    def _audio_mute(self):
+        return [f"output audio mute: {_on_off(self.state['audio_mute'])}"]
+
+    # Single screen and multiview
+    def _auto_switch(self):
+        return [f"auto switch {_on_off(self.state['auto_switch'])}"]
+
+    def _in_source(self):
+        return [f"HDMI {self.state['in_source']}"]
+
+    def _multiview(self):
+        return [MULTIVIEW_MODES[self.state['multiview'] - 1]]
+
+    def _window(self, window):
+        window = int(window)
+        if window not in self.state['windows']:
+            return None
+        return [f"window {window} select HDMI {self.state['windows'][window]}"]
+
+    def _set_window(self, window, value):
+        if int(window) not in self.state['windows'] or not 1 <= int(value) <= 4:
+            return None
+        self.state['windows'][int(window)] = int(value)
+        return self._window(window)
+
+    def _pip_position(self):
+        return [f"PIP on {PIP_POSITIONS[self.state['pip_position'] - 1]}"]
+
+    def _pip_size(self):
+        return [f"PIP size: {PIP_SIZES[self.state['pip_size'] - 1]}"]
+
+    def _layout_mode(self, layout):
+        label = layout.upper() if layout == 'pbp' else layout
+        return lambda: [f"{label} mode {self.state[f'{layout}_mode']}"]
+
+    def _layout_aspect(self, layout):
+        label = layout.upper() if layout == 'pbp' else layout
+        return lambda: [f"{label} aspect: {ASPECTS[self.state[f'{layout}_aspect'] - 1]}"]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--latency', type=float, default=15, help='Reply latency (ms)')
+    parser.add_argument('--init-delay', type=float, default=2000, help='Power-on initialization time (ms)')
+    parser.add_argument('--chunk-size', type=int, help='Split replies into writes of this many bytes')
+    parser.add_argument('--drop-rate', type=float, default=0.0, help='Probability of dropping each reply byte')
+    parser.add_argument('--garbage-rate', type=float, default=0.0, help='Probability of a garbage line before a reply')
+    parser.add_argument('--seed', type=int, help='Random seed for drops and garbage')
+    parser.add_argument('--link', help='Symlink to create for the PTY (e.g. /tmp/orei-sim)')
+    args = parser.parse_args()
+
+    device = OreiSimulator(
+        latency=args.latency / 1000,
+        init_delay=args.init_delay / 1000,
+        chunk_size=args.chunk_size,
+        drop_rate=args.drop_rate,
+        garbage_rate=args.garbage_rate,
+        seed=args.seed
+    ).start()
+    port = device.port
+    if args.link:
+        if os.path.islink(args.link):
+            os.remove(args.link)
+        os.symlink(device.port, args.link)
+        port = args.link
+
+    print(f"Simulated Orei UHD-401MV on {port} (Ctrl-C to stop)")
+    try:
+        signal.pause()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        device.stop()
+        if args.link and os.path.islink(args.link):
+            os.remove(args.link)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -30,7 +30,7 @@ sudo apt-get upgrade -y
 
 # Install required packages
 echo "📦 Installing required system packages..."
-sudo apt-get install -y python3 python3-pip python3-venv nginx netcat-openbsd nmap
+sudo apt-get install -y python3 python3-pip python3-venv nginx nmap
 
 # Configure serial port on Raspberry Pi
 echo "🔧 Configuring serial port..."
@@ -93,7 +93,7 @@ Type=simple
 User=$USER
 WorkingDirectory=$APP_DIR
 Environment="PATH=$APP_DIR/venv/bin"
-ExecStart=$APP_DIR/venv/bin/gunicorn --bind 0.0.0.0:5000 --workers 2 --timeout 120 app:app
+ExecStart=$APP_DIR/venv/bin/gunicorn --bind 0.0.0.0:5000 --workers 2 --worker-class gthread --threads 8 --timeout 120 app:app
 Restart=always
 RestartSec=10
 
@@ -47,6 +47,49 @@ export const API = {
         return this.sendCommand(command, true);
     },
     
+    // Get typed device state fields, re-reading any older than maxAge seconds
+    async getState(fields, maxAge = 0) {
+        try {
+            const params = new URLSearchParams({ fields: fields.join(','), max_age: maxAge });
+            const response = await fetch(`${this.BASE_URL}/state?${params}`);
+            const data = await response.json();
+            return data.success ? data.state : {};
+        } catch (error) {
+            console.error('Error getting device state:', error);
+            return {};
+        }
+    },
+    
+    // Subscribe to device state changes pushed by the server (Server-Sent Events)
+    subscribeState(onChange, retryMs = 30000) {
+        const subscription = { source: null, timer: null, closed: false };
+        const connect = () => {
+            const source = new EventSource(`${this.BASE_URL}/events`);
+            source.onmessage = (event) => {
+                try {
+                    onChange(JSON.parse(event.data));
+                } catch (error) {
+                    console.error('Error handling state event:', error);
+                }
+            };
+            source.onerror = () => {
+                // EventSource retries dropped connections itself, but gives up
+                // on error replies such as the 503 sent when streams are full
+                if (source.readyState === EventSource.CLOSED && !subscription.closed) {
+                    subscription.timer = setTimeout(connect, retryMs);
+                }
+            };
+            subscription.source = source;
+        };
+        subscription.close = () => {
+            subscription.closed = true;
+            clearTimeout(subscription.timer);
+            subscription.source.close();
+        };
+        connect();
+        return subscription;
+    },
+    
     // Get device status
     async getStatus() {
         try {
@@ -59,10 +102,10 @@ export const API = {
         }
     },
     
-    // Get command history
-    async getHistory(limit = 50) {
+    // Get command history (only entries after sequence number `since` if given)
+    async getHistory(limit = 50, since = 0) {
         try {
-            const response = await fetch(`${this.BASE_URL}/history?limit=${limit}`);
+            const response = await fetch(`${this.BASE_URL}/history?limit=${limit}&since=${since}`);
             const data = await response.json();
             return data.success ? data.history : [];
         } catch (error) {
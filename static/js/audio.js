@@ -11,6 +11,9 @@ export const AudioControl = {
     
     // Set up event listeners
     setupEventListeners() {
+        // Server-pushed state changes
+        document.addEventListener('deviceStateChanged', (e) => this.applyStateChanges(e.detail));
+        
         // Audio source (both simple and advanced)
         const audioSource = document.getElementById('audioSource');
         const audioSourceAdvanced = document.getElementById('audioSourceAdvanced');
@@ -34,17 +37,13 @@ export const AudioControl = {
         // Volume slider
         const volumeSlider = document.getElementById('volumeSlider');
         if (volumeSlider) {
-            // Update display on input
-            volumeSlider.addEventListener('input', (e) => {
-                this.updateVolumeDisplay(e.target.value);
-            });
-            
-            // Send command on change (debounced)
+            // Send volume while dragging; the server drops writes a newer one supersedes
             const debouncedSetVolume = Utils.debounce((value) => {
                 this.setVolume(value);
-            }, 300);
+            }, 100);
             
-            volumeSlider.addEventListener('change', (e) => {
+            volumeSlider.addEventListener('input', (e) => {
+                this.updateVolumeDisplay(e.target.value);
                 debouncedSetVolume(e.target.value);
             });
         }
@@ -121,69 +120,41 @@ export const AudioControl = {
         // Add a small delay to ensure device is ready
         await new Promise(resolve => setTimeout(resolve, 500));
         
-        // Send commands sequentially to avoid RS-232 communication issues
-        const audioResponse = await API.sendCommandSilent('r output audio!');
-        await new Promise(resolve => setTimeout(resolve, 200)); // Small delay between commands
+        // Read all audio settings in one request; the server decodes the replies
+        let state = await API.getState(['audio_source', 'audio_volume', 'audio_mute']);
         
-        const volResponse = await API.sendCommandSilent('r output audio vol!');
-        await new Promise(resolve => setTimeout(resolve, 200)); // Small delay between commands
-        
-        const muteResponse = await API.sendCommandSilent('r output audio mute!');
-        
-        // Get audio source
-        if (audioResponse && audioResponse !== 'No response') {
-            const audioSource = document.getElementById('audioSource');
-            const audioSourceAdvanced = document.getElementById('audioSourceAdvanced');
-            if (audioSource || audioSourceAdvanced) {
-                const match = audioResponse.match(/output audio: (follow window (\d)|HDMI (\d))/);
-                if (match) {
-                    const value = match[2] ? '0' : match[3];
-                    if (audioSource) audioSource.value = value;
-                    if (audioSourceAdvanced) audioSourceAdvanced.value = value;
-                }
-            }
-        }
-        
-        // Get volume - retry if no response
-        let volumeValue = null;
-        if (volResponse && volResponse !== 'No response') {
-            const match = volResponse.match(/audio volume: (\d+)/);
-            if (match) {
-                volumeValue = parseInt(match[1]);
-            }
-        } else {
-            // Retry volume command after a delay
+        // Retry volume after a delay if the device didn't answer
+        if (!state.audio_volume) {
             await new Promise(resolve => setTimeout(resolve, 1000));
-            const retryVolResponse = await API.sendCommandSilent('r output audio vol!');
-            if (retryVolResponse && retryVolResponse !== 'No response') {
-                const match = retryVolResponse.match(/audio volume: (\d+)/);
-                if (match) {
-                    volumeValue = parseInt(match[1]);
-                }
-            }
+            state = { ...state, ...(await API.getState(['audio_volume'])) };
         }
         
-        // Update volume slider if we got a value
-        if (volumeValue !== null) {
+        this.applyStateChanges(state);
+    },
+    
+    // Apply audio fields pushed by the server
+    applyStateChanges(fields) {
+        if (fields.audio_volume) {
             const volumeSlider = document.getElementById('volumeSlider');
-            if (volumeSlider) {
-                volumeSlider.value = volumeValue;
-                this.updateVolumeDisplay(volumeValue);
+            // Don't fight the user while they are dragging the slider
+            if (volumeSlider && document.activeElement !== volumeSlider) {
+                volumeSlider.value = fields.audio_volume.value;
+                this.updateVolumeDisplay(fields.audio_volume.value);
             }
         }
         
-        // Get mute status
-        if (muteResponse && muteResponse !== 'No response') {
-            const isMuted = muteResponse.includes('mute: on');
+        if (fields.audio_mute) {
             const muteSwitch = document.getElementById('muteSwitch');
             const remoteMuteSwitch = document.getElementById('remoteMuteSwitch');
-            
-            if (muteSwitch) {
-                muteSwitch.checked = isMuted;
-            }
-            if (remoteMuteSwitch) {
-                remoteMuteSwitch.checked = isMuted;
-            }
+            if (muteSwitch) muteSwitch.checked = fields.audio_mute.value;
+            if (remoteMuteSwitch) remoteMuteSwitch.checked = fields.audio_mute.value;
+        }
+        
+        if (fields.audio_source && fields.audio_source.value !== null) {
+            const audioSource = document.getElementById('audioSource');
+            const audioSourceAdvanced = document.getElementById('audioSourceAdvanced');
+            if (audioSource) audioSource.value = fields.audio_source.value;
+            if (audioSourceAdvanced) audioSourceAdvanced.value = fields.audio_source.value;
         }
     },
     
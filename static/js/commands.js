@@ -36,8 +36,7 @@ export const CommandHistory = {
     },
     
     // Add command to history table
-    add(command, response) {
-        const time = Utils.formatTime();
+    add(command, response, time = Utils.formatTime()) {
         const row = document.createElement('tr');
         row.innerHTML = `
             <td class="text-nowrap">${time}</td>
@@ -98,7 +97,7 @@ export const CommandHistory = {
         
         historyBody.innerHTML = '';
         history.forEach(entry => {
-            this.add(entry.command, entry.response);
+            this.add(entry.command, entry.error || entry.response, entry.timestamp);
         });
     },
     
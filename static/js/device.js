@@ -70,6 +70,34 @@ export const DeviceControl = {
         
         // Mode-specific settings
         this.setupModeSettingsListeners();
+        
+        // Server-pushed power and mode changes
+        document.addEventListener('deviceStateChanged', (e) => this.applyStateChanges(e.detail));
+    },
+    
+    // Apply power and display mode fields pushed by the server
+    async applyStateChanges(fields) {
+        if (fields.power) {
+            this.updatePowerControls(fields.power.value);
+        }
+        
+        if (fields.multiview) {
+            const newMode = fields.multiview.value;
+            if (newMode && newMode !== window.oreiApp.currentMode) {
+                window.oreiApp.currentMode = newMode;
+                const displayMode = document.getElementById('displayMode');
+                const displayModeAdvanced = document.getElementById('displayModeAdvanced');
+                if (displayMode) displayMode.value = newMode;
+                if (displayModeAdvanced) displayModeAdvanced.value = newMode;
+                await DisplayManager.updateModeSettings();
+                DisplayManager.updateWindowInputControls();
+                DisplayManager.updateDiagram();
+                
+                document.dispatchEvent(new CustomEvent('displayModeChanged', {
+                    detail: { mode: newMode }
+                }));
+            }
+        }
     },
     
     // Set up mode-specific settings listeners
@@ -374,29 +402,17 @@ export const DeviceControl = {
     
     // Load output settings
     async loadOutputSettings() {
-        // Send commands sequentially to avoid RS-232 communication issues
-        const resResponse = await API.sendCommandSilent('r output res!');
-        await new Promise(resolve => setTimeout(resolve, 200)); // Small delay between commands
-        
-        const hdcpResponse = await API.sendCommandSilent('r output hdcp!');
-        
-        // Get resolution
-        if (resResponse) {
-            const outputRes = document.getElementById('outputResolution');
-            if (outputRes) {
-                const value = Utils.getResolutionValue(resResponse);
-                if (value) outputRes.value = value;
-            }
+        // Read output settings in one request; values are the dropdown option ids
+        const state = await API.getState(['output_resolution', 'output_hdcp']);
+        
+        const outputRes = document.getElementById('outputResolution');
+        if (outputRes && state.output_resolution?.value) {
+            outputRes.value = state.output_resolution.value;
         }
         
-        // Get HDCP
-        if (hdcpResponse) {
-            const outputHDCP = document.getElementById('outputHDCP');
-            if (outputHDCP) {
-                if (hdcpResponse.includes('HDCP 2.2')) outputHDCP.value = '2';
-                else if (hdcpResponse.includes('HDCP 1.4')) outputHDCP.value = '1';
-                else if (hdcpResponse.includes('HDCP OFF')) outputHDCP.value = '3';
-            }
+        const outputHDCP = document.getElementById('outputHDCP');
+        if (outputHDCP && state.output_hdcp?.value) {
+            outputHDCP.value = state.output_hdcp.value;
         }
     },
     
@@ -464,8 +480,10 @@ export const DeviceControl = {
                 
                 const statusBadge = document.getElementById('serialConnectionStatus');
                 if (statusBadge) {
-                    statusBadge.textContent = data.connected ? 'Connected' : 'Disconnected';
-                    statusBadge.className = `badge ${data.connected ? 'bg-success' : 'bg-danger'}`;
+                    // The server keeps retrying a dropped link in the background
+                    const reconnecting = !data.connected && data.link_state === 'reconnecting';
+                    statusBadge.textContent = data.connected ? 'Connected' : (reconnecting ? 'Reconnecting' : 'Disconnected');
+                    statusBadge.className = `badge ${data.connected ? 'bg-success' : (reconnecting ? 'bg-warning' : 'bg-danger')}`;
                 }
                 
                 // Populate available ports
@@ -526,9 +544,10 @@ export const DeviceControl = {
                 // Reload configuration to update UI
                 await this.loadSerialConfig();
                 
-                // If connection successful, refresh device status
-                if (data.connected) {
-                    setTimeout(() => {
+                // The new port is opened in the background; refresh once it had a chance
+                if (data.link_state !== 'missing') {
+                    setTimeout(async () => {
+                        await this.loadSerialConfig();
                         this.checkPowerStatus();
                     }, 1000);
                 }
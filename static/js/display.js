@@ -26,6 +26,9 @@ export const DisplayManager = {
         document.addEventListener('windowInputsChanged', () => {
             this.updateWindowInputControls();
         });
+        
+        // Server-pushed window routing changes
+        document.addEventListener('deviceStateChanged', (e) => this.applyStateChanges(e.detail));
     },
     
     // Update display diagram based on current mode and settings
@@ -246,48 +249,39 @@ export const DisplayManager = {
             window.oreiApp.windowInputs = {};
         }
         
-        // Create array of promises for parallel execution
-        const inputPromises = [];
+        // Query every window in one request
+        const fields = [];
         for (let i = 1; i <= windowCount; i++) {
-            inputPromises.push(
-                API.sendCommandSilent(`r window ${i} in!`).then(response => ({
-                    windowNum: i,
-                    response: response
-                }))
-            );
+            fields.push(`window_${i}_input`);
         }
         
-        // Execute all window input queries in parallel
-        try {
-            const results = await Promise.all(inputPromises);
-            
-            // Process results
-            results.forEach(({ windowNum, response }) => {
-                if (response) {
-                    const match = response.match(/HDMI (\d)/);
-                    if (match) {
-                        window.oreiApp.windowInputs[windowNum] = parseInt(match[1]);
-                    } else {
-                        // Fallback if response doesn't match expected pattern
-                        window.oreiApp.windowInputs[windowNum] = windowNum;
-                    }
-                } else {
-                    // Fallback if no response
-                    window.oreiApp.windowInputs[windowNum] = windowNum;
-                }
-            });
-        } catch (error) {
-            console.error('Error loading window inputs:', error);
-            // Set fallback values
-            for (let i = 1; i <= windowCount; i++) {
-                window.oreiApp.windowInputs[i] = i;
-            }
+        const state = await API.getState(fields);
+        for (let i = 1; i <= windowCount; i++) {
+            // Fall back to the window's own number if the device didn't answer
+            window.oreiApp.windowInputs[i] = state[`window_${i}_input`]?.value || i;
         }
         
         // Dispatch event to notify that window inputs have been loaded
         document.dispatchEvent(new CustomEvent('windowInputsChanged'));
     },
     
+    // Apply window input fields pushed by the server
+    applyStateChanges(fields) {
+        let changed = false;
+        for (let i = 1; i <= 4; i++) {
+            const field = fields[`window_${i}_input`];
+            if (field && window.oreiApp.windowInputs[i] !== field.value) {
+                window.oreiApp.windowInputs[i] = field.value;
+                changed = true;
+            }
+        }
+        
+        if (changed) {
+            this.updateDiagram();
+            document.dispatchEvent(new CustomEvent('windowInputsChanged'));
+        }
+    },
+    
     // Get number of windows for current mode
     getWindowCount(mode = null) {
         const currentMode = mode || window.oreiApp.currentMode;
@@ -336,94 +330,35 @@ export const DisplayManager = {
         // this.updateDiagram();
     },
     
-    // Load PIP settings from device
-    async loadPIPSettings() {
-        const [pipPosResponse, pipSizeResponse] = await Promise.all([
-            API.sendCommandSilent('r PIP position!'),
-            API.sendCommandSilent('r PIP size!')
-        ]);
-        
-        if (pipPosResponse) {
-            const pipPosition = document.getElementById('pipPosition');
-            if (pipPosition) {
-                if (pipPosResponse.includes('left top')) pipPosition.value = '1';
-                else if (pipPosResponse.includes('left bottom')) pipPosition.value = '2';
-                else if (pipPosResponse.includes('right top')) pipPosition.value = '3';
-                else if (pipPosResponse.includes('right bottom')) pipPosition.value = '4';
-            }
-        }
-        
-        if (pipSizeResponse) {
-            const pipSize = document.getElementById('pipSize');
-            if (pipSize) {
-                if (pipSizeResponse.includes('small')) pipSize.value = '1';
-                else if (pipSizeResponse.includes('middle') || pipSizeResponse.includes('medium')) pipSize.value = '2';
-                else if (pipSizeResponse.includes('large')) pipSize.value = '3';
+    // Copy decoded state fields into their dropdowns ({elementId: field})
+    async loadSettingsInto(controls) {
+        const state = await API.getState(Object.values(controls));
+        for (const [elementId, field] of Object.entries(controls)) {
+            const element = document.getElementById(elementId);
+            if (element && state[field]?.value) {
+                element.value = state[field].value;
             }
         }
     },
     
+    // Load PIP settings from device
+    async loadPIPSettings() {
+        await this.loadSettingsInto({ pipPosition: 'pip_position', pipSize: 'pip_size' });
+    },
+    
     // Load PBP settings
     async loadPBPSettings() {
-        const [pbpModeResponse, pbpAspectResponse] = await Promise.all([
-            API.sendCommandSilent('r PBP mode!'),
-            API.sendCommandSilent('r PBP aspect!')
-        ]);
-        
-        if (pbpModeResponse) {
-            const match = pbpModeResponse.match(/mode (\d)/);
-            const pbpMode = document.getElementById('pbpMode');
-            if (match && pbpMode) pbpMode.value = match[1];
-        }
-        
-        if (pbpAspectResponse) {
-            const pbpAspect = document.getElementById('pbpAspect');
-            if (pbpAspect) {
-                pbpAspect.value = pbpAspectResponse.includes('full screen') ? '1' : '2';
-            }
-        }
+        await this.loadSettingsInto({ pbpMode: 'pbp_mode', pbpAspect: 'pbp_aspect' });
     },
     
     // Load Triple settings
     async loadTripleSettings() {
-        const [tripleModeResponse, tripleAspectResponse] = await Promise.all([
-            API.sendCommandSilent('r triple mode!'),
-            API.sendCommandSilent('r triple aspect!')
-        ]);
-        
-        if (tripleModeResponse) {
-            const match = tripleModeResponse.match(/mode (\d)/);
-            const tripleMode = document.getElementById('tripleMode');
-            if (match && tripleMode) tripleMode.value = match[1];
-        }
-        
-        if (tripleAspectResponse) {
-            const tripleAspect = document.getElementById('tripleAspect');
-            if (tripleAspect) {
-                tripleAspect.value = tripleAspectResponse.includes('full screen') ? '1' : '2';
-            }
-        }
+        await this.loadSettingsInto({ tripleMode: 'triple_mode', tripleAspect: 'triple_aspect' });
     },
     
     // Load Quad settings
     async loadQuadSettings() {
-        const [quadModeResponse, quadAspectResponse] = await Promise.all([
-            API.sendCommandSilent('r quad mode!'),
-            API.sendCommandSilent('r quad aspect!')
-        ]);
-        
-        if (quadModeResponse) {
-            const match = quadModeResponse.match(/mode (\d)/);
-            const quadMode = document.getElementById('quadMode');
-            if (match && quadMode) quadMode.value = match[1];
-        }
-        
-        if (quadAspectResponse) {
-            const quadAspect = document.getElementById('quadAspect');
-            if (quadAspect) {
-                quadAspect.value = quadAspectResponse.includes('full screen') ? '1' : '2';
-            }
-        }
+        await this.loadSettingsInto({ quadMode: 'quad_mode', quadAspect: 'quad_aspect' });
     },
     
     // Update window input controls based on current display mode
@@ -14,7 +14,7 @@ import { SystemManager } from './system.js?v=20250605091045';
 window.oreiApp = {
     currentMode: 1,
     selectedWindow: null,
-    autoRefreshInterval: null,
+    stateEvents: null,
     windowInputs: {1: 1, 2: 2, 3: 3, 4: 4}
 };
 
@@ -81,11 +81,10 @@ async function initialize() {
         // Initialize device control and check status
         await DeviceControl.initialize();
         
-        // Set up auto-refresh every 305 seconds
-        // DISABLED: Auto-refresh has been disabled per user request
-        // window.oreiApp.autoRefreshInterval = setInterval(async () => {
-        //     await DeviceControl.checkStatus();
-        // }, 30000);
+        // Follow state changes pushed by the server (front panel, IR remote, other panels)
+        window.oreiApp.stateEvents = API.subscribeState((fields) => {
+            document.dispatchEvent(new CustomEvent('deviceStateChanged', { detail: fields }));
+        });
         
         console.log('Orei Control Panel initialized successfully');
     } catch (error) {
@@ -96,8 +95,8 @@ async function initialize() {
 
 // Clean up on page unload
 window.addEventListener('beforeunload', () => {
-    if (window.oreiApp.autoRefreshInterval) {
-        clearInterval(window.oreiApp.autoRefreshInterval);
+    if (window.oreiApp.stateEvents) {
+        window.oreiApp.stateEvents.close();
     }
 });
 
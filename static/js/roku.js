@@ -83,23 +83,41 @@ export const RokuControl = {
         }
     },
     
-    // Discover Roku devices on network
-    async discoverDevices() {
+    // Discover Roku devices on network (each device is shown as soon as it is identified)
+    discoverDevices() {
         Utils.showToast('Discovering Roku devices...', 'info', 5000);
         
-        try {
-            const response = await fetch('/api/roku/discover');
-            const data = await response.json();
-            
-            if (data.success) {
-                this.displayDiscoveredDevices(data.devices);
-                Utils.showToast(`Found ${data.devices.length} Roku device(s)`, 'success');
+        if (this.discovery) {
+            this.discovery.close();
+        }
+        const devices = [];
+        const source = new EventSource('/api/roku/discover?stream=1');
+        this.discovery = source;
+        
+        source.addEventListener('device', (event) => {
+            devices.push(JSON.parse(event.data));
+            if (devices.length === 1) {
+                this.displayDiscoveredDevices(devices);
             } else {
-                Utils.showToast(`Discovery failed: ${data.error}`, 'danger');
+                // Append so selections already made on earlier cards are kept
+                this.addDiscoveredDevice(devices[devices.length - 1]);
             }
-        } catch (error) {
-            Utils.showToast(`Discovery error: ${error.message}`, 'danger');
-        }
+        });
+        source.addEventListener('done', () => {
+            source.close();
+            this.discovery = null;
+            if (devices.length === 0) {
+                this.displayDiscoveredDevices(devices);
+            }
+            Utils.showToast(`Found ${devices.length} Roku device(s)`, 'success');
+        });
+        source.addEventListener('error', (event) => {
+            // Server-sent error events carry a message; connection errors do not
+            const message = event.data ? JSON.parse(event.data).error : 'connection lost';
+            source.close();
+            this.discovery = null;
+            Utils.showToast(`Discovery error: ${message}`, 'danger');
+        });
     },
     
     // Display discovered devices in UI
@@ -115,30 +133,36 @@ export const RokuControl = {
             return;
         }
         
-        devices.forEach(device => {
-            const deviceCard = document.createElement('div');
-            deviceCard.className = 'card mb-2';
-            deviceCard.innerHTML = `
-                <div class="card-body">
-                    <h6 class="card-title">${device.name}</h6>
-                    <p class="card-text">
-                        <small class="text-muted">
-                            IP: ${device.ip}<br>
-                            Model: ${device.model}<br>
-                            Serial: ${device.serial}
-                        </small>
-                    </p>
-                    <select class="form-select form-select-sm" data-device-ip="${device.ip}">
-                        <option value="">Select HDMI Input</option>
-                        <option value="1">HDMI 1</option>
-                        <option value="2">HDMI 2</option>
-                        <option value="3">HDMI 3</option>
-                        <option value="4">HDMI 4</option>
-                    </select>
-                </div>
-            `;
-            container.appendChild(deviceCard);
-        });
+        devices.forEach(device => this.addDiscoveredDevice(device));
+    },
+    
+    // Add one discovered device card to the list
+    addDiscoveredDevice(device) {
+        const container = document.getElementById('discoveredDevicesModal') || document.getElementById('discoveredDevices');
+        if (!container) return;
+        
+        const deviceCard = document.createElement('div');
+        deviceCard.className = 'card mb-2';
+        deviceCard.innerHTML = `
+            <div class="card-body">
+                <h6 class="card-title">${device.name}</h6>
+                <p class="card-text">
+                    <small class="text-muted">
+                        IP: ${device.ip}<br>
+                        Model: ${device.model}<br>
+                        Serial: ${device.serial}
+                    </small>
+                </p>
+                <select class="form-select form-select-sm" data-device-ip="${device.ip}">
+                    <option value="">Select HDMI Input</option>
+                    <option value="1">HDMI 1</option>
+                    <option value="2">HDMI 2</option>
+                    <option value="3">HDMI 3</option>
+                    <option value="4">HDMI 4</option>
+                </select>
+            </div>
+        `;
+        container.appendChild(deviceCard);
     },
     
     // Save device mappings
@@ -479,7 +503,8 @@ export const RokuControl = {
             const response = await fetch('/api/roku/command', {
                 method: 'POST',
                 headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify({ hdmi: hdmi, command: command })
+                // Wait briefly for the Roku's ack so failures still show up
+                body: JSON.stringify({ hdmi: hdmi, command: command, wait: 0.5 })
             });
             
             const data = await response.json();
@@ -502,31 +527,25 @@ export const RokuControl = {
             return;
         }
         
-        let successCount = 0;
-        const promises = configuredDevices.map(async (hdmi) => {
-            try {
-                const response = await fetch('/api/roku/command', {
-                    method: 'POST',
-                    headers: { 'Content-Type': 'application/json' },
-                    body: JSON.stringify({ hdmi: hdmi, command: 'Play' })
-                });
-                
-                const data = await response.json();
-                if (data.success) {
-                    successCount++;
-                }
-                return data.success;
-            } catch (error) {
-                return false;
-            }
-        });
-        
-        await Promise.all(promises);
+        let data;
+        try {
+            // One request; the server presses Play on every Roku concurrently
+            const response = await fetch('/api/roku/fanout', {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({ hdmi: 'all', command: 'Play', deadline: 2 })
+            });
+            data = await response.json();
+        } catch (error) {
+            data = { success: false, sent: 0, queued: 0 };
+        }
         
-        if (successCount === configuredDevices.length) {
+        const successCount = (data.sent || 0) + (data.queued || 0);
+        const total = data.results ? Object.keys(data.results).length : configuredDevices.length;
+        if (data.success) {
             Utils.showToast(`Play/Pause command sent to all ${successCount} Roku devices`, 'success');
         } else if (successCount > 0) {
-            Utils.showToast(`Play/Pause sent to ${successCount} of ${configuredDevices.length} Roku devices`, 'warning');
+            Utils.showToast(`Play/Pause sent to ${successCount} of ${total} Roku devices`, 'warning');
         } else {
             Utils.showToast('Failed to send Play/Pause to any Roku devices', 'danger');
         }
@@ -67,32 +67,5 @@ export const Utils = {
         if (!response) return null;
         const match = response.match(pattern);
         return match ? match[1] : null;
-    },
-
-    // Map resolution string to dropdown value
-    getResolutionValue(resolutionString) {
-        const resolutions = {
-            '4096x2160p60': '1',
-            '4096x2160p50': '2',
-            '3840x2160p60': '3',
-            '3840x2160p50': '4',
-            '3840x2160p30': '5',
-            '3840x2160p25': '6',
-            '1920x1200p60RB': '7',
-            '1920x1080p60': '8',
-            '1920x1080p50': '9',
-            '1360x768p60': '10',
-            '1280x800p60': '11',
-            '1280x720p60': '12',
-            '1280x720p50': '13',
-            '1024x768p60': '14'
-        };
-        
-        for (const [res, value] of Object.entries(resolutions)) {
-            if (resolutionString.includes(res)) {
-                return value;
-            }
-        }
-        return null;
     }
 };
\ No newline at end of file
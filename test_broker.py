@@ -0,0 +1,68 @@
+"""Serial broker: owner election and calls forwarded over its socket (python3 -m pytest)"""
+
+import os
+
+import pytest
+
+import app
+
+@pytest.fixture
+def make_broker(tmp_path, monkeypatch):
+    """Brokers sharing one lock and socket, standing in for gunicorn workers"""
+    monkeypatch.setitem(app.broker_ops, 'echo', lambda value: {'value': value, 'owner': os.getpid()})
+    monkeypatch.setitem(app.broker_ops, 'fail', lambda: 1 / 0)
+    brokers = []
+
+    def make_broker():
+        broker = app.SerialBroker(socket_path=str(tmp_path / 'broker.sock'), lock_path=str(tmp_path / 'broker.lock'))
+        brokers.append(broker)
+        return broker
+
+    yield make_broker
+    for broker in brokers:
+        resign(broker)
+
+def resign(broker):
+    """Give up ownership the way an exiting worker does"""
+    if broker.server:
+        broker.server.close()
+        broker.server = None
+    if broker.lock_file:
+        broker.lock_file.close()
+        broker.lock_file = None
+    broker.owner_pid = None
+
+def test_first_caller_becomes_the_owner(make_broker):
+    owner = make_broker()
+    assert owner.call('echo', value=1) == {'value': 1, 'owner': os.getpid()}
+    assert owner.is_owner()
+    assert os.path.exists(owner.socket_path)
+
+def test_other_workers_are_served_over_the_socket(make_broker):
+    owner, worker = make_broker(), make_broker()
+    assert owner.elect()
+    assert not worker.elect()
+    assert worker.call('echo', value=[1, 'two']) == {'value': [1, 'two'], 'owner': os.getpid()}
+    assert not worker.is_owner()
+
+def test_owner_errors_reach_the_caller(make_broker):
+    owner, worker = make_broker(), make_broker()
+    owner.elect()
+    with pytest.raises(RuntimeError, match='division by zero'):
+        worker.call('fail')
+    with pytest.raises(RuntimeError, match='Unknown broker operation'):
+        worker.call('missing')
+
+def test_services_start_before_the_socket_opens(make_broker):
+    owner = make_broker()
+    socket_seen = []
+    owner.on_elected.append(lambda: socket_seen.append(os.path.exists(owner.socket_path)))
+    assert owner.elect()
+    assert socket_seen == [False]
+
+def test_worker_takes_over_when_the_owner_exits(make_broker):
+    owner, worker = make_broker(), make_broker()
+    owner.elect()
+    resign(owner)
+    assert worker.call('echo', value=3)['value'] == 3
+    assert worker.is_owner()
@@ -0,0 +1,40 @@
+"""Reply decoding into typed state fields (python3 -m pytest)"""
+
+import app
+
+def test_replies_decode_to_option_ids():
+    values = app.decode_reply(['quad screen', 'PIP on right top', 'output audio volume: 42'])
+    assert values['multiview'][:2] == (5, 'Quad screen')
+    assert values['pip_position'][:2] == (3, 'Right top')
+    assert values['audio_volume'][0] == 42
+
+def test_set_replies_update_the_state_shadow(manager):
+    manager.send_command('s output audio vol 17')
+    assert app.device_state.snapshot(['audio_volume'])['audio_volume']['value'] == 17
+
+def test_two_line_firmware_reply_fills_both_fields():
+    values = app.decode_reply(['MCU FW version 1.02', 'SCALER FW version 2.10'])
+    assert values['mcu_firmware'][0] == '1.02'
+    assert values['scaler_firmware'][0] == '2.10'
+
+def test_undocumented_option_keeps_its_text_as_label():
+    value, label, _ = app.decode_reply(['out resolution: 7680x4320p60'])['output_resolution']
+    assert value is None and label == '7680x4320p60'
+
+def test_unchanged_values_keep_their_version():
+    state = app.DeviceState()
+    state.update('r power!', ['power on'])
+    version = state.version
+    state.update('r power!', ['power on'])
+    assert state.version == version
+    state.update('power 0!', ['power off'])
+    assert state.changes_since(version, 0)['fields'].keys() == {'power'}
+
+def test_shared_reads_are_requested_once():
+    assert app.DeviceState().stale_commands(['mcu_firmware', 'scaler_firmware', 'power'], 60) == \
+        ['r fw version!', 'r power!']
+
+def test_unknown_state_field_is_rejected():
+    response = app.app.test_client().get('/api/state?fields=power,brightness')
+    assert response.status_code == 400
+    assert 'brightness' in response.get_json()['error']
@@ -0,0 +1,34 @@
+"""State change push over Server-Sent Events (python3 -m pytest)"""
+
+import threading
+
+import pytest
+
+import app
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(app.serial_client, 'wait_changes', lambda version, timeout: {
+        'version': version + 1, 'fields': {'power': {'value': True, 'label': None, 'updated': 0}}})
+    monkeypatch.setattr(app, 'stream_slots', threading.BoundedSemaphore(2))
+    return app.app.test_client()
+
+def test_changes_stream_with_their_version(client):
+    response = client.get('/api/events', headers={'Last-Event-ID': '7'}, buffered=False)
+    assert response.headers['Content-Type'].startswith('text/event-stream')
+    assert next(response.response).decode() == 'id: 8\ndata: {"power": {"value": true, "label": null, "updated": 0}}\n\n'
+    response.close()
+
+def test_streams_past_the_cap_are_refused_until_one_closes(client):
+    streams = [client.get('/api/events', buffered=False) for _ in range(2)]
+    assert [stream.status_code for stream in streams] == [200, 200]
+
+    refused = client.get('/api/events', buffered=False)
+    assert refused.status_code == 503
+    assert refused.headers['Retry-After'] == str(app.SSE_RETRY_AFTER)
+
+    streams[0].close()
+    accepted = client.get('/api/events', buffered=False)
+    assert accepted.status_code == 200
+    for stream in streams[1:] + [accepted]:
+        stream.close()
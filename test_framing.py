@@ -0,0 +1,45 @@
+"""Reply framing: commands return as soon as their reply is complete (python3 -m pytest)"""
+
+import time
+
+import app
+from orei_simulator import HELP_LINES
+
+def test_reply_ends_at_its_frame(manager):
+    start = time.monotonic()
+    response, error = manager.send_command('r output audio vol!')
+    assert error is None
+    assert response == 'output audio volume: 30'
+    # Framed replies return on their last line, not at the read timeout
+    assert time.monotonic() - start < app.config.TIMEOUT / 2
+
+def test_multi_line_reply_is_read_in_full(manager):
+    response, error = manager.send_command('power 1')
+    assert error is None
+    assert response == 'power on System Initializing... Initialization Finished!'
+
+def test_chunked_reply_is_reassembled(device, manager):
+    device.chunk_size = 3
+    response, error = manager.send_command('r window 2 in')
+    assert error is None
+    assert response == 'window 2 select HDMI 2'
+
+def test_unframed_reply_ends_when_the_link_goes_quiet(manager):
+    start = time.monotonic()
+    response, error = manager.send_command('help')
+    assert error is None
+    assert response == ' '.join(HELP_LINES)
+    assert time.monotonic() - start < app.config.TIMEOUT / 2
+
+def test_unanswered_command_gives_up_at_the_timeout(manager, monkeypatch):
+    monkeypatch.setattr(app.config, 'TIMEOUT', 0.3)
+    start = time.monotonic()
+    response, error = manager.send_command('s window 9 in 1')
+    assert error is None
+    assert response == 'No response'
+    assert time.monotonic() - start >= 0.3
+
+def test_set_and_read_share_a_frame():
+    assert app.get_response_frame('s output audio vol 30!') is app.get_response_frame('r output audio vol')
+    assert app.get_response_frame('s window 3 in 2') is app.get_response_frame('r window 1 in')
+    assert app.get_response_frame('no such command') is app.DEFAULT_FRAME
@@ -0,0 +1,60 @@
+"""Command validation against the RS-232 grammar (python3 -m pytest)"""
+
+import pytest
+
+import app
+
+@pytest.fixture
+def sent(monkeypatch):
+    """Commands that got past validation to the serial client"""
+    sent = []
+
+    def send_command(command, timeout=None):
+        sent.append(command)
+        return 'ok', None
+
+    def send_batch(commands, timeout=None):
+        sent.extend(commands)
+        return [{'command': command, 'response': 'ok', 'error': None, 'duration_ms': 0} for command in commands]
+
+    monkeypatch.setattr(app.serial_client, 'send_command', send_command)
+    monkeypatch.setattr(app.serial_client, 'send_batch', send_batch)
+    return sent
+
+def test_grammar_accepts_documented_commands():
+    assert app.validate_command('s output audio vol 30!') is None
+    assert app.validate_command('s window 4 in 1') is None
+
+def test_grammar_rejects_out_of_range_and_case_errors():
+    assert 'out of range' in app.validate_command('s window 5 in 1')
+    assert 'case-sensitive' in app.validate_command('s pip size 2')
+    assert 'Unknown command' in app.validate_command('s output volume 30')
+
+@pytest.mark.parametrize('command', ['s output res 1', 's output res 14!', 's output audio vol 0',
+                                     's output audio vol+', 'r window 4 in', '  s  multiview   5 !'])
+def test_grammar_accepts_range_bounds_and_loose_spacing(command):
+    assert app.validate_command(command) is None
+
+@pytest.mark.parametrize('command', ['s output res 0', 's output res 15', 's output audio vol 101', 'power 2'])
+def test_grammar_rejects_values_past_the_range(command):
+    assert 'out of range' in app.validate_command(command)
+
+def test_unknown_command_suggests_the_closest():
+    assert "Did you mean 's multiview x!'" in app.validate_command('s multivew 2')
+
+def test_invalid_command_never_reaches_the_port(sent):
+    response = app.app.test_client().post('/api/command', json={'command': 's window 5 in 1'})
+    assert response.status_code == 400
+    assert 'out of range' in response.get_json()['error']
+    assert sent == []
+
+def test_raw_command_skips_validation(sent):
+    response = app.app.test_client().post('/api/command', json={'command': 's window 5 in 1', 'raw': True})
+    assert response.status_code == 200
+    assert sent == ['s window 5 in 1']
+
+def test_one_invalid_command_rejects_the_whole_batch(sent):
+    response = app.app.test_client().post('/api/command/batch', json={
+        'commands': ['s multiview 5', 's pip size 2', 'r power']})
+    assert response.status_code == 400
+    assert sent == []
@@ -0,0 +1,94 @@
+"""Command history: cursors, the ring buffer and its journal (python3 -m pytest)"""
+
+import logging
+import os
+
+import pytest
+
+import app
+
+@pytest.fixture
+def journal_file(tmp_path):
+    yield str(tmp_path / 'command-history.log')
+    # Close the handler so the next load starts a fresh journal
+    for handler in logging.getLogger('app.history').handlers:
+        handler.close()
+
+def reopen(journal_file):
+    """A history as the next serial owner would load it"""
+    for handler in logging.getLogger('app.history').handlers:
+        handler.close()
+    history = app.CommandHistory(journal_file=journal_file)
+    history.load()
+    return history
+
+def test_since_pages_forward_from_the_cursor():
+    history = app.CommandHistory()
+    for index in range(40):
+        history.add(f'r power {index}', 'power on')
+
+    page = history.since(3, limit=2)
+    assert [entry['seq'] for entry in page['history']] == [4, 5]
+    assert page['last_seq'] == 5 and page['more']
+
+    seen = []
+    cursor = 3
+    while True:
+        page = history.since(cursor, limit=10)
+        seen += [entry['seq'] for entry in page['history']]
+        cursor = page['last_seq']
+        if not page['more']:
+            break
+    assert seen == list(range(4, 41))
+
+def test_since_without_cursor_returns_the_latest():
+    history = app.CommandHistory()
+    for index in range(40):
+        history.add(f'r power {index}', 'power on')
+    page = history.since(0, limit=2)
+    assert [entry['seq'] for entry in page['history']] == [39, 40]
+    assert page['last_seq'] == 40 and not page['more']
+
+def test_ring_buffer_keeps_the_newest():
+    history = app.CommandHistory(size=3)
+    for index in range(5):
+        history.add(f'r power {index}', 'power on')
+    assert [entry['seq'] for entry in history.since()['history']] == [3, 4, 5]
+
+def test_journal_survives_a_restart(journal_file):
+    history = reopen(journal_file)
+    history.add('r power', 'power on', duration_ms=12.5, source='192.168.1.20')
+    history.add('s multiview 5', 'quad screen')
+
+    history = reopen(journal_file)
+    entries = history.since()['history']
+    assert [entry['command'] for entry in entries] == ['r power', 's multiview 5']
+    assert entries[0]['source'] == '192.168.1.20' and entries[0]['duration_ms'] == 12.5
+    assert history.add('r type', 'multiviewer')['seq'] == 3
+
+def test_clear_is_journaled_and_keeps_the_sequence(journal_file):
+    history = reopen(journal_file)
+    history.add('r power', 'power on')
+    history.clear()
+
+    history = reopen(journal_file)
+    assert history.since()['history'] == []
+    assert history.add('r type', 'multiviewer')['seq'] == 2
+
+def test_rotated_journals_are_read_oldest_first(journal_file, monkeypatch):
+    monkeypatch.setattr(app, 'HISTORY_JOURNAL_MAX_BYTES', 600)
+    history = reopen(journal_file)
+    for index in range(8):
+        history.add(f's output audio vol {index}', f'output audio volume: {index}')
+    assert os.path.exists(f'{journal_file}.1')
+
+    history = reopen(journal_file)
+    seqs = [entry['seq'] for entry in history.since()['history']]
+    assert seqs == sorted(seqs) and seqs[-1] == 8
+
+def test_history_records_the_forwarded_client_address(monkeypatch):
+    calls = []
+    monkeypatch.setattr(app.broker, 'call', lambda op, **args: calls.append(args) or ('ok', None))
+    app.app.test_client().post('/api/command', json={'command': 'r power'},
+                               headers={'X-Forwarded-For': '192.168.1.50'})
+    assert calls[0]['source'] == '192.168.1.50'
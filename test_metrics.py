@@ -0,0 +1,74 @@
+"""Metrics snapshot merging across worker processes (python3 -m pytest)"""
+
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+import app
+
+@pytest.fixture
+def registry(tmp_path, monkeypatch):
+    monkeypatch.setattr(app, 'METRICS_DIR', str(tmp_path))
+    registry = app.MetricsRegistry()
+    registry.counter('test_requests_total', 'Requests', ('op',)).series[('read',)] = 2
+    return registry
+
+@pytest.fixture
+def worker():
+    """Another live process standing in for a second gunicorn worker"""
+    process = subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(30)'])
+    yield process
+    process.kill()
+    process.wait()
+
+def write_snapshot(filename, value):
+    with open(os.path.join(app.METRICS_DIR, filename), 'w') as f:
+        json.dump({'test_requests_total': [[['read'], value]]}, f)
+
+def test_live_worker_snapshots_are_summed(registry, worker):
+    write_snapshot(app._snapshot_name(worker.pid), 5)
+    assert 'test_requests_total{op="read"} 7' in registry.render()
+
+def test_own_snapshot_is_not_counted_twice(registry):
+    registry.flush()
+    assert 'test_requests_total{op="read"} 2' in registry.render()
+
+def test_snapshot_of_a_dead_worker_is_dropped(registry, worker):
+    filename = app._snapshot_name(worker.pid)
+    worker.kill()
+    worker.wait()
+    write_snapshot(filename, 5)
+    assert 'test_requests_total{op="read"} 2' in registry.render()
+    assert not os.path.exists(os.path.join(app.METRICS_DIR, filename))
+
+def test_snapshot_of_a_reused_pid_is_dropped(registry, worker):
+    # Same pid, earlier start: the file outlived a worker whose pid came back
+    started = app._process_started(worker.pid)
+    filename = f'{worker.pid}-{started - 1}.json'
+    write_snapshot(filename, 5)
+    assert 'test_requests_total{op="read"} 2' in registry.render()
+    assert not os.path.exists(os.path.join(app.METRICS_DIR, filename))
+
+def test_concurrent_first_records_start_one_flusher(registry, monkeypatch):
+    started = []
+
+    class SlowThread:
+        def __init__(self, target, daemon):
+            # Widen the window between checking for a flusher and recording it
+            time.sleep(0.05)
+
+        def start(self):
+            started.append(self)
+
+    threads = [threading.Thread(target=registry.touch) for _ in range(8)]
+    monkeypatch.setattr(threading, 'Thread', SlowThread)
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(started) == 1
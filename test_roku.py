@@ -0,0 +1,415 @@
+"""Roku discovery and control against stub ECP servers (python3 -m pytest)"""
+
+import asyncio
+import ipaddress
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import app
+
+class StubRokuHandler(BaseHTTPRequestHandler):
+    """Answers ECP requests like a Roku, recording each one"""
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def do_POST(self):
+        self._reply(b'')
+
+    def do_GET(self):
+        server = self.server
+        if self.path == '/query/device-info':
+            body = (f'<device-info><serial-number>{server.serial}</serial-number>'
+                    f'<friendly-device-name>{server.name}</friendly-device-name>'
+                    '<model-name>Stub Roku</model-name></device-info>').encode('utf-8')
+        elif self.path == '/query/apps':
+            body = server.apps.encode('utf-8')
+        else:
+            body = b'icon'
+        self._reply(body)
+
+    def _reply(self, body):
+        server = self.server
+        with server.lock:
+            server.requests.append(f'{self.command} {self.path}')
+        time.sleep(server.latency)
+        self.send_response(server.status)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+@pytest.fixture
+def roku(monkeypatch):
+    """Start stub Rokus on 127.0.0.21, .22, ... (ECP is always port 8060)"""
+    # Fresh keep-alive sessions, so no test reuses a connection to a stopped stub
+    monkeypatch.setattr(app, 'roku_sessions', app.RokuSessions())
+    servers = []
+
+    def start(serial=None, name='Living Room', latency=0, status=200):
+        server = ThreadingHTTPServer((f'127.0.0.{21 + len(servers)}', 8060), StubRokuHandler)
+        server.ip = server.server_address[0]
+        server.serial = serial or f'SN{len(servers) + 1}'
+        server.name = name
+        server.latency = latency
+        server.status = status
+        server.apps = '<apps><app id="12" type="appl" version="1.0">Netflix</app></apps>'
+        server.requests = []
+        server.connections = 0
+        server.lock = threading.Lock()
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True).start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+def wait_for(predicate, timeout=2):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+def notify(ip, serial, nts='ssdp:alive'):
+    """An SSDP NOTIFY announcement as a Roku sends it"""
+    return (f'NOTIFY * HTTP/1.1\r\nHOST: 239.255.255.250:1900\r\nNT: roku:ecp\r\nNTS: {nts}\r\n'
+            f'USN: uuid:roku:ecp:{serial}\r\nLOCATION: http://{ip}:8060/\r\n\r\n').encode('ascii')
+
+# SSDP discovery
+def test_search_request_asks_for_rokus():
+    request = app.ssdp_search_request(mx=2).decode('ascii')
+    assert request.startswith('M-SEARCH * HTTP/1.1\r\n')
+    assert 'ST: roku:ecp\r\n' in request and 'MX: 2\r\n' in request
+    assert request.endswith('\r\n\r\n')
+
+def test_search_replies_and_announcements_are_parsed():
+    reply = b'HTTP/1.1 200 OK\r\nCache-Control: max-age=3600\r\nST: roku:ecp\r\nLocation: http://192.168.1.40:8060/\r\n\r\n'
+    assert app.parse_ssdp_headers(reply)['LOCATION'] == 'http://192.168.1.40:8060/'
+    assert app.parse_ssdp_headers(notify('192.168.1.40', 'X1'))['USN'] == 'uuid:roku:ecp:X1'
+    assert app.parse_ssdp_headers(app.ssdp_search_request()) is None
+
+def test_device_info_identifies_the_roku(roku):
+    server = roku(serial='YH00AB123456', name='Bedroom')
+    info = app.get_roku_device_info(f'http://{server.ip}:8060/')
+    assert info == {'ip': server.ip, 'name': 'Bedroom', 'model': 'Stub Roku', 'serial': 'YH00AB123456'}
+
+@pytest.mark.parametrize('location', ['http://[::1', '8060/', 'http://127.0.0.9:8060/'])
+def test_bad_or_unreachable_locations_are_skipped(location):
+    assert app.get_roku_device_info(location) is None
+
+# Network scan
+def test_scan_finds_every_roku_on_the_network(roku):
+    servers = [roku(serial='SCAN1'), roku(serial='SCAN2')]
+    start = time.monotonic()
+    found = list(app.scan_roku_devices_fallback([ipaddress.IPv4Network('127.0.0.16/28')]))
+    assert sorted(device['serial'] for device in found) == ['SCAN1', 'SCAN2']
+    assert {device['ip'] for device in found} == {server.ip for server in servers}
+    assert time.monotonic() - start < 2
+
+def test_oversized_networks_are_not_scanned():
+    start = time.monotonic()
+    assert list(app.scan_roku_devices_fallback([ipaddress.IPv4Network('10.0.0.0/16')])) == []
+    assert time.monotonic() - start < 1
+
+# Roku registry
+class ExecutorLoop:
+    """Event loop stand-in that records executor jobs instead of running them"""
+
+    def __init__(self):
+        self.jobs = []
+
+    def run_in_executor(self, executor, func, *args):
+        self.jobs.append((func, args))
+
+    def run_jobs(self):
+        jobs, self.jobs = self.jobs, []
+        for func, args in jobs:
+            func(*args)
+
+@pytest.fixture
+def registry(tmp_path, monkeypatch):
+    monkeypatch.setattr(app, 'ROKU_CONFIG_FILE', str(tmp_path / 'roku_devices.json'))
+    return app.RokuRegistry(path=str(tmp_path / 'roku_registry.json'))
+
+def test_notify_burst_identifies_the_roku_once(roku, registry):
+    server = roku(serial='YH1')
+    loop = ExecutorLoop()
+    for _ in range(5):
+        registry._on_message(loop, app.parse_ssdp_headers(notify(server.ip, 'YH1')))
+    assert len(loop.jobs) == 1
+    loop.run_jobs()
+    assert [device['ip'] for device in registry.snapshot()] == [server.ip]
+    assert server.requests == ['GET /query/device-info']
+
+    # Announcements from a known address only refresh it
+    registry._on_message(loop, app.parse_ssdp_headers(notify(server.ip, 'YH1')))
+    assert loop.jobs == []
+
+def test_moved_roku_takes_its_mappings_along(roku, registry):
+    server = roku(serial='YH1')
+    app.save_roku_mappings({'2': {'ip': '192.168.1.40', 'serial': 'YH1', 'name': 'Den'},
+                            '3': {'ip': '192.168.1.41', 'serial': 'YH9', 'name': 'Office'}})
+    registry.record({'ip': '192.168.1.40', 'serial': 'YH1', 'name': 'Den', 'model': 'Stub Roku'})
+    loop = ExecutorLoop()
+    registry._on_message(loop, app.parse_ssdp_headers(notify(server.ip, 'YH1')))
+    loop.run_jobs()
+    mappings = app.load_roku_mappings()
+    assert mappings['2']['ip'] == server.ip and mappings['3']['ip'] == '192.168.1.41'
+    with open(registry.path) as f:
+        assert json.load(f)['YH1']['ip'] == server.ip
+
+@pytest.mark.parametrize('message', [
+    notify('192.168.1.40', 'YH1', nts='ssdp:byebye'),
+    notify('192.168.1.40', 'YH1').replace(b'http://192.168.1.40:8060/', b'http://[::1'),
+    notify('192.168.1.40', 'YH1').replace(b'NT: roku:ecp', b'NT: upnp:rootdevice'),
+])
+def test_unusable_announcements_are_ignored(registry, message):
+    loop = ExecutorLoop()
+    registry._on_message(loop, app.parse_ssdp_headers(message))
+    assert loop.jobs == [] and registry.identifying == set()
+
+def test_failed_identification_can_be_retried(registry):
+    loop = ExecutorLoop()
+    # Nothing listens on this address, so identifying it fails
+    registry._on_message(loop, app.parse_ssdp_headers(notify('127.0.0.9', 'YH1')))
+    loop.run_jobs()
+    assert registry.snapshot() == [] and registry.identifying == set()
+    registry._on_message(loop, app.parse_ssdp_headers(notify('127.0.0.9', 'YH1')))
+    assert len(loop.jobs) == 1
+
+# Keep-alive sessions
+def test_key_presses_reuse_one_connection(roku):
+    server = roku()
+    for key in ['Up', 'Up', 'Right', 'Select'] * 3:
+        assert app.roku_request('POST', server.ip, f'keypress/{key}').status_code == 200
+    assert len(server.requests) == 12 and server.connections == 1
+
+def test_warm_connects_before_the_first_press(roku):
+    server = roku()
+    app.roku_sessions.warm([server.ip, server.ip])
+    assert wait_for(lambda: server.requests == ['GET /query/device-info'])
+    app.roku_request('POST', server.ip, 'keypress/Home')
+    assert server.connections == 1
+
+def test_unreachable_roku_fails_on_the_connect_timeout():
+    start = time.monotonic()
+    with pytest.raises(app.requests.exceptions.RequestException) as error:
+        app.roku_request('POST', '127.0.0.9', 'keypress/Home')
+    assert app.roku_error_text(error.value) == 'not reachable'
+    assert time.monotonic() - start < app.ROKU_CONNECT_TIMEOUT + 0.5
+
+# Command queues
+@pytest.fixture
+def dispatcher(monkeypatch):
+    """A fresh dispatcher with its own breaker and app cache, as on the serial owner"""
+    monkeypatch.setattr(app, 'roku_liveness', app.RokuLiveness())
+    monkeypatch.setattr(app, 'roku_app_cache', app.RokuAppCache())
+    dispatcher = app.RokuDispatcher()
+    monkeypatch.setattr(app, 'roku_dispatcher', dispatcher)
+    yield dispatcher
+    if dispatcher.loop:
+        def stop():
+            for task in asyncio.all_tasks(dispatcher.loop):
+                task.cancel()
+            dispatcher.loop.call_soon(dispatcher.loop.stop)
+        dispatcher.loop.call_soon_threadsafe(stop)
+        dispatcher.thread.join()
+        dispatcher.loop.close()
+
+def test_presses_reach_the_roku_in_order(roku, dispatcher):
+    server = roku(latency=0.01)
+    keys = ['Up', 'Down', 'Left', 'Right', 'Select', 'Back', 'Home', 'Play']
+    futures = [dispatcher.submit(server.ip, f'keypress/{key}') for key in keys]
+    assert all(future.result(timeout=2)['success'] for future in futures)
+    assert server.requests == [f'POST /keypress/{key}' for key in keys]
+
+def test_a_slow_roku_does_not_hold_up_another(roku, dispatcher):
+    slow, fast = roku(latency=0.5), roku()
+    pending = dispatcher.submit(slow.ip, 'keypress/Home')
+    start = time.monotonic()
+    assert dispatcher.submit(fast.ip, 'keypress/Home').result(timeout=2)['success']
+    assert time.monotonic() - start < 0.3 and not pending.done()
+    assert pending.result(timeout=2)['success']
+
+def test_request_returns_before_a_slow_ack(roku, dispatcher):
+    server = roku(latency=0.5)
+    start = time.monotonic()
+    assert app._broker_roku_post(server.ip, 'keypress/Home', wait=0.1) == {'success': True, 'acked': False}
+    assert time.monotonic() - start < 0.3
+
+def test_a_failing_command_does_not_stop_the_queue(roku, dispatcher, monkeypatch):
+    server = roku()
+    roku_request = app.roku_request
+
+    def flaky(method, ip, endpoint, timeout=None):
+        if endpoint == 'keypress/Bad':
+            raise ValueError('bad key')
+        return roku_request(method, ip, endpoint, timeout)
+
+    monkeypatch.setattr(app, 'roku_request', flaky)
+    bad = dispatcher.submit(server.ip, 'keypress/Bad')
+    good = dispatcher.submit(server.ip, 'keypress/Home')
+    assert bad.result(timeout=2) == {'success': False, 'error': 'Roku command failed: bad key'}
+    assert good.result(timeout=2)['success']
+
+def test_presses_that_waited_too_long_are_dropped(roku, dispatcher, monkeypatch):
+    monkeypatch.setattr(app, 'ROKU_COMMAND_MAX_AGE', 0.2)
+    server = roku(latency=0.4)
+    first = dispatcher.submit(server.ip, 'keypress/Home')
+    late = dispatcher.submit(server.ip, 'keypress/Select')
+    assert first.result(timeout=2)['success']
+    assert late.result(timeout=2)['error'] == 'Dropped: the Roku did not take it in time'
+    assert server.requests == ['POST /keypress/Home']
+
+def test_a_full_queue_refuses_more(roku, dispatcher, monkeypatch):
+    monkeypatch.setattr(app, 'ROKU_QUEUE_SIZE', 2)
+    server = roku(latency=0.2)
+    futures = [dispatcher.submit(server.ip, 'keypress/Up') for _ in range(5)]
+    errors = [future.result(timeout=3).get('error') or '' for future in futures]
+    assert sum(error.startswith('Too many commands queued') for error in errors) >= 2
+
+# Liveness
+def test_breaker_opens_after_repeated_failures_and_closes_on_success():
+    liveness = app.RokuLiveness()
+    liveness.report('192.168.1.40', 'not reachable')
+    assert not liveness.is_down('192.168.1.40')
+    liveness.report('192.168.1.40', 'not reachable')
+    assert liveness.is_down('192.168.1.40')
+    assert liveness.check('192.168.1.40') == 'Roku at 192.168.1.40 is offline (not reachable)'
+    assert liveness.devices['192.168.1.40']['next_probe'] == 0
+    liveness.report('192.168.1.40')
+    assert liveness.check('192.168.1.40') is None
+
+def test_offline_roku_fails_fast(roku, dispatcher):
+    server = roku()
+    for _ in range(app.ROKU_FAILURE_THRESHOLD):
+        app.roku_liveness.report(server.ip, 'not reachable')
+    start = time.monotonic()
+    result = app._broker_roku_post(server.ip, 'keypress/Home', wait=1)
+    assert result['offline'] and not result['success']
+    assert time.monotonic() - start < 0.1 and server.requests == []
+
+def test_probes_track_mapped_rokus_only(roku, tmp_path, monkeypatch):
+    monkeypatch.setattr(app, 'ROKU_CONFIG_FILE', str(tmp_path / 'roku_devices.json'))
+    up = roku()
+    app.save_roku_mappings({'1': {'ip': up.ip}, '2': {'ip': '127.0.0.9'}})
+    liveness = app.RokuLiveness()
+    liveness.report('192.168.1.99', 'not reachable')
+    liveness._probe_due()
+    assert wait_for(lambda: not any(entry['probing'] for entry in liveness.devices.values()))
+    snapshot = liveness.snapshot()
+    # Unmapped devices are forgotten; one failed probe does not open the breaker
+    assert set(snapshot) == {up.ip, '127.0.0.9'}
+    assert snapshot[up.ip]['state'] == app.ROKU_UP_STATE
+    assert snapshot['127.0.0.9']['failures'] == 1 and snapshot['127.0.0.9']['state'] is None
+
+    # Idle devices are not probed again until their interval is up
+    liveness._probe_due()
+    time.sleep(0.1)
+    assert up.requests == ['GET /query/device-info']
+
+# App catalogs
+@pytest.fixture
+def owner(roku, dispatcher, tmp_path, monkeypatch):
+    """Routes served as on the serial owner, with a stub Roku mapped to HDMI 1"""
+    monkeypatch.setattr(app.broker, 'call', lambda op, **args: app.broker_ops[op](**args))
+    monkeypatch.setattr(app, 'ROKU_CONFIG_FILE', str(tmp_path / 'roku_devices.json'))
+    server = roku()
+    app.save_roku_mappings({'1': {'ip': server.ip, 'serial': server.serial, 'name': server.name}})
+    return server
+
+def test_app_list_is_fetched_once_with_its_icons(owner):
+    cache = app.roku_app_cache
+    assert cache.get_apps(owner.ip) == [{'id': '12', 'name': 'Netflix', 'type': 'appl'}]
+    assert cache.get_apps(owner.ip)[0]['name'] == 'Netflix'
+    # Icons are fetched ahead of the launcher asking for them
+    assert wait_for(lambda: cache.get_icon(owner.ip, '12', fetch=False) is not None)
+    assert sorted(owner.requests) == ['GET /query/apps', 'GET /query/icon/12']
+
+def test_stale_app_list_is_served_while_it_refreshes(owner, monkeypatch):
+    cache = app.roku_app_cache
+    cache.get_apps(owner.ip)
+    monkeypatch.setattr(app, 'ROKU_APPS_TTL', 0)
+    owner.apps = '<apps><app id="12">Netflix</app><app id="13">Hulu</app></apps>'
+    assert len(cache.get_apps(owner.ip)) == 1
+    assert wait_for(lambda: len(cache.get_apps(owner.ip)) == 2)
+
+def test_launch_refreshes_the_app_list(owner):
+    app.roku_app_cache.get_apps(owner.ip)
+    assert app.roku_dispatcher.submit(owner.ip, 'launch/13').result(timeout=2)['success']
+    assert wait_for(lambda: owner.requests.count('GET /query/apps') == 2)
+
+def test_icons_revalidate_by_etag(owner):
+    client = app.app.test_client()
+    response = client.get('/api/roku/icon/1/12')
+    assert response.status_code == 200 and response.data == b'icon'
+    etag = response.headers['ETag']
+    revalidated = client.get('/api/roku/icon/1/12', headers={'If-None-Match': etag})
+    assert revalidated.status_code == 304 and revalidated.headers['ETag'] == etag
+    assert owner.requests.count('GET /query/icon/12') == 1
+
+def test_cached_icons_are_served_while_the_roku_is_offline(owner):
+    client = app.app.test_client()
+    client.get('/api/roku/icon/1/12')
+    for _ in range(app.ROKU_FAILURE_THRESHOLD):
+        app.roku_liveness.report(owner.ip, 'not reachable')
+    assert client.get('/api/roku/icon/1/12').status_code == 200
+    assert client.get('/api/roku/icon/1/13').status_code == 404
+    assert 'GET /query/icon/13' not in owner.requests
+
+# Fan-out
+def map_rokus(*servers):
+    app.save_roku_mappings({str(hdmi): {'ip': server.ip, 'serial': server.serial}
+                            for hdmi, server in enumerate(servers, 1)})
+
+def test_fanout_reaches_every_roku_in_parallel(owner, roku):
+    others = [roku(latency=0.3), roku(latency=0.3)]
+    owner.latency = 0.3
+    map_rokus(owner, *others)
+    start = time.monotonic()
+    response = app.app.test_client().post('/api/roku/fanout', json={'command': 'Home'})
+    assert time.monotonic() - start < 0.6
+    body = response.get_json()
+    assert response.status_code == 200 and body['sent'] == 3
+    assert all(server.requests == ['POST /keypress/Home'] for server in [owner, *others])
+
+def test_fanout_reports_slow_and_offline_rokus_separately(owner, roku):
+    slow, offline = roku(latency=0.5), roku()
+    map_rokus(owner, slow, offline)
+    for _ in range(app.ROKU_FAILURE_THRESHOLD):
+        app.roku_liveness.report(offline.ip, 'not reachable')
+    response = app.app.test_client().post('/api/roku/fanout', json={'app_id': '12', 'deadline': 0.2})
+    results = response.get_json()['results']
+    assert results['1']['success'] and not results['1']['queued']
+    assert results['2']['success'] and results['2']['queued']
+    assert results['3']['offline'] and not results['3']['success']
+    assert offline.requests == []
+
+def test_fanout_sends_once_to_a_roku_on_two_inputs(owner):
+    app.save_roku_mappings({'1': {'ip': owner.ip}, '2': {'ip': owner.ip}})
+    response = app.app.test_client().post('/api/roku/fanout', json={'hdmi': [1, 2], 'command': 'Select'})
+    assert set(response.get_json()['results']) == {'1', '2'}
+    assert owner.requests == ['POST /keypress/Select']
+
+@pytest.mark.parametrize('payload, status', [
+    ({'command': 'Home', 'app_id': '12'}, 400),
+    ({'hdmi': 2, 'command': 'Home'}, 400),
+    ({'hdmi': [1, 4], 'command': 'Home'}, 404),
+])
+def test_fanout_rejects_bad_targets(owner, payload, status):
+    assert app.app.test_client().post('/api/roku/fanout', json=payload).status_code == status
+    assert owner.requests == []
@@ -0,0 +1,73 @@
+"""Scene validation and minimal-diff apply plans (python3 -m pytest)"""
+
+import time
+
+import pytest
+
+import app
+
+@pytest.fixture
+def owner(manager, monkeypatch):
+    """Scene applies run here as on the serial owner, against a fresh shadow"""
+    monkeypatch.setattr(app, 'device_state', app.DeviceState())
+    scheduler = app.SerialScheduler()
+    scheduler.start()
+    monkeypatch.setattr(app, 'scheduler', scheduler)
+    return manager
+
+def shadow(**values):
+    return {field: {'value': value} for field, value in values.items()}
+
+def test_valid_scene_passes():
+    assert app.validate_scene({'multiview': 5, 'window_1_input': 2, 'audio_volume': 30,
+                               'audio_mute': False, 'quad_mode': 2}) is None
+
+@pytest.mark.parametrize('field, value', [
+    ('window_1_input', 9),
+    ('audio_volume', 500),
+    ('audio_volume', -1),
+    ('quad_mode', 7),
+    ('output_resolution', 15),
+])
+def test_out_of_range_scene_values_are_rejected(field, value):
+    assert app.validate_scene({'multiview': 5, field: value})
+
+def test_invalid_scene_is_not_saved(tmp_path, monkeypatch):
+    monkeypatch.setattr(app, 'SCENES_FILE', str(tmp_path / 'scenes.json'))
+    response = app.app.test_client().post('/api/scenes', json={
+        'name': 'Bad', 'settings': {'multiview': 5, 'audio_volume': 500}})
+    assert response.status_code == 400
+    assert not (tmp_path / 'scenes.json').exists()
+
+def test_plan_sends_only_what_differs_layout_first():
+    commands, skipped = app.plan_scene({'multiview': 5, 'window_1_input': 2, 'window_2_input': 2, 'quad_mode': 1},
+                                       shadow(multiview=2, window_1_input=2, window_2_input=3))
+    assert commands == ['s multiview 5!', 's quad mode 1!', 's window 2 in 2!']
+    assert skipped == ['window_1_input']
+
+def test_plan_leaves_windows_the_mode_does_not_show():
+    commands, _ = app.plan_scene({'multiview': 2, 'window_1_input': 1, 'window_3_input': 4, 'quad_mode': 2}, {})
+    assert commands == ['s multiview 2!', 's window 1 in 1!']
+
+def test_applying_a_scene_twice_sends_nothing_the_second_time(device, owner):
+    scene = {'multiview': 3, 'pbp_mode': 2, 'window_1_input': 4, 'audio_volume': 12}
+    first = app._broker_apply_scene(scene)
+    assert first['commands'] == ['s multiview 3!', 's PBP mode 2!', 's window 1 in 4!', 's output audio vol 12!']
+    assert all(result['error'] is None for result in first['results'])
+    assert device.state['multiview'] == 3 and device.state['audio_volume'] == 12
+
+    sent = len(device.received)
+    second = app._broker_apply_scene(scene)
+    assert second['commands'] == [] and len(device.received) == sent
+    assert sorted(second['skipped']) == sorted(scene)
+
+def test_dry_run_plans_without_sending(device, owner):
+    plan = app._broker_apply_scene({'multiview': 1, 'input_source': 3}, dry_run=True)
+    assert plan['commands'] == ['s multiview 1!', 's in source 3!']
+    assert plan['results'] == [] and device.received == []
+
+def test_stale_shadow_values_are_set_again(device, owner):
+    owner.send_command('r output audio vol')
+    time.sleep(0.05)
+    plan = app._broker_apply_scene({'multiview': 5, 'audio_volume': 30}, max_age=0.01)
+    assert 's output audio vol 30!' in plan['commands']
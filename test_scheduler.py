@@ -0,0 +1,117 @@
+"""Serial scheduler: priorities, deadlines and setter coalescing (python3 -m pytest)"""
+
+import threading
+import time
+
+import app
+
+def submit_in_background(scheduler, commands, priority, **kwargs):
+    """Submit from another thread, pausing so submissions queue in order"""
+    results = []
+    thread = threading.Thread(target=lambda: results.extend(scheduler.submit(commands, priority, **kwargs)))
+    thread.start()
+    time.sleep(0.05)
+    return thread, results
+
+def test_sets_jump_ahead_of_reads_and_polls(device, manager):
+    device.latencies = {'r power': 0.3}
+    scheduler = app.SerialScheduler()
+    scheduler.start()
+    threads = [submit_in_background(scheduler, commands, priority)[0] for commands, priority in (
+        (['r power'], app.PRIORITY_READ),
+        (['r multiview'], app.PRIORITY_BACKGROUND),
+        (['r in source'], app.PRIORITY_READ),
+        (['s output audio vol 9'], app.PRIORITY_SET),
+    )]
+    for thread in threads:
+        thread.join()
+    assert device.received == ['r power', 's output audio vol 9', 'r in source', 'r multiview']
+
+def test_set_cuts_into_a_background_batch(device, manager):
+    device.latencies = {'r multiview': 0.3}
+    scheduler = app.SerialScheduler()
+    scheduler.start()
+    poll, results = submit_in_background(scheduler, ['r multiview', 'r pip size', 'r quad mode'],
+                                         app.PRIORITY_BACKGROUND)
+    scheduler.submit(['s output audio vol 9'], app.PRIORITY_SET)
+    poll.join()
+    assert device.received == ['r multiview', 's output audio vol 9', 'r pip size', 'r quad mode']
+    assert all(result['error'] is None for result in results)
+
+def test_request_past_its_deadline_never_reaches_the_wire(device, manager):
+    device.latencies = {'r power': 0.5}
+    scheduler = app.SerialScheduler()
+    scheduler.start()
+    slow, _ = submit_in_background(scheduler, ['r power'], app.PRIORITY_READ)
+    result = scheduler.submit(['r in source'], app.PRIORITY_READ, timeout=0.1)[0]
+    assert result['error'] == 'Serial port busy, request deadline exceeded'
+    slow.join()
+    time.sleep(0.1)
+    assert device.received == ['r power']
+    assert scheduler.stats[app.PRIORITY_READ]['abandoned'] == 1
+
+def test_link_down_fails_without_queueing(manager):
+    manager.connected = False
+    scheduler = app.SerialScheduler()
+    result = scheduler.submit(['r power'], app.PRIORITY_READ)[0]
+    assert result['error'] == app.SERIAL_LINK_DOWN
+    assert scheduler.depth() == 0
+
+def queue_writes(scheduler, values, alive):
+    """Queue volume writes behind a slow read; return their results by value"""
+    results = {}
+    scheduler.start()
+
+    def write(value):
+        results[value] = scheduler.submit([f's output audio vol {value}'], app.PRIORITY_SET,
+                                          client_alive=lambda: alive(value))[0]
+
+    threading.Thread(target=scheduler.submit, args=(['r power'], app.PRIORITY_READ)).start()
+    time.sleep(0.05)
+    threads = [threading.Thread(target=write, args=(value,)) for value in values]
+    for thread in threads:
+        thread.start()
+        time.sleep(0.01)
+    for thread in threads:
+        thread.join()
+    return results
+
+def test_queued_writes_coalesce_to_the_last(device, manager):
+    device.latencies = {'r power': 0.3}
+    results = queue_writes(app.SerialScheduler(), [41, 42, 43], lambda value: True)
+    assert [command for command in device.received if 'vol' in command] == ['s output audio vol 43']
+    assert all(result['response'] == 'output audio volume: 43' for result in results.values())
+    assert results[41]['coalesced_into'] == 's output audio vol 43'
+
+def test_merged_write_survives_an_abandoned_newest_client(device, manager):
+    device.latencies = {'r power': 0.3}
+    results = queue_writes(app.SerialScheduler(), [1, 2, 3, 4, 5], lambda value: value != 5)
+    assert device.state['audio_volume'] == 5
+    assert all(result['error'] is None for result in results.values())
+
+def test_merged_write_is_dropped_once_every_client_left(device, manager):
+    device.latencies = {'r power': 0.3}
+    results = queue_writes(app.SerialScheduler(), [1, 2, 3], lambda value: False)
+    assert not [command for command in device.received if 'vol' in command]
+    assert all(result['error'] == 'Request abandoned by client' for result in results.values())
+
+def test_coalesce_key_groups_setters_by_target():
+    assert app.coalesce_key('s output audio vol 10!') == app.coalesce_key('s output audio vol 90')
+    assert app.coalesce_key('s window 1 in 2') != app.coalesce_key('s window 2 in 2')
+    assert app.coalesce_key('s output audio vol+') is None
+    assert app.coalesce_key('r output audio vol') is None
+
+def test_writes_to_different_windows_all_reach_the_wire(device, manager):
+    device.latencies = {'r power': 0.3}
+    scheduler = app.SerialScheduler()
+    scheduler.start()
+    threading.Thread(target=scheduler.submit, args=(['r power'], app.PRIORITY_READ)).start()
+    time.sleep(0.05)
+    threads = [threading.Thread(target=scheduler.submit, args=([f's window {window} in 3'], app.PRIORITY_SET))
+               for window in (1, 2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(command for command in device.received if command.startswith('s window')) == \
+        ['s window 1 in 3', 's window 2 in 3']
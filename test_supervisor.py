@@ -0,0 +1,92 @@
+"""Serial link supervisor: first open, backoff and reconnects (python3 -m pytest)"""
+
+import os
+import time
+
+import pytest
+
+import app
+from orei_simulator import OreiSimulator
+
+@pytest.fixture
+def supervised(tmp_path, monkeypatch):
+    """Supervisors whose port is parked on a missing node once the test ends"""
+    monkeypatch.setattr(app, 'SERIAL_NODE_CHECK_INTERVAL', 0.05)
+    supervisors = []
+
+    def supervise(port):
+        supervisor = app.SerialSupervisor(app.SerialManager(port=port))
+        supervisors.append(supervisor)
+        return supervisor
+
+    yield supervise
+    for supervisor in supervisors:
+        supervisor.change_port(str(tmp_path / 'unplugged'))
+        time.sleep(0.1)
+
+def wait_for(predicate, timeout=2):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+def test_start_opens_the_port_before_returning(device, supervised):
+    supervisor = supervised(device.port)
+    supervisor.start()
+    assert supervisor.manager.connected
+    assert supervisor.state == app.LINK_CONNECTED
+
+def test_backoff_doubles_up_to_the_cap():
+    supervisor = app.SerialSupervisor(app.SerialManager(port='/dev/null'))
+    delays = []
+    for failures in (0, 1, 3, 20):
+        supervisor.failures = failures
+        delays.append(supervisor._backoff())
+    assert delays == [app.SERIAL_RECONNECT_MIN_DELAY, app.SERIAL_RECONNECT_MIN_DELAY * 2,
+                      app.SERIAL_RECONNECT_MIN_DELAY * 8, app.SERIAL_RECONNECT_MAX_DELAY]
+
+def test_failed_open_schedules_a_jittered_retry(tmp_path):
+    # A regular file exists but is no serial port, so opening it fails
+    port = tmp_path / 'ttyUSB0'
+    port.write_text('')
+    supervisor = app.SerialSupervisor(app.SerialManager(port=str(port)))
+    for failures in range(3):
+        delay = supervisor._backoff()
+        before = time.monotonic()
+        supervisor._reconnect()
+        assert supervisor.state == app.LINK_RECONNECTING
+        assert supervisor.failures == failures + 1
+        assert before + delay / 2 <= supervisor.next_attempt <= time.monotonic() + delay
+    assert supervisor.retry_after() >= 1
+    assert supervisor.manager.send_command('r power') == (None, app.SERIAL_LINK_DOWN)
+
+def test_replugged_adapter_reconnects_without_waiting_out_the_backoff(device, supervised, tmp_path):
+    link = tmp_path / 'ttyUSB0'
+    supervisor = supervised(str(link))
+    supervisor.start()
+    assert wait_for(lambda: supervisor.state == app.LINK_MISSING)
+    # Pretend many attempts failed, so only the replug shortcut can reconnect in time
+    supervisor.failures = 10
+    supervisor.next_attempt = time.monotonic() + 60
+    os.symlink(device.port, link)
+    assert wait_for(lambda: supervisor.state == app.LINK_CONNECTED)
+    assert supervisor.manager.send_command('r power')[0] == 'power on'
+
+def test_lost_link_is_reopened(device, supervised):
+    supervisor = supervised(device.port)
+    supervisor.start()
+    supervisor.manager.disconnect()
+    supervisor.link_lost()
+    assert wait_for(lambda: supervisor.manager.connected)
+    assert supervisor.state == app.LINK_CONNECTED and supervisor.failures == 0
+
+def test_port_change_moves_the_link(device, supervised):
+    supervisor = supervised(device.port)
+    supervisor.start()
+    with OreiSimulator(latency=0.01) as other:
+        supervisor.change_port(other.port)
+        assert wait_for(lambda: supervisor.manager.port == other.port and supervisor.manager.connected)
+        supervisor.manager.send_command('r type')
+        assert other.received == ['r type'] and device.received == []